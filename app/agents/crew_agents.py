@@ -1,6 +1,6 @@
-from crewai import Agent
+from crewai import Agent, Crew
 from langchain.tools import Tool
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from app.core.agent_config import (
     DEFAULT_PROMPT_MANAGER_CONFIG,
     DEFAULT_AI_ANALYST_CONFIG,
@@ -9,8 +9,57 @@ from app.core.agent_config import (
     merge_agent_configs,
     DEFAULT_MODEL
 )
+from app.core.llm import create_llm
+from app.core.logging_config import agent_verbose
+
+class AgentSet:
+    """Les quatre agents du pipeline, ainsi que les équipages réutilisables associés."""
+
+    def __init__(self, prompt_manager: Agent, ai_analyst: Agent, quality_controller: Agent,
+                 general_manager: Agent, key: str = ""):
+        self.prompt_manager = prompt_manager
+        self.ai_analyst = ai_analyst
+        self.quality_controller = quality_controller
+        self.general_manager = general_manager
+        self.key = key
+        # Équipages d'un seul agent, indexés par nom d'étape
+        self.crews: Dict[str, Crew] = {}
+        # Agents supplémentaires du mode spéculatif, par étape (créés à la demande,
+        # le premier étant l'agent principal)
+        self.candidates: Dict[str, List[Agent]] = {}
+        # Passe à False si un appel LLM peut encore utiliser ces agents en arrière-plan
+        self.reusable = True
+
+    @property
+    def has_memory(self) -> bool:
+        """Un des agents conserve un historique de conversation d'une tâche à l'autre."""
+        agents = [self.prompt_manager, self.ai_analyst, self.quality_controller, self.general_manager]
+        for candidates in self.candidates.values():
+            agents.extend(candidates)
+        return any(getattr(agent, "memory", False) for agent in agents)
 
 class AgentFactory:
+    @staticmethod
+    def create_agent_set(agent_params: Optional[Dict] = None, key: str = "") -> AgentSet:
+        return AgentSet(
+            prompt_manager=AgentFactory.create_prompt_manager(agent_params),
+            ai_analyst=AgentFactory.create_ai_analyst(agent_params),
+            quality_controller=AgentFactory.create_quality_controller(agent_params),
+            general_manager=AgentFactory.create_general_manager(agent_params),
+            key=key
+        )
+
+    @staticmethod
+    def create_agent(role: str, agent_params: Optional[Dict] = None) -> Agent:
+        """Crée l'agent d'un rôle du pipeline (nom d'étape)."""
+        factories = {
+            'Prompt Manager': AgentFactory.create_prompt_manager,
+            'AI Analyst': AgentFactory.create_ai_analyst,
+            'Quality Controller': AgentFactory.create_quality_controller,
+            'General Manager': AgentFactory.create_general_manager,
+        }
+        return factories[role](agent_params)
+
     @staticmethod
     def create_prompt_manager(agent_params: Optional[Dict] = None) -> Agent:
         config = merge_agent_configs(DEFAULT_PROMPT_MANAGER_CONFIG, agent_params)
@@ -22,8 +71,14 @@ class AgentFactory:
             de manière claire et précise. Vous devez toujours fournir une question reformulée,
             même si la question originale est déjà claire.""",
             tools=[],
+            llm=create_llm('Prompt Manager', config),
+            max_iter=config.get("max_iterations", 15),
+            # Chaque tâche est indépendante : pas de résumé de conversation. La mémoire
+            # CrewAI ajoute un appel LLM à chaque étape et, les agents étant mis en commun,
+            # mêlerait l'historique de requêtes sans rapport.
+            memory=False,
             allow_delegation=False,
-            verbose=True
+            verbose=agent_verbose()
         )
 
     @staticmethod
@@ -37,8 +92,11 @@ class AgentFactory:
             Vous devez toujours structurer vos réponses de manière claire et concise, en vous concentrant
             sur les informations les plus pertinentes.""",
             tools=[],
+            llm=create_llm('AI Analyst', config),
+            max_iter=config.get("max_iterations", 15),
+            memory=False,
             allow_delegation=False,
-            verbose=True
+            verbose=agent_verbose()
         )
 
     @staticmethod
@@ -58,8 +116,11 @@ class AgentFactory:
             
             Exemple: Final Answer: Score: 0.95""",
             tools=[],
+            llm=create_llm('Quality Controller', config),
+            max_iter=config.get("max_iterations", 15),
+            memory=False,
             allow_delegation=False,
-            verbose=True
+            verbose=agent_verbose()
         )
 
     @staticmethod
@@ -82,6 +143,9 @@ class AgentFactory:
             Exemple de rejet:
             Final Answer: rejeté|La réponse est incomplète.""",
             tools=[],
+            llm=create_llm('General Manager', config),
+            max_iter=config.get("max_iterations", 15),
+            memory=False,
             allow_delegation=False,
-            verbose=True
+            verbose=agent_verbose()
         ) 
\ No newline at end of file
@@ -1,3 +1,5 @@
+import json
+import os
 from typing import Dict, TypedDict, Optional, Union, List
 
 class AgentConfig(TypedDict, total=False):
@@ -14,14 +16,20 @@ class AgentConfig(TypedDict, total=False):
     
     # Paramètres de réponse
     max_tokens: int   # Longueur maximale des réponses
+    timeout: float    # Délai maximal d'un appel au modèle (secondes)
+    fallback_model: str  # Modèle de repli si l'appel dépasse son délai
     response_format: Dict[str, str]  # Format de réponse spécifique
     
     # Paramètres de contexte
     context: str      # Contexte supplémentaire pour l'agent
     tools: List[str]  # Outils spécifiques à utiliser
 
-# Modèle par défaut pour tous les agents
+# Modèle rapide et économique, utilisé par défaut (reformulation, notation, validation)
 DEFAULT_MODEL = "gpt-3.5-turbo"
+# Modèle plus puissant, réservé à la génération de la réponse
+STRONG_MODEL = "gpt-4"
+# Modèle qui prend le relais lorsqu'un appel dépasse son délai
+FALLBACK_MODEL = "gpt-3.5-turbo"
 
 # Configuration par défaut pour le Prompt Manager
 DEFAULT_PROMPT_MANAGER_CONFIG = {
@@ -30,6 +38,9 @@ DEFAULT_PROMPT_MANAGER_CONFIG = {
     pour une meilleure compréhension et un traitement optimal.""",
     "verbose": True,
     "temperature": 0.7,
+    "model": DEFAULT_MODEL,
+    "max_tokens": 200,
+    "timeout": 20,
     "max_iterations": 3
 }
 
@@ -40,6 +51,9 @@ DEFAULT_AI_ANALYST_CONFIG = {
     aux questions des utilisateurs.""",
     "verbose": True,
     "temperature": 0.5,
+    "model": STRONG_MODEL,
+    "max_tokens": 1000,
+    "timeout": 60,
     "max_iterations": 3
 }
 
@@ -50,6 +64,9 @@ DEFAULT_QUALITY_CONTROLLER_CONFIG = {
     Vous devez fournir un score numérique entre 0 et 1 au format 'Score: X.XX'.""",
     "verbose": True,
     "temperature": 0.3,
+    "model": DEFAULT_MODEL,
+    "max_tokens": 150,  # Score et courte justification
+    "timeout": 20,
     "max_iterations": 3
 }
 
@@ -60,9 +77,58 @@ DEFAULT_GENERAL_MANAGER_CONFIG = {
     la cohérence globale du processus.""",
     "verbose": True,
     "temperature": 0.4,
+    "model": DEFAULT_MODEL,
+    "max_tokens": 150,  # Verdict et courte justification
+    "timeout": 45,
     "max_iterations": 3
 }
 
+# Paramètres qu'une requête peut surcharger via `agent_params`, et leurs bornes :
+# un client ne doit pas pouvoir imposer un modèle coûteux ou des budgets démesurés
+AGENT_PARAM_RANGES = {
+    "temperature": (0.0, 2.0),
+    "max_tokens": (1, 1000),
+    "timeout": (1, 60),
+    "max_iterations": (1, 5),
+}
+AGENT_PARAM_MODELS = ("model", "fallback_model")
+AGENT_PARAM_TEXTS = {"tone": 50, "language": 50, "expertise_level": 50, "context": 2000}
+# Modèles qu'une requête peut choisir (séparés par des virgules)
+ALLOWED_MODELS = {
+    model.strip() for model in os.getenv("AGENT_ALLOWED_MODELS", DEFAULT_MODEL).split(",") if model.strip()
+}
+
+def validate_agent_params(agent_params: Optional[Dict]) -> Optional[Dict]:
+    """
+    Vérifie les paramètres d'agents fournis par une requête.
+    
+    Seules les clés autorisées sont acceptées, les modèles doivent figurer dans
+    AGENT_ALLOWED_MODELS et les valeurs numériques rester dans leurs bornes.
+    
+    Args:
+        agent_params (Optional[Dict]): Paramètres personnalisés de la requête
+        
+    Returns:
+        Optional[Dict]: Les paramètres, inchangés
+        
+    Raises:
+        ValueError: Si une clé ou une valeur n'est pas autorisée
+    """
+    for key, value in (agent_params or {}).items():
+        if key in AGENT_PARAM_RANGES:
+            low, high = AGENT_PARAM_RANGES[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                raise ValueError(f"{key} doit être un nombre compris entre {low} et {high}")
+        elif key in AGENT_PARAM_MODELS:
+            if value not in ALLOWED_MODELS:
+                raise ValueError(f"{key} doit être l'un des modèles autorisés : {', '.join(sorted(ALLOWED_MODELS))}")
+        elif key in AGENT_PARAM_TEXTS:
+            if not isinstance(value, str) or len(value) > AGENT_PARAM_TEXTS[key]:
+                raise ValueError(f"{key} doit être un texte d'au plus {AGENT_PARAM_TEXTS[key]} caractères")
+        else:
+            raise ValueError(f"Paramètre d'agent non autorisé : {key}")
+    return agent_params
+
 def merge_agent_configs(default_config: Dict, custom_config: Optional[Dict] = None) -> Dict:
     """
     Fusionne la configuration par défaut avec une configuration personnalisée.
@@ -81,6 +147,31 @@ def merge_agent_configs(default_config: Dict, custom_config: Optional[Dict] = No
     merged_config.update(custom_config)
     return merged_config
 
+def effective_agent_configs(agent_params: Optional[Dict] = None) -> Dict[str, Dict]:
+    """
+    Calcule la configuration effective de chacun des quatre agents.
+    
+    Args:
+        agent_params (Optional[Dict]): Paramètres personnalisés de la requête
+        
+    Returns:
+        Dict[str, Dict]: Configuration fusionnée par agent
+    """
+    return {
+        "prompt_manager": merge_agent_configs(DEFAULT_PROMPT_MANAGER_CONFIG, agent_params),
+        "ai_analyst": merge_agent_configs(DEFAULT_AI_ANALYST_CONFIG, agent_params),
+        "quality_controller": merge_agent_configs(DEFAULT_QUALITY_CONTROLLER_CONFIG, agent_params),
+        "general_manager": merge_agent_configs(DEFAULT_GENERAL_MANAGER_CONFIG, agent_params),
+    }
+
+def agent_config_key(agent_params: Optional[Dict] = None) -> str:
+    """
+    Retourne une clé stable identifiant la configuration effective des agents.
+    
+    Deux requêtes produisant la même configuration fusionnée partagent la même clé.
+    """
+    return json.dumps(effective_agent_configs(agent_params), sort_keys=True, ensure_ascii=False, default=str)
+
 # Exemple d'utilisation des configurations
 AGENT_CONFIG_EXAMPLES = {
     "prompt_manager": {
@@ -91,10 +182,7 @@ AGENT_CONFIG_EXAMPLES = {
     "ai_analyst": {
         "temperature": 0.6,
         "max_tokens": 1000,
-        "response_format": {
-            "style": "detailed",
-            "sections": ["context", "analysis", "conclusion"]
-        }
+        "tone": "academic"
     },
     "quality_controller": {
         "temperature": 0.2,
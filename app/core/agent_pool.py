@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.agents.crew_agents import AgentFactory, AgentSet
+from app.core.agent_config import agent_config_key
+
+
+class AgentPool:
+    """
+    Pool d'agents CrewAI réutilisables, indexé par configuration effective.
+
+    Construire un agent instancie son client LLM et son exécuteur : les requêtes
+    partageant les mêmes `agent_params` réutilisent donc des agents déjà prêts
+    (et leurs connexions HTTP). Un jeu d'agents n'est prêté qu'à une requête à
+    la fois ; au-delà de `max_idle` jeux inactifs, les configurations les moins
+    récemment utilisées sont évincées.
+
+    Un agent réutilisé ne doit rien conserver d'une requête à l'autre : les
+    agents sont créés sans mémoire (`memory=False`). Avec la mémoire par défaut
+    de CrewAI (résumé de conversation), une requête verrait l'historique des
+    questions précédentes, éventuellement d'autres utilisateurs, et chaque étape
+    coûterait un appel LLM de plus. Un jeu d'agents avec mémoire n'est jamais
+    remis dans le pool.
+    """
+
+    def __init__(self, max_idle: int = 16):
+        self.max_idle = max_idle
+        self._idle: "OrderedDict[str, List[AgentSet]]" = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls) -> "AgentPool":
+        """Construit le pool à partir des variables d'environnement."""
+        return cls(max_idle=int(os.getenv("AGENT_POOL_MAX_IDLE", "16")))
+
+    def acquire(self, agent_params: Optional[Dict] = None) -> AgentSet:
+        """Emprunte un jeu d'agents pour la configuration donnée, en le créant si nécessaire."""
+        key = agent_config_key(agent_params)
+        with self._lock:
+            agent_sets = self._idle.get(key)
+            if agent_sets:
+                agent_set = agent_sets.pop()
+                self._idle_count -= 1
+                if agent_sets:
+                    self._idle.move_to_end(key)
+                else:
+                    del self._idle[key]
+                self.reused += 1
+                return agent_set
+
+        logger.info("Aucun jeu d'agents disponible pour cette configuration, création...")
+        agent_set = AgentFactory.create_agent_set(agent_params, key=key)
+        with self._lock:
+            self.created += 1
+        return agent_set
+
+    def release(self, agent_set: AgentSet) -> None:
+        """Rend un jeu d'agents au pool."""
+        if not agent_set.reusable:
+            logger.warning("Jeu d'agents encore utilisé en arrière-plan, il n'est pas remis dans le pool")
+            return
+        if agent_set.has_memory:
+            logger.warning("Jeu d'agents avec mémoire de conversation, il n'est pas remis dans le pool")
+            return
+
+        with self._lock:
+            self._idle.setdefault(agent_set.key, []).append(agent_set)
+            self._idle.move_to_end(agent_set.key)
+            self._idle_count += 1
+
+            # Éviction LRU des configurations les moins récemment utilisées
+            while self._idle_count > self.max_idle:
+                oldest_key = next(iter(self._idle))
+                agent_sets = self._idle[oldest_key]
+                agent_sets.pop(0)
+                if not agent_sets:
+                    del self._idle[oldest_key]
+                self._idle_count -= 1
+                self.evicted += 1
+
+    def prewarm(self, agent_params: Optional[Dict] = None, count: int = 1) -> None:
+        """Crée à l'avance `count` jeux d'agents pour la configuration donnée."""
+        agent_sets = [self.acquire(agent_params) for _ in range(count)]
+        for agent_set in agent_sets:
+            self.release(agent_set)
+
+    @contextmanager
+    def lease(self, agent_params: Optional[Dict] = None):
+        """Emprunte un jeu d'agents pour la durée du bloc."""
+        agent_set = self.acquire(agent_params)
+        try:
+            yield agent_set
+        finally:
+            self.release(agent_set)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "idle": self._idle_count,
+                "configurations": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
@@ -0,0 +1,338 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.core.agent_config import agent_config_key
+from app.models.schemas import QuestionResponse
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalise une question pour la recherche en cache.
+
+    Les variations de casse, d'espaces et de ponctuation finale ne changent pas
+    la clé : "Qu'est-ce que Grasse ?" et "qu'est-ce que grasse" sont équivalentes.
+    """
+    text = unicodedata.normalize("NFKC", question or "")
+    text = _WHITESPACE_RE.sub(" ", text).strip().lower()
+    return text.strip(" ?!.;,…")
+
+
+def response_config_key(agent_params: Optional[Dict] = None, pipeline_mode: str = "full") -> str:
+    """
+    Configuration qui détermine une réponse : configuration effective des agents
+    et mode du pipeline (une réponse du mode adaptatif, qui saute des étapes,
+    n'est pas servie à une requête en mode complet).
+    """
+    return f"{pipeline_mode}\x00{agent_config_key(agent_params)}"
+
+
+def response_cache_key(question: str, agent_params: Optional[Dict] = None, pipeline_mode: str = "full") -> str:
+    """Clé de cache d'une réponse : question normalisée + configuration (agents et mode du pipeline)."""
+    raw = f"{normalize_question(question)}\x00{response_config_key(agent_params, pipeline_mode)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """Cache LRU en mémoire avec durée de vie et limite de taille (en octets)."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, max_bytes: int = 50_000_000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cache persistant dans une base SQLite locale, qui survit aux redémarrages.
+
+    Une lecture n'écrit pas dans la base : les dates d'accès (utilisées pour
+    l'éviction) sont gardées en mémoire et écrites par lots, à la prochaine
+    écriture ou tous les `touch_batch` accès.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 3600, touch_batch: int = 100):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_batch = touch_batch
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._touched: Dict[str, float] = {}
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Une connexion par processus (compatible avec gunicorn --preload)
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        conn.commit()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._write_touches()
+                self._conn.commit()
+            return value
+
+    def _write_touches(self) -> None:
+        """Écrit les dates d'accès en attente (verrou détenu, sans commit)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._touched.pop(key, None)
+            # Dates d'accès à jour avant l'éviction des entrées les moins récemment utilisées
+            self._write_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            # Éviction des entrées expirées puis des moins récemment utilisées
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+# Politique de cache par étape du pipeline (max_entries=0 désactive l'étape)
+DEFAULT_STAGE_CACHE_POLICIES = {
+    "Prompt Manager": {"max_entries": 2000, "ttl": 86400},
+    "AI Analyst": {"max_entries": 1000, "ttl": 3600},
+    "Quality Controller": {"max_entries": 5000, "ttl": 86400},
+    "General Manager": {"max_entries": 1000, "ttl": 3600},
+}
+
+
+class StageCache:
+    """
+    Cache des résultats de chaque étape du pipeline.
+
+    La clé combine le nom de l'étape, la configuration des agents et la description
+    complète de la tâche : une question partiellement répétée ne paie que les
+    étapes dont l'entrée est nouvelle (ex: la reformulation d'une question déjà
+    vue, ou le score d'un couple question/réponse déjà évalué).
+    """
+
+    def __init__(self, policies: Optional[Dict[str, Dict]] = None):
+        policies = policies if policies is not None else DEFAULT_STAGE_CACHE_POLICIES
+        self._caches = {
+            stage: MemoryCache(max_entries=policy.get("max_entries", 1000), ttl=policy.get("ttl", 3600))
+            for stage, policy in policies.items()
+        }
+        self.hits: Dict[str, int] = {stage: 0 for stage in self._caches}
+        self.misses: Dict[str, int] = {stage: 0 for stage in self._caches}
+
+    @classmethod
+    def from_env(cls) -> Optional["StageCache"]:
+        """Construit le cache d'étapes, ou retourne None s'il est désactivé."""
+        if os.getenv("STAGE_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+            logger.info("Cache par étape désactivé")
+            return None
+        return cls()
+
+    @staticmethod
+    def _key(stage: str, config_key: str, description: str) -> str:
+        raw = f"{stage}\x00{config_key}\x00{description}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, stage: str, config_key: str, description: str) -> Optional[str]:
+        cache = self._caches.get(stage)
+        if cache is None:
+            return None
+        value = cache.get(self._key(stage, config_key, description))
+        if value is None:
+            self.misses[stage] += 1
+        else:
+            self.hits[stage] += 1
+        return value
+
+    def set(self, stage: str, config_key: str, description: str, value: str) -> None:
+        cache = self._caches.get(stage)
+        if cache is not None:
+            cache.set(self._key(stage, config_key, description), value)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            stage: {"entries": len(cache), "hits": self.hits[stage], "misses": self.misses[stage]}
+            for stage, cache in self._caches.items()
+        }
+
+
+class ResponseCache:
+    """
+    Cache des réponses complètes du pipeline.
+
+    Seules les réponses validées par le General Manager sont conservées : un rejet
+    provient souvent d'une erreur transitoire et ne doit pas être servi à nouveau.
+    Depuis la boucle d'événements, aget/aset exécutent les accès à un backend
+    bloquant (SQLite, partagé entre les workers) dans le pool de threads.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        # Accès bloquants (fichier SQLite, attente de verrou jusqu'à 30 s)
+        self.blocking = isinstance(backend, SQLiteCache)
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        """Construit le cache à partir des variables d'environnement."""
+        backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+        ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+        if backend_name == "sqlite":
+            path = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+            logger.info(f"Cache de réponses SQLite: {path}")
+            return cls(SQLiteCache(path, max_entries=max_entries, ttl=ttl))
+        if backend_name == "memory":
+            max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", "50000000"))
+            return cls(MemoryCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes))
+
+        logger.info("Cache de réponses désactivé")
+        return cls(None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get(self, key: str) -> Optional[QuestionResponse]:
+        if not self.enabled:
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Erreur de lecture du cache de réponses: {str(e)}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return QuestionResponse.model_validate_json(value)
+
+    async def aget(self, key: str) -> Optional[QuestionResponse]:
+        """Variante de get pour la boucle d'événements."""
+        if not self.blocking:
+            return self.get(key)
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, key)
+
+    async def aset(self, key: str, response: QuestionResponse) -> None:
+        """Variante de set pour la boucle d'événements."""
+        if not self.blocking:
+            self.set(key, response)
+        elif self.enabled and response.status == "validé":
+            await asyncio.get_running_loop().run_in_executor(None, self.set, key, response)
+
+    def set(self, key: str, response: QuestionResponse) -> None:
+        if not self.enabled or response.status != "validé":
+            return
+        try:
+            self.backend.set(key, response.model_dump_json())
+        except Exception as e:
+            logger.error(f"Erreur d'écriture dans le cache de réponses: {str(e)}")
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.backend) if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -1,308 +1,864 @@
-from crewai import Crew, Task
-from typing import Dict, Optional, List
-from app.agents.crew_agents import AgentFactory
+from crewai import Agent, Crew, Task
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional, List, Tuple
+from app.agents.crew_agents import AgentFactory, AgentSet
+from app.core.agent_config import DEFAULT_AI_ANALYST_CONFIG, agent_config_key, merge_agent_configs
+from app.core.cache import StageCache, normalize_question, response_config_key
+from app.core.metrics import (
+    DEADLINE_EXCEEDED,
+    STAGE_ATTEMPT_DURATION,
+    STAGE_CACHE_HITS,
+    STAGE_COST,
+    STAGE_DURATION,
+    STAGE_ERRORS,
+    STAGE_FALLBACKS,
+    STAGE_MALFORMED_RESPONSES,
+    STAGE_PROMPT_TOKENS,
+    STAGE_RETRIES,
+    STAGE_SHORT_RESPONSES,
+    STAGE_TOKENS,
+    SPECULATIVE_CANDIDATES
+)
+from app.core.logging_config import agent_verbose, preview
+from app.core.parsing import STATUS_REJECTED, STATUS_VALIDATED, ResponseParser, result_text
+from app.core.prompts import VARIANT_INSTRUCTION, PromptRegistry
+from app.core.retry import Deadline, RetryPolicy, is_retryable, retry_after
+from app.core.semantic_cache import SemanticCache
+from app.core.tracing import SPAN_ERROR, SPAN_FALLBACK, SPAN_INVALID, SPAN_TIMEOUT, Span, Trace
+from langchain_community.callbacks import get_openai_callback
 from loguru import logger
+import asyncio
+import random
 import re
-import json
+import threading
 import time
 
+# Paramètres d'exécution des tâches
+PROCESS_TIMEOUT = 120  # 2 minutes de timeout par tentative
+
+
+class AttemptTimeout(asyncio.TimeoutError):
+    """Délai d'une tentative dépassé ; `running` indique si l'appel bloquant continue en arrière-plan."""
+
+    def __init__(self, timeout: float, running: bool):
+        super().__init__(f"Délai de {timeout:.1f}s dépassé")
+        self.timeout = timeout
+        self.running = running
+
+
+# Réponses de repli lorsque toutes les tentatives ont échoué
+ERROR_RESPONSES = {
+    "Prompt Manager": "Je ne peux pas reformuler votre question pour le moment. Veuillez réessayer.",
+    "AI Analyst": "Je ne peux pas générer une réponse appropriée pour le moment. Veuillez réessayer.",
+    "Quality Controller": "Score: 0.5",
+    "General Manager": "rejeté|Le système n'a pas pu générer une réponse appropriée."
+}
+DEFAULT_ERROR_RESPONSE = "Une erreur est survenue. Veuillez réessayer."
+
+# Seuil de validation appliqué par le General Manager
+VALIDATION_THRESHOLD = 0.7
+
+# Modes de pipeline : "full" exécute les quatre agents ; "adaptive" saute la
+# reformulation des questions déjà bien formées et applique la règle de
+# validation du General Manager directement dans le code ; "speculative" génère
+# plusieurs réponses candidates en parallèle et transmet la mieux notée au
+# General Manager
+PIPELINE_MODES = ("full", "adaptive", "speculative")
+
+# Nombre de réponses candidates du mode spéculatif
+SPECULATIVE_CANDIDATES_DEFAULT = 3
+
+# Étapes mises en cache seulement si la réponse finale est validée : un score ou un
+# verdict de rejet vient souvent d'une erreur transitoire et ne doit pas être resservi
+VALIDATED_ONLY_STAGES = ("Quality Controller", "General Manager")
+
+# Abréviations de type SMS qui justifient une reformulation
+_SMS_TOKENS = {"c", "koi", "kwa", "pk", "pq", "stp", "svp", "tkt", "jsp", "bcp", "qd", "ds", "ya", "g", "mdr", "cb"}
+_WORD_RE = re.compile(r"[\w']+")
+
+def is_well_formed_question(question: str) -> bool:
+    """
+    Heuristique peu coûteuse : la question peut-elle être transmise telle quelle à l'AI Analyst ?
+
+    Une question bien formée a une longueur raisonnable, commence par une majuscule,
+    se termine par un point d'interrogation, compte au moins trois mots et ne
+    contient pas d'abréviations de type SMS.
+    """
+    question = (question or "").strip()
+    if not 15 <= len(question) <= 300:
+        return False
+    if not question.endswith("?") or not question[0].isupper():
+        return False
+    words = _WORD_RE.findall(question.lower())
+    return len(words) >= 3 and not any(word in _SMS_TOKENS for word in words)
+
 class QuestionCrew:
-    def __init__(self, agent_params: Optional[Dict] = None):
+    def __init__(self, agent_params: Optional[Dict] = None, executor: Optional[Executor] = None,
+                 agents: Optional[AgentSet] = None, stage_cache: Optional[StageCache] = None,
+                 pipeline_mode: str = "full", parser: Optional[ResponseParser] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 speculative_candidates: int = SPECULATIVE_CANDIDATES_DEFAULT,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 prompts: Optional[PromptRegistry] = None, trace: Optional[Trace] = None,
+                 refresh_stage_cache: bool = False):
         logger.info("Initialisation de QuestionCrew")
         self.agent_factory = AgentFactory()
         self.agent_params = agent_params or {}
+        # Longueur maximale des réponses de l'AI Analyst : elles sont recopiées sans
+        # troncature en deçà dans les prompts du Quality Controller et du General Manager
+        self.answer_tokens = merge_agent_configs(DEFAULT_AI_ANALYST_CONFIG, self.agent_params).get("max_tokens")
+        # Exécuteur utilisé par le moteur asynchrone pour les appels bloquants (None = défaut de la boucle)
+        self.executor = executor
+        # Cache des résultats par étape (None = désactivé) ; en recalcul, il est
+        # mis à jour sans être lu
+        self.stage_cache = stage_cache
+        self.refresh_stage_cache = refresh_stage_cache
+        # Résultats des étapes VALIDATED_ONLY_STAGES en attente du verdict final
+        self._pending_stages: List[Tuple[str, str, str]] = []
+        # Cache sémantique des réponses validées, consulté avec la question reformulée (None = désactivé)
+        self.semantic_cache = semantic_cache
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"Mode de pipeline inconnu: {pipeline_mode}")
+        self.pipeline_mode = pipeline_mode
+        self.speculative_candidates = max(1, speculative_candidates)
+        # Analyseur des réponses des agents (mode lenient par défaut)
+        self.parser = parser or ResponseParser()
+        # Gabarits des tâches, compilés une fois et partagés entre les requêtes
+        self.prompts = prompts or PromptRegistry()
+        # Trace de la requête : un span par étape et par tentative
+        self.trace = trace or Trace()
+        # Politique de nouvelles tentatives et budget de temps de la requête en cours
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.deadline = Deadline()
         
-        # Création des agents
-        logger.info("Création des agents...")
-        self.prompt_manager = self.agent_factory.create_prompt_manager(self.agent_params)
-        self.ai_analyst = self.agent_factory.create_ai_analyst(self.agent_params)
-        self.quality_controller = self.agent_factory.create_quality_controller(self.agent_params)
-        self.general_manager = self.agent_factory.create_general_manager(self.agent_params)
-        logger.info("Tous les agents ont été créés avec succès")
-
-    def _extract_final_answer(self, text: str) -> str:
-        """Extrait la réponse finale du texte."""
-        if not text or not isinstance(text, str):
-            logger.warning("Texte vide ou invalide reçu dans _extract_final_answer")
-            return ""
-
-        logger.debug(f"Texte complet reçu dans _extract_final_answer: {json.dumps(text)}")
-
-        # Nettoyage initial du texte
-        text = text.strip()
-        
-        # Recherche du pattern "Final Answer:" avec gestion des sauts de ligne
-        pattern = r'Final Answer:\s*(.*?)(?=\n\s*(?:Thought:|Human:|Assistant:|$)|$)'
-        match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            answer = match.group(1).strip()
-            logger.info(f"Réponse extraite avec le pattern 'Final Answer:': {json.dumps(answer)}")
-            if answer:  # Vérifie que la réponse n'est pas vide
-                return answer
-
-        # Si le pattern n'a pas fonctionné, essayons de trouver la dernière occurrence de "Final Answer:"
-        parts = text.split("Final Answer:")
-        if len(parts) > 1:
-            answer = parts[-1].strip()  # Prend la dernière partie après "Final Answer:"
-            logger.info(f"Réponse extraite après le dernier 'Final Answer:': {json.dumps(answer)}")
-            if answer:  # Vérifie que la réponse n'est pas vide
-                return answer
-
-        # Si aucun pattern ne correspond, retourner le texte complet
-        logger.info(f"Aucun pattern ne correspond, retour du texte complet: {json.dumps(text)}")
-        return text
+        # Création des agents, sauf si un jeu d'agents (ex: issu du pool) est fourni
+        if agents is None:
+            logger.info("Création des agents...")
+            agents = self.agent_factory.create_agent_set(self.agent_params, key=agent_config_key(self.agent_params))
+            logger.info("Tous les agents ont été créés avec succès")
+        self.agents = agents
+        self.prompt_manager = agents.prompt_manager
+        self.ai_analyst = agents.ai_analyst
+        self.quality_controller = agents.quality_controller
+        self.general_manager = agents.general_manager
 
     def _extract_score(self, quality_result: str) -> float:
         """Extrait le score numérique de la réponse du Quality Controller."""
-        logger.info(f"Tentative d'extraction du score à partir de: {json.dumps(quality_result)}")
+        logger.opt(lazy=True).info("Tentative d'extraction du score à partir de: {}", lambda: preview(quality_result))
 
-        if not quality_result or quality_result.isspace():
-            logger.warning("Résultat du Quality Controller vide ou uniquement des espaces")
+        score = self.parser.extract_score(quality_result)
+        if score is None:
+            logger.warning("Aucun score trouvé dans le format attendu")
             return 0.5
+        logger.info(f"Score extrait avec succès: {score}")
+        return score
 
-        try:
-            # Recherche d'un score au format "Score: X.XX"
-            pattern = r'Score:\s*([0-9]*\.?[0-9]+)'
-            match = re.search(pattern, quality_result)
-            
-            if match:
-                score = float(match.group(1))
-                # Assurer que le score est entre 0 et 1
-                score = max(0.0, min(1.0, score))
-                logger.info(f"Score extrait avec succès: {score}")
-                return score
-            else:
-                logger.warning("Aucun score trouvé dans le format attendu")
-                return 0.5
+    def _extract_manager_response(self, manager_result: str, answer: str) -> Dict[str, str]:
+        """
+        Extrait le verdict du General Manager.
 
-        except Exception as e:
-            logger.error(f"Erreur lors de l'extraction du score: {str(e)}")
-            return 0.5
+        Une réponse validée est la réponse de l'AI Analyst, reprise telle quelle :
+        le General Manager n'en a reçu qu'une version éventuellement tronquée et
+        ne la recopie pas. Une réponse rejetée est remplacée par la raison du rejet.
+        """
+        logger.opt(lazy=True).info("Analyse de la réponse du manager: {}", lambda: preview(manager_result))
+
+        parsed = self.parser.parse(manager_result, verdict=True)
+        if parsed.status is None:
+            logger.warning("Format de réponse du manager invalide")
+            return {"status": STATUS_REJECTED, "final_answer": ""}
+
+        logger.opt(lazy=True).info(f"Réponse du manager extraite: status={parsed.status}, detail={{}}", lambda: preview(parsed.detail))
+        if parsed.status == STATUS_VALIDATED:
+            return {"status": parsed.status, "final_answer": answer}
+        return {"status": parsed.status, "final_answer": parsed.detail}
+
+    def _prepare_crew(self, task: Task, crew_name: str, crew_key: Optional[str] = None) -> Crew:
+        """Prépare l'équipage d'un seul agent qui exécute la tâche (format de réponse inclus dans son gabarit)."""
+        # Réutilisation de l'équipage de l'étape s'il existe déjà pour ces agents
+        crew_key = crew_key or crew_name
+        crew = self.agents.crews.get(crew_key)
+        if crew is not None and crew.agents[0] is task.agent:
+            crew.tasks = [task]
+            return crew
+
+        # Création de l'équipage avec configuration spécifique
+        crew = Crew(
+            agents=[task.agent],
+            tasks=[task],
+            verbose=agent_verbose(),
+            process_timeout=PROCESS_TIMEOUT
+        )
+        self.agents.crews[crew_key] = crew
+        return crew
+
+    def _replace_agent(self, task: Task, crew_name: str) -> Tuple[Task, Crew]:
+        """
+        Tâche et équipage confiés à un nouvel agent de l'étape.
+
+        Utilisé après un délai dépassé : l'appel abandonné continue dans son
+        thread avec l'agent et l'équipage précédents, qui ne peuvent pas servir
+        à la tentative suivante en même temps.
+        """
+        agent = self.agent_factory.create_agent(crew_name, self.agent_params)
+        task = Task(description=task.description, agent=agent)
+        crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            verbose=agent_verbose(),
+            process_timeout=PROCESS_TIMEOUT
+        )
+        return task, crew
+
+    async def _akickoff(self, crew: Crew, crew_name: str):
+        """
+        Exécute l'équipage dans l'exécuteur, avec délai.
 
-    def _extract_manager_response(self, manager_result: str) -> Dict[str, str]:
-        """Extrait la réponse du General Manager."""
-        logger.info(f"Analyse de la réponse du manager: {json.dumps(manager_result)}")
+        Le délai PROCESS_TIMEOUT ne court qu'à partir du démarrage effectif de
+        l'appel : l'attente d'un thread libre n'est bornée que par le budget de
+        la requête, et un appel qui n'a pas démarré à l'échéance n'est jamais
+        exécuté. Lève AttemptTimeout à l'échéance.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+        state = {"started": False, "cancelled": False}
+        lock = threading.Lock()
 
-        if not manager_result or manager_result.isspace():
-            logger.warning("Réponse du manager vide")
-            return {"status": "rejeté", "final_answer": ""}
+        def mark_started() -> None:
+            if not started.done():
+                started.set_result(None)
 
+        def run():
+            with lock:
+                if state["cancelled"]:
+                    return None
+                state["started"] = True
+            loop.call_soon_threadsafe(mark_started)
+            return self._kickoff(crew, crew_name)
+
+        future = loop.run_in_executor(self.executor, run)
         try:
-            # Extraction de la réponse après "Final Answer:"
-            response = self._extract_final_answer(manager_result)
-            
-            # Séparation du statut et de la réponse
-            if "|" in response:
-                status, answer = response.split("|", 1)
-                status = status.strip().lower()
-                answer = answer.strip()
-                
-                if status not in ["validé", "rejeté"]:
-                    logger.warning(f"Statut invalide reçu: {status}")
-                    status = "rejeté"
-                    
-                logger.info(f"Réponse du manager extraite: status={status}, answer={json.dumps(answer)}")
-                return {"status": status, "final_answer": answer}
+            queue_timeout = self.deadline.remaining()
+            await asyncio.wait({started, future}, timeout=queue_timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not (started.done() or future.done()):
+                with lock:
+                    state["cancelled"] = not state["started"]
+                raise AttemptTimeout(queue_timeout, running=not state["cancelled"])
+
+            timeout = min(PROCESS_TIMEOUT, self.deadline.remaining())
+            try:
+                return await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise AttemptTimeout(timeout, running=True) from None
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def _parse_result(self, result, crew_name: str, attempt: int) -> Optional[str]:
+        """Extrait la réponse d'un résultat brut ; retourne None si elle doit être redemandée."""
+        max_attempts = self.retry_policy.max_attempts
+        raw_result = result_text(result)
+        
+        # Vérification du résultat
+        if not raw_result.strip():
+            logger.error(f"Aucun résultat obtenu pour {crew_name} (tentative {attempt}/{max_attempts})")
+            return None
+        
+        # Log du résultat brut
+        logger.opt(lazy=True).debug(f"Résultat brut pour {crew_name}: {{}}", lambda: preview(raw_result))
+        
+        # Extraction de la réponse finale
+        response = self.parser.extract_answer(raw_result)
+        if response is None:
+            logger.warning(f"Réponse hors format pour {crew_name} (tentative {attempt}/{max_attempts})")
+            STAGE_MALFORMED_RESPONSES.inc(stage=crew_name)
+            return None
+        
+        # Contrôles de validité propres à l'étape
+        reason = self.retry_policy.check_response(crew_name, response, self.parser)
+        if reason is not None:
+            logger.warning(f"Réponse invalide pour {crew_name} ({reason}, tentative {attempt}/{max_attempts})")
+            if reason == "trop courte":
+                STAGE_SHORT_RESPONSES.inc(stage=crew_name)
             else:
-                logger.warning("Format de réponse du manager invalide")
-                return {"status": "rejeté", "final_answer": ""}
+                STAGE_MALFORMED_RESPONSES.inc(stage=crew_name)
+            return None
+        
+        logger.opt(lazy=True).info(f"Réponse valide obtenue pour {crew_name}: {{}}", lambda: preview(response))
+        return response
 
-        except Exception as e:
-            logger.error(f"Erreur lors de l'extraction de la réponse du manager: {str(e)}")
-            return {"status": "rejeté", "final_answer": ""}
+    def _get_cached_stage(self, crew_name: str, description: str) -> Optional[str]:
+        if self.stage_cache is None or self.refresh_stage_cache:
+            return None
+        cached = self.stage_cache.get(crew_name, self.agents.key, description)
+        if cached is not None:
+            logger.info(f"Résultat de l'étape {crew_name} servi depuis le cache")
+            STAGE_CACHE_HITS.inc(stage=crew_name)
+        return cached
 
-    def _execute_task(self, task: Task, crew_name: str) -> str:
-        """Exécute une tâche avec un équipage d'un seul agent et retourne la réponse."""
-        try:
-            logger.info(f"Exécution de la tâche pour {crew_name}...")
-            
-            # Vérification des paramètres
-            if not task or not task.agent:
-                logger.error(f"Tâche invalide pour {crew_name}")
-                return ""
-
-            # Modification de la description pour forcer le format de réponse
-            original_description = task.description
-            task.description = f"""INSTRUCTIONS TRÈS IMPORTANTES:
-                1. Votre réponse DOIT commencer par 'Final Answer: ' (avec un espace après les deux points)
-                2. Votre réponse doit être complète et détaillée
-                3. Ne donnez pas d'explications sur votre processus de réflexion
-                4. Répondez directement à la question
-                
-                QUESTION OU TÂCHE:
-                {original_description}
-                
-                FORMAT DE RÉPONSE REQUIS:
-                Final Answer: [Votre réponse ici]
-                
-                EXEMPLE DE RÉPONSE CORRECTE:
-                Final Answer: La ville de Grasse est la capitale mondiale du parfum..."""
-
-            # Création de l'équipage avec configuration spécifique
-            crew = Crew(
-                agents=[task.agent],
-                tasks=[task],
-                verbose=True,
-                process_timeout=120  # 2 minutes de timeout
-            )
+    def _set_cached_stage(self, crew_name: str, description: str, response: str) -> None:
+        if self.stage_cache is None:
+            return
+        if crew_name in VALIDATED_ONLY_STAGES:
+            self._pending_stages.append((crew_name, description, response))
+        else:
+            self.stage_cache.set(crew_name, self.agents.key, description, response)
+
+    def _flush_pending_stages(self, validated: bool) -> None:
+        """Met en cache les étapes en attente du verdict si la réponse est validée, les oublie sinon."""
+        pending, self._pending_stages = self._pending_stages, []
+        if validated and self.stage_cache is not None:
+            for crew_name, description, response in pending:
+                self.stage_cache.set(crew_name, self.agents.key, description, response)
+
+    def _kickoff(self, crew: Crew, crew_name: str):
+        """Exécute l'équipage (appel bloquant) en mesurant la durée et les tokens consommés."""
+        start_time = time.time()
+        with get_openai_callback() as usage:
+            result = crew.kickoff()
+        STAGE_ATTEMPT_DURATION.observe(time.time() - start_time, stage=crew_name)
+        if usage.prompt_tokens:
+            STAGE_TOKENS.inc(usage.prompt_tokens, stage=crew_name, type="prompt")
+        if usage.completion_tokens:
+            STAGE_TOKENS.inc(usage.completion_tokens, stage=crew_name, type="completion")
+        if usage.total_cost:
+            STAGE_COST.inc(usage.total_cost, stage=crew_name)
+        return result
+
+    def _record_prompt(self, crew_name: str, description: str) -> int:
+        tokens = self.prompts.count_tokens(description)
+        STAGE_PROMPT_TOKENS.observe(tokens, stage=crew_name)
+        logger.debug(f"Prompt de {crew_name}: {tokens} tokens")
+        return tokens
+
+    @staticmethod
+    def _finish_attempt(span: Span, error: Optional[BaseException]) -> None:
+        """Termine le span d'une tentative échouée : réponse invalide, délai dépassé ou erreur."""
+        if error is None:
+            span.finish(SPAN_INVALID)
+        elif isinstance(error, asyncio.TimeoutError):
+            span.finish(SPAN_TIMEOUT)
+        else:
+            span.finish(SPAN_ERROR, error=f"{type(error).__name__}: {str(error)}")
+
+    def _record_stage(self, crew_name: str, stage_start: float, retry_count: int, fallback: bool = False) -> None:
+        STAGE_DURATION.observe(time.time() - stage_start, stage=crew_name)
+        STAGE_RETRIES.observe(retry_count, stage=crew_name)
+        if fallback:
+            STAGE_FALLBACKS.inc(stage=crew_name)
+
+    def _attempt_failed(self, crew_name: str, attempt: int, error: Optional[BaseException] = None) -> Optional[float]:
+        """
+        Décide de la suite après l'échec d'une tentative.
+
+        Retourne l'attente avant la tentative suivante, ou None s'il faut abandonner :
+        erreur non récupérable, tentatives épuisées ou budget total de la requête
+        insuffisant pour attendre puis réessayer.
+        """
+        max_attempts = self.retry_policy.max_attempts
+        if error is not None:
+            STAGE_ERRORS.inc(stage=crew_name)
+            if not is_retryable(error):
+                logger.error(f"Erreur non récupérable pour {crew_name} (tentative {attempt}/{max_attempts}): {str(error)}")
+                return None
+            logger.error(f"Erreur lors de la tentative {attempt}/{max_attempts} pour {crew_name}: {str(error)}")
+
+        if attempt >= max_attempts:
+            return None
+        delay = self.retry_policy.backoff(attempt, retry_after(error) if error is not None else None)
+        if delay >= self.deadline.remaining():
+            logger.error(f"Budget de la requête insuffisant pour une nouvelle tentative de {crew_name}")
+            DEADLINE_EXCEEDED.inc(stage=crew_name)
+            return None
+        return delay
+
+    def _execute_task(self, task: Task, crew_name: str, crew_key: Optional[str] = None) -> str:
+        """
+        Exécute une tâche avec un équipage d'un seul agent et retourne la réponse.
+
+        `crew_key` distingue les équipages d'une même étape exécutés en parallèle
+        (candidats du mode spéculatif).
+        """
+        with logger.contextualize(trace_id=self.trace.trace_id), \
+                self.trace.span(crew_name, key=crew_key or crew_name) as stage_span:
+            try:
+                logger.info(f"Exécution de la tâche pour {crew_name}...")
             
-            # Variables pour le retry
-            max_retries = 3
-            retry_count = 0
-            base_delay = 5
-            min_response_length = 50  # Longueur minimale attendue pour une réponse valide
+                # Vérification des paramètres
+                if not task or not task.agent:
+                    logger.error(f"Tâche invalide pour {crew_name}")
+                    return ""
+
+                # Résultat déjà connu pour cette étape et cette description
+                description = task.description
+                cached = self._get_cached_stage(crew_name, description)
+                if cached is not None:
+                    stage_span.attributes["cached"] = True
+                    return cached
+
+                stage_span.attributes["prompt_tokens"] = self._record_prompt(crew_name, description)
+                crew = self._prepare_crew(task, crew_name, crew_key)
+                stage_start = time.time()
             
-            while retry_count < max_retries:
-                try:
-                    # Exécution de la tâche avec timeout
-                    start_time = time.time()
-                    result = crew.kickoff()
-                    execution_time = time.time() - start_time
-                    
-                    logger.info(f"Temps d'exécution pour {crew_name}: {execution_time:.2f} secondes")
+                attempt = 0
+                while not self.deadline.expired:
+                    attempt += 1
+                    error = None
+                    attempt_span = self.trace.start_span("tentative", stage_span, attempt=attempt)
+                    try:
+                        # Exécution de la tâche avec timeout
+                        start_time = time.time()
+                        result = self._kickoff(crew, crew_name)
+                        execution_time = time.time() - start_time
                     
-                    # Vérification du résultat
-                    if not result or len(result) == 0:
-                        logger.error(f"Aucun résultat obtenu pour {crew_name} (tentative {retry_count + 1}/{max_retries})")
-                        retry_count += 1
-                        time.sleep(base_delay * (retry_count + 1))
-                        continue
+                        logger.info(f"Temps d'exécution pour {crew_name}: {execution_time:.2f} secondes")
                     
-                    # Log du résultat brut
-                    raw_result = result[0]
-                    logger.debug(f"Résultat brut pour {crew_name}: {json.dumps(raw_result)}")
+                        response = self._parse_result(result, crew_name, attempt)
+                        if response is not None:
+                            attempt_span.finish()
+                            stage_span.attributes["attempts"] = attempt
+                            self._set_cached_stage(crew_name, description, response)
+                            self._record_stage(crew_name, stage_start, attempt - 1)
+                            return response
                     
-                    # Extraction de la réponse finale
-                    if "Final Answer:" in raw_result:
-                        response = raw_result.split("Final Answer:", 1)[1].strip()
-                    else:
-                        response = raw_result.strip()
+                    except Exception as e:
+                        error = e
+                    self._finish_attempt(attempt_span, error)
+                    delay = self._attempt_failed(crew_name, attempt, error)
+                    if delay is None:
+                        break
+                    attempt_span.attributes["retry_delay"] = round(delay, 3)
+                    time.sleep(delay)
+                else:
+                    logger.error(f"Délai total de la requête dépassé avant l'exécution de {crew_name}")
+                    DEADLINE_EXCEEDED.inc(stage=crew_name)
+                    stage_span.attributes["deadline_exceeded"] = True
+            
+                # Si toutes les tentatives ont échoué, on retourne une réponse d'erreur appropriée
+                logger.error(f"Échec de toutes les tentatives pour {crew_name}")
+                self._record_stage(crew_name, stage_start, max(0, attempt - 1), fallback=True)
+                stage_span.finish(SPAN_FALLBACK, attempts=attempt, fallback=True)
+                return ERROR_RESPONSES.get(crew_name, DEFAULT_ERROR_RESPONSE)
+            
+            except Exception as e:
+                logger.error(f"Erreur lors de l'exécution de la tâche pour {crew_name}: {str(e)}")
+                STAGE_FALLBACKS.inc(stage=crew_name)
+                stage_span.finish(SPAN_ERROR, fallback=True, error=str(e))
+                return ERROR_RESPONSES.get(crew_name, DEFAULT_ERROR_RESPONSE)
+
+    async def _aexecute_task(self, task: Task, crew_name: str, crew_key: Optional[str] = None) -> str:
+        """
+        Variante asynchrone de _execute_task.
+
+        L'appel LLM bloquant est délégué à l'exécuteur et chaque tentative est
+        bornée par PROCESS_TIMEOUT et par le budget restant de la requête : à
+        l'échéance, la coroutine est annulée et la tentative suivante démarre
+        avec un nouvel agent, l'appel abandonné occupant encore le précédent.
+        Les attentes entre tentatives utilisent asyncio.sleep et ne bloquent
+        aucun thread.
+        """
+        with logger.contextualize(trace_id=self.trace.trace_id), \
+                self.trace.span(crew_name, key=crew_key or crew_name) as stage_span:
+            try:
+                logger.info(f"Exécution asynchrone de la tâche pour {crew_name}...")
+            
+                # Vérification des paramètres
+                if not task or not task.agent:
+                    logger.error(f"Tâche invalide pour {crew_name}")
+                    return ""
+
+                # Résultat déjà connu pour cette étape et cette description
+                description = task.description
+                cached = self._get_cached_stage(crew_name, description)
+                if cached is not None:
+                    stage_span.attributes["cached"] = True
+                    return cached
+
+                stage_span.attributes["prompt_tokens"] = self._record_prompt(crew_name, description)
+                crew = self._prepare_crew(task, crew_name, crew_key)
+                loop = asyncio.get_running_loop()
+                stage_start = time.time()
+            
+                attempt = 0
+                while not self.deadline.expired:
+                    attempt += 1
+                    error = None
+                    attempt_span = self.trace.start_span("tentative", stage_span, attempt=attempt)
+                    try:
+                        start_time = time.time()
+                        result = await self._akickoff(crew, crew_name)
+                        execution_time = time.time() - start_time
                     
-                    # Vérification de la qualité de la réponse
-                    if len(response) < min_response_length:
-                        logger.warning(f"Réponse trop courte pour {crew_name} (tentative {retry_count + 1}/{max_retries})")
-                        retry_count += 1
-                        time.sleep(base_delay * (retry_count + 1))
-                        continue
+                        logger.info(f"Temps d'exécution pour {crew_name}: {execution_time:.2f} secondes")
                     
-                    logger.info(f"Réponse valide obtenue pour {crew_name}: {json.dumps(response)}")
-                    return response
+                        response = self._parse_result(result, crew_name, attempt)
+                        if response is not None:
+                            attempt_span.finish()
+                            stage_span.attributes["attempts"] = attempt
+                            self._set_cached_stage(crew_name, description, response)
+                            self._record_stage(crew_name, stage_start, attempt - 1)
+                            return response
                     
-                except Exception as e:
-                    logger.error(f"Erreur lors de la tentative {retry_count + 1}/{max_retries} pour {crew_name}: {str(e)}")
-                    retry_count += 1
-                    time.sleep(base_delay * (retry_count + 1))
+                    except AttemptTimeout as e:
+                        logger.error(f"Délai de {e.timeout:.1f}s dépassé pour {crew_name} (tentative {attempt}/{self.retry_policy.max_attempts})")
+                        if e.running:
+                            # L'appel bloquant continue en arrière-plan : ces agents ne doivent pas être prêtés à nouveau
+                            self.agents.reusable = False
+                        error = e
+                    except Exception as e:
+                        error = e
+                    self._finish_attempt(attempt_span, error)
+                    delay = self._attempt_failed(crew_name, attempt, error)
+                    if delay is None:
+                        break
+                    if isinstance(error, AttemptTimeout) and error.running:
+                        # Nouvel agent pour la tentative suivante, créé hors de la boucle d'événements
+                        # (pool par défaut : les threads du pool CrewAI peuvent être tous occupés)
+                        task, crew = await loop.run_in_executor(None, self._replace_agent, task, crew_name)
+                    attempt_span.attributes["retry_delay"] = round(delay, 3)
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(f"Délai total de la requête dépassé avant l'exécution de {crew_name}")
+                    DEADLINE_EXCEEDED.inc(stage=crew_name)
+                    stage_span.attributes["deadline_exceeded"] = True
             
-            # Si toutes les tentatives ont échoué, on retourne une réponse d'erreur appropriée
-            error_responses = {
-                "Prompt Manager": "Je ne peux pas reformuler votre question pour le moment. Veuillez réessayer.",
-                "AI Analyst": "Je ne peux pas générer une réponse appropriée pour le moment. Veuillez réessayer.",
-                "Quality Controller": "Score: 0.5",
-                "General Manager": "rejeté|Le système n'a pas pu générer une réponse appropriée."
-            }
+                logger.error(f"Échec de toutes les tentatives pour {crew_name}")
+                self._record_stage(crew_name, stage_start, max(0, attempt - 1), fallback=True)
+                stage_span.finish(SPAN_FALLBACK, attempts=attempt, fallback=True)
+                return ERROR_RESPONSES.get(crew_name, DEFAULT_ERROR_RESPONSE)
             
-            logger.error(f"Échec de toutes les tentatives pour {crew_name}")
-            return error_responses.get(crew_name, "Une erreur est survenue. Veuillez réessayer.")
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de l'exécution de la tâche pour {crew_name}: {str(e)}")
-            return error_responses.get(crew_name, "Une erreur est survenue. Veuillez réessayer.")
+            except asyncio.CancelledError:
+                logger.warning(f"Exécution annulée pour {crew_name}")
+                raise
+            except Exception as e:
+                logger.error(f"Erreur lors de l'exécution de la tâche pour {crew_name}: {str(e)}")
+                STAGE_FALLBACKS.inc(stage=crew_name)
+                stage_span.finish(SPAN_ERROR, fallback=True, error=str(e))
+                return ERROR_RESPONSES.get(crew_name, DEFAULT_ERROR_RESPONSE)
+
+    def _build_refine_task(self, question: str) -> Task:
+        """Tâche de reformulation de la question (Prompt Manager)."""
+        return Task(
+            description=self.prompts.render("Prompt Manager", question=question),
+            agent=self.prompt_manager
+        )
+
+    def _build_analysis_task(self, refined_question: str, variant: int = 0,
+                             agent: Optional[Agent] = None) -> Task:
+        """
+        Tâche de génération de la réponse (AI Analyst).
+
+        `variant` > 0 identifie une réponse candidate supplémentaire du mode
+        spéculatif : la consigne demande une formulation différente, ce qui
+        diversifie les candidats et leur donne une entrée distincte dans le cache
+        par étape.
+        """
+        return Task(
+            description=self.prompts.render(
+                "AI Analyst",
+                question=refined_question,
+                variant=VARIANT_INSTRUCTION.format(number=variant + 1) if variant else ""
+            ),
+            agent=agent or self.ai_analyst
+        )
+
+    def _build_quality_task(self, answer: str, agent: Optional[Agent] = None) -> Task:
+        """Tâche d'évaluation de la réponse (Quality Controller)."""
+        return Task(
+            description=self.prompts.render("Quality Controller", answer_tokens=self.answer_tokens, answer=answer),
+            agent=agent or self.quality_controller
+        )
+
+    def _build_validation_task(self, question: str, refined_question: str, answer: str, score: float) -> Task:
+        """Tâche de validation finale (General Manager)."""
+        return Task(
+            description=self.prompts.render(
+                "General Manager",
+                answer_tokens=self.answer_tokens,
+                question=question,
+                refined_question=refined_question,
+                answer=answer,
+                score=score,
+                threshold=VALIDATION_THRESHOLD
+            ),
+            agent=self.general_manager
+        )
+
+    def _skip_refinement(self, question: str) -> bool:
+        """En mode adaptatif, la reformulation est inutile pour une question déjà bien formée."""
+        if self.pipeline_mode == "adaptive" and is_well_formed_question(question):
+            logger.info("Question déjà bien formée, reformulation ignorée")
+            return True
+        return False
+
+    def _candidate_agents(self) -> List[Tuple[Agent, Agent]]:
+        """
+        Paires (AI Analyst, Quality Controller) des candidats du mode spéculatif.
+
+        Les agents CrewAI ne pouvant pas exécuter deux tâches à la fois, chaque
+        candidat a les siens : ils sont créés à la première demande et conservés
+        dans le jeu d'agents, donc réutilisés par les requêtes suivantes.
+        """
+        count = self.speculative_candidates
+        analysts = self.agents.candidates.setdefault("AI Analyst", [self.ai_analyst])
+        controllers = self.agents.candidates.setdefault("Quality Controller", [self.quality_controller])
+        while len(analysts) < count:
+            analysts.append(self.agent_factory.create_ai_analyst(self.agent_params))
+        while len(controllers) < count:
+            controllers.append(self.agent_factory.create_quality_controller(self.agent_params))
+        return list(zip(analysts[:count], controllers[:count]))
+
+    @staticmethod
+    def _candidate_key(crew_name: str, index: int) -> str:
+        # Le premier candidat utilise l'équipage (et les agents) de l'étape
+        return crew_name if index == 0 else f"{crew_name}#{index}"
+
+    def _run_candidate(self, refined_question: str, index: int, analyst: Agent,
+                       controller: Agent) -> Tuple[str, Optional[float]]:
+        """Génère puis note une réponse candidate ; score None si la génération a échoué."""
+        answer = self._execute_task(
+            self._build_analysis_task(refined_question, index, analyst),
+            "AI Analyst", self._candidate_key("AI Analyst", index)
+        )
+        if answer == ERROR_RESPONSES["AI Analyst"]:
+            return answer, None
+        quality = self._execute_task(
+            self._build_quality_task(answer, controller),
+            "Quality Controller", self._candidate_key("Quality Controller", index)
+        )
+        return answer, self._extract_score(quality)
+
+    async def _arun_candidate(self, refined_question: str, index: int, analyst: Agent,
+                              controller: Agent) -> Tuple[str, Optional[float]]:
+        """Variante asynchrone de _run_candidate."""
+        answer = await self._aexecute_task(
+            self._build_analysis_task(refined_question, index, analyst),
+            "AI Analyst", self._candidate_key("AI Analyst", index)
+        )
+        if answer == ERROR_RESPONSES["AI Analyst"]:
+            return answer, None
+        quality = await self._aexecute_task(
+            self._build_quality_task(answer, controller),
+            "Quality Controller", self._candidate_key("Quality Controller", index)
+        )
+        return answer, self._extract_score(quality)
+
+    def _select_candidate(self, candidates: List[Tuple[str, Optional[float]]]) -> Tuple[str, float]:
+        """Retient la candidate la mieux notée (la première en cas d'égalité)."""
+        scored = [(score, -index, answer) for index, (answer, score) in enumerate(candidates) if score is not None]
+        SPECULATIVE_CANDIDATES.inc(len(candidates) - len(scored), outcome="failed")
+        if not scored:
+            logger.error("Aucune réponse candidate n'a pu être générée")
+            return ERROR_RESPONSES["AI Analyst"], 0.0
+
+        score, index, answer = max(scored)
+        SPECULATIVE_CANDIDATES.inc(outcome="selected")
+        SPECULATIVE_CANDIDATES.inc(len(scored) - 1, outcome="discarded")
+        logger.info(f"Candidate n°{1 - index} retenue (scores: {[score for _, score in candidates]})")
+        return answer, score
+
+    def _speculate(self, refined_question: str) -> Tuple[str, float]:
+        """Génère et note les réponses candidates en parallèle, puis retient la meilleure."""
+        pairs = self._candidate_agents()
+        with ThreadPoolExecutor(max_workers=len(pairs), thread_name_prefix="candidate") as pool:
+            futures = [
+                pool.submit(self._run_candidate, refined_question, index, analyst, controller)
+                for index, (analyst, controller) in enumerate(pairs)
+            ]
+            candidates = [future.result() for future in futures]
+        return self._select_candidate(candidates)
+
+    async def _aspeculate(self, refined_question: str) -> Tuple[str, float]:
+        """
+        Variante asynchrone de _speculate.
+
+        Chaque candidate est notée dès que sa réponse est prête, sans attendre
+        les autres : la durée de l'étape reste proche de celle d'une seule passe.
+        """
+        # Création éventuelle des agents hors de la boucle d'événements
+        pairs = await asyncio.get_running_loop().run_in_executor(self.executor, self._candidate_agents)
+        candidates = await asyncio.gather(*(
+            self._arun_candidate(refined_question, index, analyst, controller)
+            for index, (analyst, controller) in enumerate(pairs)
+        ))
+        return self._select_candidate(list(candidates))
+
+    def _semantic_lookup(self, question: str, refined_question: str) -> Optional[Dict]:
+        """
+        Réponse finale d'une question reformulée similaire déjà validée.
+
+        Le Prompt Manager ramène les paraphrases à une formulation commune : une
+        question absente du cache sous sa forme d'origine peut y être trouvée
+        après la seule reformulation, sans exécuter les étapes suivantes.
+        """
+        if self.semantic_cache is None or refined_question == ERROR_RESPONSES["Prompt Manager"]:
+            return None
+        # Question transmise telle quelle : déjà recherchée par le service
+        if normalize_question(refined_question) == normalize_question(question):
+            return None
+        cached = self.semantic_cache.get(
+            refined_question, response_config_key(self.agent_params, self.pipeline_mode), on="refined_question"
+        )
+        if cached is None:
+            return None
+        self.trace.attributes["semantic_cache"] = "refined_question"
+        return {
+            "answer": cached.initial_answer,
+            "score": cached.quality_score,
+            "manager_response": {"status": cached.status, "final_answer": cached.final_answer},
+        }
+
+    def _decide_validation(self, answer: str, score: float) -> Dict[str, str]:
+        """Applique dans le code la règle de validation du General Manager (mode adaptatif)."""
+        if score >= VALIDATION_THRESHOLD:
+            return {"status": STATUS_VALIDATED, "final_answer": answer}
+        return {
+            "status": STATUS_REJECTED,
+            "final_answer": f"Score de qualité insuffisant ({score:.2f} < {VALIDATION_THRESHOLD})."
+        }
+
+    def _build_response(self, question: str, refined_question: str, answer: str, score: float,
+                        manager_response: Dict[str, str], stages: List[str]) -> Dict:
+        """Assemble la réponse finale à partir des résultats des étapes."""
+        logger.opt(lazy=True).info("Validation du manager: {}", lambda: preview(manager_response))
+        self._flush_pending_stages(manager_response["status"] == STATUS_VALIDATED)
+        
+        # Préparation de la réponse finale
+        response = {
+            "original_question": question,
+            "refined_question": refined_question,
+            "initial_answer": answer,
+            "quality_score": score,
+            "status": manager_response["status"],
+            "final_answer": manager_response["final_answer"],
+            "stages": stages
+        }
+        
+        logger.opt(lazy=True).info("Réponse finale préparée: {}", lambda: preview(response))
+        return response
 
     def process_question(self, question: str) -> Dict:
         try:
-            logger.info(f"Début du traitement de la question: {json.dumps(question)}")
+            logger.opt(lazy=True).info("Début du traitement de la question: {}", lambda: preview(question))
+            self.deadline = self.retry_policy.start_deadline()
+            stages = []
             
             # Création et exécution de la tâche de reformulation
-            task1 = Task(
-                description=f"""INSTRUCTIONS TRÈS IMPORTANTES:
-                Votre tâche est de reformuler la question suivante de manière claire et précise : 
-                "{question}"
-                
-                RÈGLES À SUIVRE:
-                1. Gardez la même intention que la question originale
-                2. Soyez clair et direct
-                3. Ne changez pas le sens de la question
-                4. Utilisez un français correct
-                5. Ne donnez AUCUNE explication ou commentaire
-                
-                FORMAT DE RÉPONSE REQUIS:
-                Final Answer: [VOTRE QUESTION REFORMULÉE]
-                
-                EXEMPLE:
-                Si la question est "c koi Grasse?", votre réponse devrait être:
-                Final Answer: Pouvez-vous décrire la ville de Grasse et ses caractéristiques principales ?""",
-                agent=self.prompt_manager
-            )
-            refined_question = self._execute_task(task1, "Prompt Manager")
-            logger.info(f"Question reformulée: {json.dumps(refined_question)}")
-
-            # Création et exécution de la tâche d'analyse
-            task2 = Task(
-                description=f"""Générez une réponse détaillée et précise à cette question : {refined_question}
-                IMPORTANT: Votre réponse doit être concise mais complète.
-                Concentrez-vous sur les faits les plus importants.
-                
-                Répondez directement avec les informations, sans formules de politesse.
-                
-                Format de réponse attendu:
-                Final Answer: [VOTRE RÉPONSE]""",
-                agent=self.ai_analyst
-            )
-            answer = self._execute_task(task2, "AI Analyst")
-            logger.info(f"Réponse générée: {json.dumps(answer)}")
-
-            # Création et exécution de la tâche d'évaluation
-            task3 = Task(
-                description=f"""Évaluez la qualité et la pertinence de cette réponse : {answer}
-                IMPORTANT: Vous devez fournir UNIQUEMENT un score numérique au format 'Score: X.XX'.
-                Exemple: 'Score: 0.95'
-                Ne donnez aucune autre information ou explication.
-                
-                Format de réponse attendu:
-                Final Answer: Score: [VOTRE SCORE]""",
-                agent=self.quality_controller
-            )
-            quality = self._execute_task(task3, "Quality Controller")
-            score = self._extract_score(quality)
+            if self._skip_refinement(question):
+                refined_question = question.strip()
+            else:
+                refined_question = self._execute_task(self._build_refine_task(question), "Prompt Manager")
+                stages.append("Prompt Manager")
+            logger.opt(lazy=True).info("Question reformulée: {}", lambda: preview(refined_question))
+
+            cached = self._semantic_lookup(question, refined_question)
+            if cached is not None:
+                return self._build_response(question, refined_question, cached["answer"], cached["score"],
+                                            cached["manager_response"], stages)
+
+            if self.pipeline_mode == "speculative":
+                # Réponses candidates générées et notées en parallèle
+                answer, score = self._speculate(refined_question)
+                stages.extend(["AI Analyst", "Quality Controller"])
+                logger.opt(lazy=True).info("Réponse retenue: {}", lambda: preview(answer))
+            else:
+                # Création et exécution de la tâche d'analyse
+                answer = self._execute_task(self._build_analysis_task(refined_question), "AI Analyst")
+                stages.append("AI Analyst")
+                logger.opt(lazy=True).info("Réponse générée: {}", lambda: preview(answer))
+
+                # Création et exécution de la tâche d'évaluation
+                quality = self._execute_task(self._build_quality_task(answer), "Quality Controller")
+                stages.append("Quality Controller")
+                score = self._extract_score(quality)
             logger.info(f"Score de qualité: {score}")
 
             # Création et exécution de la tâche de validation
-            task4 = Task(
-                description=f"""Validez la réponse finale et envoyez-la.
-                
-                Question initiale: {question}
-                Question reformulée: {refined_question}
-                Réponse proposée: {answer}
-                Score de qualité: {score}
-                
-                IMPORTANT: Si le score est >= 0.7, vous devez valider la réponse.
-                Si le score est < 0.7, vous devez rejeter la réponse.
-                
-                Format de réponse attendu:
-                Final Answer: validé|[COPIEZ LA RÉPONSE ICI SI ELLE EST SATISFAISANTE]
-                ou
-                Final Answer: rejeté|[RAISON DU REJET]""",
-                agent=self.general_manager
-            )
-            manager_result = self._execute_task(task4, "General Manager")
-            manager_response = self._extract_manager_response(manager_result)
-            logger.info(f"Validation du manager: {json.dumps(manager_response)}")
-            
-            # Préparation de la réponse finale
-            response = {
-                "original_question": question,
-                "refined_question": refined_question,
-                "initial_answer": answer,
-                "quality_score": score,
-                "status": manager_response["status"],
-                "final_answer": manager_response["final_answer"]
-            }
+            if self.pipeline_mode == "adaptive":
+                manager_response = self._decide_validation(answer, score)
+            else:
+                manager_result = self._execute_task(
+                    self._build_validation_task(question, refined_question, answer, score),
+                    "General Manager"
+                )
+                stages.append("General Manager")
+                manager_response = self._extract_manager_response(manager_result, answer)
+            return self._build_response(question, refined_question, answer, score, manager_response, stages)
+
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement de la question: {str(e)}")
+            logger.exception("Détails de l'erreur:")
+            raise
+
+    async def astream_question(self, question: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Traite la question et publie le résultat de chaque étape dès qu'il est disponible.
+
+        Produit successivement les événements `refined_question`, `initial_answer`,
+        `quality_score` puis `response` (réponse finale complète).
+        """
+        try:
+            logger.opt(lazy=True).info("Début du traitement asynchrone de la question: {}", lambda: preview(question))
+            self.deadline = self.retry_policy.start_deadline()
+            stages = []
             
-            logger.info(f"Réponse finale préparée: {json.dumps(response, ensure_ascii=False)}")
-            return response
+            if self._skip_refinement(question):
+                refined_question = question.strip()
+            else:
+                refined_question = await self._aexecute_task(self._build_refine_task(question), "Prompt Manager")
+                stages.append("Prompt Manager")
+            logger.opt(lazy=True).info("Question reformulée: {}", lambda: preview(refined_question))
+            yield "refined_question", refined_question
+
+            cached = self._semantic_lookup(question, refined_question)
+            if cached is not None:
+                yield "initial_answer", cached["answer"]
+                yield "quality_score", cached["score"]
+                yield "response", self._build_response(question, refined_question, cached["answer"], cached["score"],
+                                                       cached["manager_response"], stages)
+                return
 
+            if self.pipeline_mode == "speculative":
+                answer, score = await self._aspeculate(refined_question)
+                stages.extend(["AI Analyst", "Quality Controller"])
+                logger.opt(lazy=True).info("Réponse retenue: {}", lambda: preview(answer))
+                yield "initial_answer", answer
+            else:
+                answer = await self._aexecute_task(self._build_analysis_task(refined_question), "AI Analyst")
+                stages.append("AI Analyst")
+                logger.opt(lazy=True).info("Réponse générée: {}", lambda: preview(answer))
+                yield "initial_answer", answer
+
+                quality = await self._aexecute_task(self._build_quality_task(answer), "Quality Controller")
+                stages.append("Quality Controller")
+                score = self._extract_score(quality)
+            logger.info(f"Score de qualité: {score}")
+            yield "quality_score", score
+
+            if self.pipeline_mode == "adaptive":
+                manager_response = self._decide_validation(answer, score)
+            else:
+                manager_result = await self._aexecute_task(
+                    self._build_validation_task(question, refined_question, answer, score),
+                    "General Manager"
+                )
+                stages.append("General Manager")
+                manager_response = self._extract_manager_response(manager_result, answer)
+            yield "response", self._build_response(question, refined_question, answer, score, manager_response, stages)
+
+        except asyncio.CancelledError:
+            logger.warning("Traitement de la question annulé")
+            self.agents.reusable = False
+            raise
         except Exception as e:
             logger.error(f"Erreur lors du traitement de la question: {str(e)}")
             logger.exception("Détails de l'erreur:")
-            raise 
\ No newline at end of file
+            raise
+
+    async def aprocess_question(self, question: str) -> Dict:
+        """Variante asynchrone de process_question, basée sur _aexecute_task."""
+        response: Dict = {}
+        async for event, data in self.astream_question(question):
+            if event == "response":
+                response = data
+        return response
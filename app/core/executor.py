@@ -0,0 +1,102 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.core.metrics import REJECTED_REQUESTS
+from app.core.rate_limit import parse_client_table
+from app.core.scheduler import FairScheduler
+
+
+class CrewPoolSaturated(Exception):
+    """Levée lorsque le nombre de questions en cours atteint la limite autorisée."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Le pool d'exécution CrewAI est saturé")
+        self.retry_after = retry_after
+
+
+class CrewExecutor:
+    """
+    Pool de threads dédié au pipeline CrewAI, avec contrôle d'admission.
+
+    Le pipeline étant synchrone (appels LLM bloquants), il est exécuté hors de la
+    boucle d'événements pour que `/health` et les autres requêtes restent réactifs.
+    Le nombre de questions en cours est borné : au-delà, la requête est refusée
+    immédiatement plutôt que mise en file indéfiniment. Les places sont
+    partagées équitablement entre clients (voir FairScheduler).
+    """
+
+    def __init__(self, max_workers: int = 4, max_in_flight: int = 8, retry_after: int = 10,
+                 client_weights: Optional[Dict[str, float]] = None, client_max_in_flight: Optional[int] = None):
+        self.max_workers = max_workers
+        self.max_in_flight = max(max_in_flight, 1)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew")
+        self.scheduler = FairScheduler(self.max_in_flight, client_weights, client_max_in_flight)
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls) -> "CrewExecutor":
+        """Construit l'exécuteur à partir des variables d'environnement."""
+        max_workers = int(os.getenv("CREW_MAX_WORKERS", "4"))
+        max_in_flight = int(os.getenv("CREW_MAX_IN_FLIGHT", str(max_workers * 2)))
+        weights = {client: float(weight) for client, weight in parse_client_table(os.getenv("CLIENT_WEIGHTS", "")).items()}
+        return cls(
+            max_workers=max_workers,
+            max_in_flight=max_in_flight,
+            retry_after=int(os.getenv("CREW_RETRY_AFTER", "10")),
+            client_weights=weights,
+            # Par défaut, un client ne peut occuper que la moitié des places
+            client_max_in_flight=int(os.getenv("CLIENT_MAX_IN_FLIGHT", str(max(1, max_in_flight // 2)))),
+        )
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        return self._pool
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False, client: str = ""):
+        """
+        Réserve une place d'exécution pour un client.
+
+        Par défaut, lève CrewPoolSaturated immédiatement si aucune place n'est
+        disponible pour ce client (pool saturé ou part du client atteinte) ; avec
+        `wait=True` (lots, jobs), attend son tour dans la file du client.
+        """
+        if wait:
+            await self.scheduler.acquire(client)
+        elif not self.scheduler.try_acquire(client):
+            logger.warning(f"Pool CrewAI saturé pour le client {client or 'anonyme'} "
+                           f"({self._in_flight}/{self.max_in_flight} en cours)")
+            REJECTED_REQUESTS.inc()
+            raise CrewPoolSaturated(self.retry_after)
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self.scheduler.release(client)
+
+    async def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Exécute une fonction bloquante dans le pool dédié."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Réserve une place puis exécute la fonction dans le pool dédié."""
+        async with self.slot():
+            return await self.call(func, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        logger.info("Arrêt du pool d'exécution CrewAI")
+        self._pool.shutdown(wait=False, cancel_futures=True)
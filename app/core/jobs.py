@@ -0,0 +1,464 @@
+import asyncio
+import http.client
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from app.models.schemas import QuestionRequest
+
+# Statuts possibles d'un job
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Attente maximale (secondes) d'un worker de jobs après des erreurs successives de la base
+MAX_WORKER_BACKOFF = 30
+
+
+class CallbackUrlError(ValueError):
+    """URL de rappel refusée (schéma, hôte non autorisé ou adresse interne)."""
+
+
+def check_callback_url(url: str, allowed_hosts: Optional[Set[str]] = None) -> Optional[str]:
+    """
+    Vérifie qu'une URL de rappel ne vise pas le réseau interne du serveur.
+
+    Avec une liste d'hôtes autorisés, seuls ces hôtes sont acceptés (y compris sur
+    le réseau interne). Sans liste, l'hôte est résolu et toutes ses adresses doivent
+    être publiques : boucle locale, réseaux privés, lien local (métadonnées cloud,
+    169.254.169.254) et adresses réservées sont refusés. Lève CallbackUrlError.
+
+    Retourne l'adresse vérifiée à laquelle se connecter (None pour un hôte de la
+    liste) : une nouvelle résolution au moment de la connexion pourrait donner une
+    autre adresse (DNS rebinding).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise CallbackUrlError("callback_url doit être une URL http(s)")
+    host = parts.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise CallbackUrlError(f"Hôte de callback_url non autorisé: {host}")
+        return None
+
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = list(dict.fromkeys(info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)))
+    except (OSError, ValueError) as e:
+        raise CallbackUrlError(f"Hôte de callback_url introuvable: {host}") from e
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if ip.is_multicast or not ip.is_global:
+            raise CallbackUrlError(f"callback_url vise une adresse interne: {host} ({ip})")
+    return addresses[0]
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connexion HTTP à une adresse déjà vérifiée ; l'en-tête Host reste celui de l'URL."""
+
+    def __init__(self, host: str, address: Optional[str], **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address or host
+
+    def connect(self) -> None:
+        self.sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """Connexion HTTPS à une adresse déjà vérifiée ; SNI et certificat vérifiés pour l'hôte de l'URL."""
+
+    def __init__(self, host: str, address: Optional[str], **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address or host
+
+    def connect(self) -> None:
+        sock = socket.create_connection((self.address, self.port), self.timeout, self.source_address)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def post_json(url: str, payload: Dict, address: Optional[str], timeout: float) -> int:
+    """
+    Envoie `payload` en POST (JSON) à `url` en se connectant à `address` ; retourne
+    le statut HTTP. Les redirections ne sont pas suivies : elles contourneraient
+    la vérification de l'URL.
+    """
+    parts = urlsplit(url)
+    connection_class = _PinnedHTTPSConnection if parts.scheme == "https" else _PinnedHTTPConnection
+    connection = connection_class(parts.hostname, address, port=parts.port, timeout=timeout)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    try:
+        connection.request(
+            "POST", path, body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+class JobStore:
+    """
+    File de jobs persistée dans une base SQLite locale.
+
+    Un job en cours est loué à l'instance qui le traite (identifiant propre au
+    processus et à son démarrage) jusqu'à `lease_until`, bail prolongé
+    régulièrement pendant le traitement. Un job dont le bail a expiré (processus
+    ou conteneur arrêté) est remis en attente et repris par une autre instance ;
+    les identifiants de processus ne sont pas utilisés, car ils sont réattribués
+    après le redémarrage d'un conteneur.
+    """
+
+    def __init__(self, path: str, lease: float = 60):
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._instance = ""
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Une connexion par processus : avec gunicorn --preload, les workers ne
+        # réutilisent pas la connexion éventuellement ouverte par le processus maître
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+            self._instance = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+        return self._connection
+
+    @property
+    def instance(self) -> str:
+        """Identifiant de l'instance (processus depuis son démarrage) qui loue les jobs."""
+        self._conn  # Attribué à l'ouverture de la connexion du processus
+        return self._instance
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, callback_url TEXT, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "client TEXT NOT NULL DEFAULT '', instance TEXT, lease_until REAL)"
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "instance" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN instance TEXT")
+        if "lease_until" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        if "client" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN client TEXT NOT NULL DEFAULT ''")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        conn.commit()
+        return conn
+
+    def create(self, request: QuestionRequest, callback_url: Optional[str] = None, client: str = "") -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, callback_url, created_at, updated_at, client) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_PENDING, request.model_dump_json(), callback_url, now, now, client),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def claim_next(self) -> Optional[Dict]:
+        """
+        Passe le prochain job en attente au statut `running` et le retourne.
+
+        Le job choisi est le plus ancien du client ayant le moins de jobs en cours :
+        un client qui soumet de nombreux jobs ne retarde pas ceux des autres.
+        La réservation est atomique entre processus (transaction IMMEDIATE) : plusieurs
+        workers gunicorn peuvent consommer la même file sans traiter deux fois un job.
+        Les jobs dont le bail a expiré sont remis en attente au passage.
+        """
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._requeue_expired(conn, now)
+                row = conn.execute(
+                    "SELECT * FROM jobs AS job WHERE status = ? ORDER BY ("
+                    "SELECT COUNT(*) FROM jobs AS running WHERE running.status = ? AND running.client = job.client"
+                    "), created_at LIMIT 1",
+                    (JOB_PENDING, JOB_RUNNING),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, instance = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (JOB_RUNNING, self._instance, now + self.lease, now, row["id"]),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        if row is None:
+            return None
+        job = self._to_dict(row)
+        job["status"] = JOB_RUNNING
+        return job
+
+    def complete(self, job_id: str, result: Dict) -> bool:
+        return self._finish(job_id, JOB_COMPLETED, result=json.dumps(result, ensure_ascii=False))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._finish(job_id, JOB_FAILED, error=error)
+
+    def renew(self, job_id: str) -> bool:
+        """Prolonge le bail d'un job en cours ; False si l'instance ne le détient plus."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ? AND instance = ?",
+                (time.time() + self.lease, job_id, JOB_RUNNING, self._instance),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def release(self, job_id: str) -> None:
+        """Remet immédiatement en attente un job en cours de l'instance (arrêt du serveur)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, instance = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND instance = ?",
+                (JOB_PENDING, time.time(), job_id, JOB_RUNNING, self._instance),
+            )
+            self._conn.commit()
+
+    def requeue_expired(self) -> int:
+        """Remet en attente les jobs en cours dont le bail a expiré (instance arrêtée)."""
+        with self._lock:
+            count = self._requeue_expired(self._conn, time.time())
+            self._conn.commit()
+        return count
+
+    @staticmethod
+    def _requeue_expired(conn: sqlite3.Connection, now: float) -> int:
+        # Les jobs sans bail (base antérieure aux baux) sont considérés comme expirés
+        cursor = conn.execute(
+            "UPDATE jobs SET status = ?, instance = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+            (JOB_PENDING, now, JOB_RUNNING, now),
+        )
+        return cursor.rowcount
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> bool:
+        # Un job dont le bail a expiré a pu être repris par une autre instance : son résultat prime
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, instance = NULL, lease_until = NULL, "
+                "updated_at = ? WHERE id = ? AND status = ? AND instance = ?",
+                (status, result, error, time.time(), job_id, JOB_RUNNING, self._instance),
+            )
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "request": json.loads(row["request"]),
+            "callback_url": row["callback_url"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+            "client": row["client"],
+        }
+
+
+class JobQueue:
+    """
+    Traitement en arrière-plan des jobs de questions.
+
+    Les jobs sont lus depuis le JobStore par un ensemble de workers asynchrones qui
+    s'appuient sur le QuestionService ; les jobs interrompus (arrêt ou
+    redémarrage d'une instance) sont repris à l'expiration de leur bail. Si une
+    URL de rappel est fournie, le job terminé y est envoyé en POST (JSON) ; l'URL
+    est vérifiée à la soumission et de nouveau à l'envoi (check_callback_url).
+    Les accès à la base SQLite sont exécutés hors de la boucle d'événements.
+    """
+
+    def __init__(self, service, store: JobStore, workers: int = 2, poll_interval: float = 1.0,
+                 callback_timeout: float = 10, callback_allowed_hosts: Optional[Set[str]] = None):
+        self.service = service
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.callback_timeout = callback_timeout
+        self.callback_allowed_hosts = callback_allowed_hosts or set()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Nombre de jobs par statut, relu périodiquement hors de la boucle (métriques)
+        self.counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, service) -> "JobQueue":
+        """Construit la file de jobs à partir des variables d'environnement."""
+        return cls(
+            service,
+            JobStore(os.getenv("JOBS_DB_PATH", "jobs.sqlite3"), lease=float(os.getenv("JOBS_LEASE_SECONDS", "60"))),
+            workers=int(os.getenv("JOBS_WORKERS", "2")),
+            poll_interval=float(os.getenv("JOBS_POLL_INTERVAL", "1.0")),
+            callback_timeout=float(os.getenv("JOBS_CALLBACK_TIMEOUT", "10")),
+            callback_allowed_hosts={
+                host.strip().lower() for host in os.getenv("JOBS_CALLBACK_ALLOWED_HOSTS", "").split(",")
+                if host.strip()
+            },
+        )
+
+    def start(self) -> None:
+        requeued = self.store.requeue_expired()
+        if requeued:
+            logger.info(f"{requeued} job(s) interrompu(s) remis en attente")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._refresh_counts()))
+        logger.info(f"File de jobs démarrée avec {self.workers} worker(s)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _store(self, method: Callable, *args):
+        """Exécute une opération du JobStore (SQLite, bloquante) dans le pool de threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, method, *args)
+
+    async def check_callback_url(self, url: str) -> None:
+        """Vérifie une URL de rappel (résolution DNS hors de la boucle) ; lève CallbackUrlError."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, check_callback_url, url, self.callback_allowed_hosts)
+
+    async def submit(self, request: QuestionRequest, callback_url: Optional[str] = None, client: str = "") -> str:
+        job_id = await self._store(self.store.create, request, callback_url, client)
+        logger.info(f"Job {job_id} créé")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self._store(self.store.get, job_id)
+
+    async def _worker(self, worker_id: int) -> None:
+        failures = 0
+        while True:
+            try:
+                job = await self._store(self.store.claim_next)
+                if job is not None:
+                    await self._run_job(job)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Base verrouillée ou indisponible : le worker attend puis réessaie. Un job
+                # réservé mais non terminé est repris à l'expiration de son bail.
+                failures += 1
+                delay = min(self.poll_interval * 2 ** failures, MAX_WORKER_BACKOFF)
+                logger.error(f"Erreur du worker de jobs {worker_id}: {str(e)} (nouvel essai dans {delay:.1f}s)")
+                await asyncio.sleep(delay)
+                continue
+
+            if job is None:
+                # Attente d'un nouveau job (ou scrutation périodique de la base)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _refresh_counts(self) -> None:
+        """
+        Relit le nombre de jobs par statut toutes les `poll_interval` secondes.
+
+        La collecte des métriques lit `counts` sans accéder à la base : elle ne
+        peut pas bloquer la boucle d'événements derrière une réservation en cours.
+        """
+        while True:
+            try:
+                self.counts = await self._store(self.store.count_by_status)
+            except Exception as e:
+                logger.warning(f"Lecture du nombre de jobs impossible: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Prolonge le bail du job tant qu'il est traité."""
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            if not await self._store(self.store.renew, job_id):
+                logger.warning(f"Bail du job {job_id} perdu (expiré ou repris par une autre instance)")
+                return
+
+    async def _run_job(self, job: Dict) -> None:
+        job_id = job["job_id"]
+        logger.info(f"Traitement du job {job_id}")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            request = QuestionRequest(**job["request"])
+            response, _ = await self.service.answer(request, wait=True, client=job["client"], trace_id=job_id)
+            finished = await self._store(self.store.complete, job_id, response.model_dump())
+            logger.info(f"Job {job_id} terminé")
+        except asyncio.CancelledError:
+            # Arrêt du serveur : le job est remis en attente (sinon, repris à l'expiration de son bail)
+            # (appel direct : la tâche est annulée, le pool de threads peut être en cours d'arrêt)
+            self.store.release(job_id)
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement du job {job_id}: {str(e)}")
+            finished = await self._store(
+                self.store.fail, job_id, f"Erreur lors du traitement de la question: {str(e)}"
+            )
+        finally:
+            heartbeat.cancel()
+
+        if not finished:
+            logger.warning(f"Job {job_id} repris par une autre instance, résultat ignoré")
+            return
+        if job["callback_url"]:
+            await self._store(self._send_callback, job["callback_url"], job_id)
+
+    def _send_callback(self, url: str, job_id: str) -> None:
+        # Nouvelle vérification à l'envoi (la résolution DNS a pu changer depuis la
+        # soumission), puis connexion à l'adresse vérifiée
+        try:
+            address = check_callback_url(url, self.callback_allowed_hosts)
+        except CallbackUrlError as e:
+            logger.error(f"Rappel refusé pour le job {job_id}: {str(e)}")
+            return
+        job = self.store.get(job_id)
+        payload = {key: job[key] for key in ("job_id", "status", "result", "error")}
+        try:
+            status = post_json(url, payload, address, self.callback_timeout)
+        except Exception as e:
+            logger.error(f"Échec de l'envoi du rappel pour le job {job_id}: {str(e)}")
+            return
+        if status >= 300:
+            logger.error(f"Échec de l'envoi du rappel pour le job {job_id} (HTTP {status})")
+        else:
+            logger.info(f"Rappel envoyé pour le job {job_id} (HTTP {status})")
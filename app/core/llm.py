@@ -0,0 +1,189 @@
+import os
+import random
+import threading
+import time
+from typing import Any, ClassVar, Dict, List, Optional
+
+import openai
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from loguru import logger
+
+from app.core.agent_config import DEFAULT_MODEL, FALLBACK_MODEL
+from app.core.metrics import LLM_MODEL_FALLBACKS
+
+# Backends LLM disponibles : "openai" (API OpenAI) ou "fake" (réponses locales
+# préenregistrées, pour les benchmarks et le développement hors ligne)
+LLM_BACKENDS = ("openai", "fake")
+
+# Réponses préenregistrées du backend "fake", par rôle d'agent
+FAKE_RESPONSES = {
+    "Prompt Manager": "Pouvez-vous décrire la ville de Grasse, son histoire et ses principales caractéristiques ?",
+    "AI Analyst": (
+        "Grasse est une commune des Alpes-Maritimes, considérée comme la capitale mondiale du parfum. "
+        "Son industrie de la parfumerie s'est développée au XVIIIe siècle à partir de la ganterie, "
+        "grâce à la culture du jasmin, de la rose centifolia et de la tubéreuse. La ville abrite "
+        "aujourd'hui de grandes maisons de parfumerie, le Musée international de la parfumerie et un "
+        "savoir-faire inscrit au patrimoine culturel immatériel de l'UNESCO depuis 2018."
+    ),
+    "Quality Controller": "Score: 0.85 - Réponse précise, complète et bien structurée.",
+    "General Manager": "validé|Score supérieur au seuil, réponse exacte et complète.",
+}
+FAKE_DEFAULT_RESPONSE = "Réponse simulée par le backend LLM local, sans appel à un service externe."
+FAKE_SUMMARY_RESPONSE = "L'agent a répondu à la question posée sur la ville de Grasse."
+# Latence relative des modèles simulés (1.0 pour les modèles absents de la table)
+FAKE_MODEL_LATENCY_FACTORS = {
+    "gpt-4": 1.0,
+    "gpt-3.5-turbo": 0.3,
+}
+
+# Erreurs d'appel pour lesquelles le modèle de repli prend le relais
+FALLBACK_ERRORS = (openai.APITimeoutError, TimeoutError)
+
+
+class FakeLLMError(Exception):
+    """Échec simulé d'un appel LLM (équivalent d'une erreur HTTP du fournisseur)."""
+
+    def __init__(self, message: str, status_code: int = 503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Modèle de conversation local qui retourne des réponses préenregistrées.
+
+    La réponse dépend du rôle de l'agent et respecte le format ReAct attendu
+    par CrewAI (`Final Answer: ...`). La latence (moyenne et gigue relative) et
+    le taux d'échec sont configurables ; le tirage aléatoire est initialisé avec
+    une graine pour que les exécutions soient reproductibles. Comme un modèle
+    réel, la latence dépend du modèle simulé, la réponse est tronquée à
+    `max_tokens` et un appel plus long que `timeout` échoue.
+    """
+
+    role: str = ""
+    latency: float = 0.5
+    jitter: float = 0.2
+    failure_rate: float = 0.0
+    seed: int = 0
+    model_name: str = "fake"
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+    _rng: Any = PrivateAttr(default=None)
+
+    # Nombre total d'appels, tous modèles confondus
+    calls: ClassVar[int] = 0
+    _calls_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(f"{self.seed}:{self.role}")
+
+    @classmethod
+    def from_env(cls, role: str, **kwargs: Any) -> "FakeChatModel":
+        """Construit le modèle à partir des variables d'environnement."""
+        return cls(
+            role=role,
+            latency=float(os.getenv("LLM_FAKE_LATENCY", "0.5")),
+            jitter=float(os.getenv("LLM_FAKE_JITTER", "0.2")),
+            failure_rate=float(os.getenv("LLM_FAKE_FAILURE_RATE", "0")),
+            seed=int(os.getenv("LLM_FAKE_SEED", "0")),
+            **kwargs,
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @classmethod
+    def reset_calls(cls) -> None:
+        with cls._calls_lock:
+            cls.calls = 0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        with FakeChatModel._calls_lock:
+            FakeChatModel.calls += 1
+            delay = self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.failure_rate
+        delay = max(0.0, delay * FAKE_MODEL_LATENCY_FACTORS.get(self.model_name, 1.0))
+        if self.timeout is not None and delay > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(f"Délai de {self.timeout}s dépassé pour {self.model_name}")
+        time.sleep(delay)
+        if failed:
+            raise FakeLLMError(f"Échec simulé de l'appel LLM pour {self.role or 'agent'}")
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "summarize" in prompt.lower() and "Final Answer" not in prompt:
+            # Résumé de conversation demandé par la mémoire des agents CrewAI
+            content = FAKE_SUMMARY_RESPONSE
+        else:
+            answer = FAKE_RESPONSES.get(self.role, FAKE_DEFAULT_RESPONSE)
+            content = f"Thought: Je connais maintenant la réponse.\nFinal Answer: {answer}"
+        if self.max_tokens is not None:
+            # Environ 4 caractères par token, comme pour le décompte ci-dessous
+            content = content[:self.max_tokens * 4]
+
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        }
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+
+def llm_backend() -> str:
+    """Backend LLM sélectionné par la variable d'environnement LLM_BACKEND."""
+    backend = os.getenv("LLM_BACKEND", "openai").lower()
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Backend LLM inconnu: {backend}")
+    return backend
+
+
+def _chat_model(role: str, model: str, config: Dict) -> BaseChatModel:
+    """Modèle de conversation du backend configuré, paramétré par la configuration de l'agent."""
+    if llm_backend() == "fake":
+        return FakeChatModel.from_env(
+            role, model_name=model, max_tokens=config.get("max_tokens"), timeout=config.get("timeout")
+        )
+    return ChatOpenAI(
+        model=model,
+        temperature=config.get("temperature", 0.7),
+        max_tokens=config.get("max_tokens"),
+        timeout=config.get("timeout"),
+        # Les nouvelles tentatives sont gérées par la politique du pipeline (RetryPolicy)
+        max_retries=0,
+    )
+
+
+def create_llm(role: str, config: Optional[Dict] = None) -> Runnable:
+    """
+    Crée le modèle de langage d'un agent selon le backend configuré.
+
+    Le modèle, la température, le plafond `max_tokens` et le délai d'appel sont
+    ceux de la configuration fusionnée de l'agent. Si un appel dépasse son
+    délai, il est repris par le modèle de repli (`fallback_model`).
+    """
+    config = config or {}
+    model = config.get("model") or DEFAULT_MODEL
+    llm = _chat_model(role, model, config)
+
+    fallback_model = config.get("fallback_model", FALLBACK_MODEL)
+    if not fallback_model or fallback_model == model:
+        return llm
+
+    def on_fallback(run) -> None:
+        LLM_MODEL_FALLBACKS.inc(model=model)
+        logger.warning(f"Délai dépassé pour {role} avec {model}, reprise avec {fallback_model}")
+
+    fallback = _chat_model(role, fallback_model, config).with_listeners(on_start=on_fallback)
+    return llm.with_fallbacks([fallback], exceptions_to_handle=FALLBACK_ERRORS)
@@ -0,0 +1,92 @@
+import json
+import os
+import random
+import sys
+import zlib
+from typing import Any, Callable
+
+from loguru import logger
+
+# Format des logs : celui de loguru, avec l'identifiant de trace de la requête ("-" hors requête)
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<magenta>{extra[trace_id]}</magenta> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
+
+# Réglages courants, fixés par configure_logging()
+_settings = {
+    "max_payload": 0,  # Longueur maximale d'une charge utile journalisée (0 = illimitée)
+    "agent_verbose": True,  # Verbosité des agents et équipages CrewAI
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, "true" if default else "false").lower() in ("1", "true", "yes")
+
+
+def debug_sampler(sample_rate: float) -> Callable[[Any], bool]:
+    """
+    Filtre loguru qui ne conserve les traces DEBUG (et inférieures) que d'une fraction des requêtes.
+
+    La décision dépend de l'identifiant de trace du message (empreinte CRC32,
+    identique dans tous les workers) : une requête échantillonnée journalise
+    toutes ses traces DEBUG, les autres aucune. Hors requête, chaque message
+    est tiré au sort.
+    """
+    threshold = sample_rate * 2 ** 32
+
+    def sample_debug(record) -> bool:
+        if record["level"].no > 10 or sample_rate >= 1.0:
+            return True
+        trace_id = record["extra"].get("trace_id", "-")
+        if trace_id == "-":
+            return random.random() < sample_rate
+        return zlib.crc32(trace_id.encode()) < threshold
+
+    return sample_debug
+
+
+def configure_logging() -> None:
+    """
+    Configure la journalisation à partir des variables d'environnement.
+
+    En mode `production` : niveau INFO, charges utiles tronquées, traces DEBUG
+    échantillonnées, écriture du fichier de logs par un thread dédié (enqueue)
+    et verbosité des agents CrewAI désactivée.
+    """
+    production = os.getenv("LOG_MODE", "development").lower() == "production"
+    level = os.getenv("LOG_LEVEL", "INFO" if production else "DEBUG").upper()
+    sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01" if production else "1.0"))
+    enqueue = _env_flag("LOG_ENQUEUE", production)
+    log_file = os.getenv("LOG_FILE", "app.log")
+
+    _settings["max_payload"] = int(os.getenv("LOG_MAX_PAYLOAD", "500" if production else "0"))
+    _settings["agent_verbose"] = _env_flag("AGENT_VERBOSE", not production)
+
+    sample_debug = debug_sampler(sample_rate)
+    logger.remove()
+    logger.configure(extra={"trace_id": "-"})
+    logger.add(sys.stderr, level=level, format=LOG_FORMAT, filter=sample_debug, enqueue=enqueue)
+    if log_file:
+        logger.add(log_file, rotation="500 MB", level=level, format=LOG_FORMAT, filter=sample_debug, enqueue=enqueue)
+
+
+def preview(value: Any) -> str:
+    """Sérialise une valeur en JSON pour les logs, tronquée à LOG_MAX_PAYLOAD caractères."""
+    max_payload = _settings["max_payload"]
+    if isinstance(value, str):
+        # Troncature avant sérialisation : le coût ne dépend pas de la taille du texte
+        if max_payload and len(value) > max_payload:
+            return f"{json.dumps(value[:max_payload], ensure_ascii=False)}… [{len(value)} caractères]"
+        return json.dumps(value, ensure_ascii=False)
+
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    if max_payload and len(text) > max_payload:
+        return f"{text[:max_payload]}… [{len(text)} caractères]"
+    return text
+
+
+def agent_verbose() -> bool:
+    """Indique si les agents et équipages CrewAI doivent être verbeux."""
+    return _settings["agent_verbose"]
@@ -0,0 +1,212 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Bornes par défaut des histogrammes de latence (secondes)
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Compteur monotone, éventuellement étiqueté."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Jauge dont la valeur est lue à la collecte via une fonction."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def collect(self) -> List[str]:
+        return self.header() + [f"{self.name} {_format_value(self.func())}"]
+
+
+class CounterFunc(Gauge):
+    """Compteur cumulatif maintenu ailleurs, lu à la collecte via une fonction."""
+
+    type_name = "counter"
+
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes, éventuellement étiqueté."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Par jeu d'étiquettes : [compte par borne, somme, nombre d'observations]
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * len(self.buckets), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def collect(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble de métriques exposées au format texte Prometheus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Métriques du pipeline, par étape
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "crew_stage_duration_seconds", "Durée totale d'une étape, tentatives comprises", ["stage"]
+))
+STAGE_ATTEMPT_DURATION = REGISTRY.register(Histogram(
+    "crew_stage_attempt_duration_seconds", "Durée d'un appel LLM (une tentative)", ["stage"]
+))
+STAGE_RETRIES = REGISTRY.register(Histogram(
+    "crew_stage_retries", "Nombre de nouvelles tentatives par exécution d'étape", ["stage"],
+    buckets=(0, 1, 2, 3, 5)
+))
+STAGE_SHORT_RESPONSES = REGISTRY.register(Counter(
+    "crew_stage_short_responses_total", "Réponses rejetées car trop courtes", ["stage"]
+))
+STAGE_MALFORMED_RESPONSES = REGISTRY.register(Counter(
+    "crew_stage_malformed_responses_total", "Réponses rejetées car hors format (analyse stricte)", ["stage"]
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "crew_stage_errors_total", "Tentatives en erreur (exception ou délai dépassé)", ["stage"]
+))
+STAGE_FALLBACKS = REGISTRY.register(Counter(
+    "crew_stage_fallbacks_total", "Étapes terminées par une réponse de repli", ["stage"]
+))
+DEADLINE_EXCEEDED = REGISTRY.register(Counter(
+    "crew_deadline_exceeded_total", "Étapes abandonnées faute de budget de temps restant pour la requête", ["stage"]
+))
+STAGE_CACHE_HITS = REGISTRY.register(Counter(
+    "crew_stage_cache_hits_total", "Étapes servies depuis le cache par étape", ["stage"]
+))
+STAGE_TOKENS = REGISTRY.register(Counter(
+    "crew_stage_tokens_total", "Tokens consommés par étape", ["stage", "type"]
+))
+STAGE_COST = REGISTRY.register(Counter(
+    "crew_stage_cost_dollars_total", "Coût estimé des appels LLM par étape (USD)", ["stage"]
+))
+STAGE_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "crew_stage_prompt_tokens", "Tokens de la tâche soumise à l'agent de chaque étape", ["stage"],
+    buckets=(50, 100, 200, 400, 800, 1600, 3200)
+))
+PROMPT_TRUNCATIONS = REGISTRY.register(Counter(
+    "crew_prompt_truncations_total", "Réponses recopiées dans un prompt et tronquées au budget de tokens", ["stage"]
+))
+SPECULATIVE_CANDIDATES = REGISTRY.register(Counter(
+    "crew_speculative_candidates_total", "Réponses candidates du mode spéculatif, par issue", ["outcome"]
+))
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "crew_semantic_cache_lookups_total", "Recherches dans le cache sémantique, par question comparée et résultat",
+    ["on", "result"]
+))
+LLM_MODEL_FALLBACKS = REGISTRY.register(Counter(
+    "crew_llm_model_fallbacks_total", "Appels LLM repris par le modèle de repli après un délai dépassé", ["model"]
+))
+
+# Métriques des requêtes
+QUESTIONS = REGISTRY.register(Counter(
+    "crew_questions_total", "Questions traitées, par origine de la réponse", ["source"]
+))
+QUESTION_DURATION = REGISTRY.register(Histogram(
+    "crew_question_duration_seconds", "Durée de traitement d'une question par le pipeline"
+))
+REJECTED_REQUESTS = REGISTRY.register(Counter(
+    "crew_rejected_requests_total", "Requêtes refusées car le pool d'exécution est saturé"
+))
+RATE_LIMITED_REQUESTS = REGISTRY.register(Counter(
+    "crew_rate_limited_requests_total", "Requêtes refusées (429) car le client a dépassé sa limite de débit"
+))
@@ -0,0 +1,185 @@
+import os
+import re
+from typing import Any, Optional
+
+# Modes d'analyse des réponses : "strict" rejette toute réponse hors format (la
+# tentative est alors refaite) ; "lenient" récupère ce qui peut l'être
+PARSER_MODES = ("strict", "lenient")
+
+STATUS_VALIDATED = "validé"
+STATUS_REJECTED = "rejeté"
+
+MARKER = "Final Answer:"
+
+# Expressions précompilées. Chacune commence par un littéral, ce qui permet au
+# moteur de sauter directement aux positions candidates ; en mode lenient elles
+# s'appliquent au texte mis en minuscules.
+_STRICT_STOP_RE = re.compile(r"\n[ \t]*(?:Thought|Human|Assistant|Observation|Action):")
+_LENIENT_STOP_RE = re.compile(r"\n[ \t]*(?:thought|human|assistant|observation|action)[ \t]*:")
+_STRICT_LEADING_STOP_RE = re.compile(r"\s*(?:Thought|Human|Assistant|Observation|Action):")
+_LENIENT_LEADING_STOP_RE = re.compile(r"\s*(?:thought|human|assistant|observation|action)[ \t]*:")
+_STRICT_SCORE_RE = re.compile(r"Score:[ \t]*([0-9]*\.?[0-9]+)(?![.,]?[0-9])()")
+_LENIENT_SCORE_RE = re.compile(
+    r"score\**[ \t]*[:=][ \t]*\**[ \t]*([0-9]*[.,]?[0-9]+)([ \t]*(?:/[ \t]*(?:10|100)\b|%))?"
+)
+# Verdict du General Manager : "validé|réponse" ou "rejeté|raison"
+_STRICT_VERDICT_RE = re.compile(r"\s*(validé|rejeté)\s*\|\s*(.*)", re.DOTALL | re.IGNORECASE)
+_LENIENT_VERDICT_RE = re.compile(
+    r"[\s*_\"'`]*(valid[eé]e?|rejet[eé]e?)[\s*_\"'`]*(?:[|:\-–—]\s*|\n|$)(.*)", re.DOTALL | re.IGNORECASE
+)
+
+
+class ParsedResponse:
+    """Résultat de l'analyse d'une réponse d'agent."""
+
+    __slots__ = ("answer", "has_marker", "score", "status", "detail")
+
+    def __init__(self, answer: Optional[str], has_marker: bool, score: Optional[float] = None,
+                 status: Optional[str] = None, detail: str = ""):
+        self.answer = answer  # Réponse finale (None si introuvable en mode strict)
+        self.has_marker = has_marker  # Le texte contenait un marqueur "Final Answer:"
+        self.score = score  # Score de qualité entre 0 et 1, si présent
+        self.status = status  # Verdict "validé" ou "rejeté", si présent
+        self.detail = detail  # Texte qui suit le verdict (réponse validée ou raison du rejet)
+
+    def __repr__(self) -> str:
+        return (f"ParsedResponse(answer={self.answer!r}, has_marker={self.has_marker}, "
+                f"score={self.score}, status={self.status!r}, detail={self.detail!r})")
+
+
+def _lower(text: str) -> str:
+    """Met le texte en minuscules en conservant les positions des caractères."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # Rares caractères dont la minuscule compte plusieurs caractères (ex : "İ")
+    return "".join(char if len(char.lower()) != 1 else char.lower() for char in text)
+
+
+def result_text(result: Any) -> str:
+    """
+    Convertit le résultat d'un équipage CrewAI en texte.
+
+    `Crew.kickoff()` retourne une chaîne (les versions plus récentes un objet
+    exposant `raw`) ; une liste ou un tuple est réduit à son premier élément.
+    """
+    if result is None:
+        return ""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, (list, tuple)):
+        return result_text(result[0]) if result else ""
+    for attribute in ("raw", "raw_output", "output"):
+        value = getattr(result, attribute, None)
+        if isinstance(value, str):
+            return value
+    return str(result)
+
+
+class ResponseParser:
+    """
+    Extraction de la réponse finale, du score et du verdict d'une réponse d'agent.
+
+    Le texte est parcouru une seule fois avec des expressions précompilées. En
+    mode strict, une réponse hors format donne `answer=None`, un score absent ou
+    hors de [0, 1] `score=None` et un verdict mal formé `status=None`. En mode
+    lenient, l'analyse tolère la casse, les décorations Markdown, les séparateurs
+    approximatifs et les échelles (`8/10`, `85%`), et retombe sur le texte complet.
+    """
+
+    def __init__(self, mode: str = "lenient"):
+        if mode not in PARSER_MODES:
+            raise ValueError(f"Mode d'analyse inconnu: {mode}")
+        self.mode = mode
+        self.strict = mode == "strict"
+        self._stop_re = _STRICT_STOP_RE if self.strict else _LENIENT_STOP_RE
+        self._leading_stop_re = _STRICT_LEADING_STOP_RE if self.strict else _LENIENT_LEADING_STOP_RE
+        self._score_re = _STRICT_SCORE_RE if self.strict else _LENIENT_SCORE_RE
+        self._verdict_re = _STRICT_VERDICT_RE if self.strict else _LENIENT_VERDICT_RE
+
+    @classmethod
+    def from_env(cls) -> "ResponseParser":
+        """Construit l'analyseur à partir des variables d'environnement."""
+        return cls(os.getenv("PARSER_MODE", "lenient").lower())
+
+    def parse(self, text: Any, verdict: bool = False) -> ParsedResponse:
+        """
+        Analyse une réponse d'agent.
+
+        La réponse retenue suit le dernier marqueur "Final Answer:" (les modèles
+        recopient parfois l'exemple de format avant leur propre réponse) et
+        s'arrête au début d'un éventuel nouveau bloc ReAct. Sans marqueur, le
+        texte complet est retenu, sauf en mode strict s'il contient des blocs
+        ReAct. Avec `verdict=True`, la réponse est aussi lue comme un verdict.
+
+        Le marqueur est cherché depuis la fin du texte et les autres recherches
+        sont limitées à la réponse : le raisonnement qui précède n'est parcouru
+        qu'une fois, et seulement si la réponse ne contient pas de score.
+        """
+        text = result_text(text)
+        haystack = text if self.strict else _lower(text)
+
+        start = self._find_marker(haystack)
+        has_marker = start is not None
+        if has_marker:
+            stop = self._stop_re.search(haystack, start)
+            end = stop.start() if stop else len(text)
+            answer = text[start:end].strip()
+        else:
+            start, end = 0, len(text)
+            answer = text.strip()
+            if self.strict and (self._leading_stop_re.match(text) or self._stop_re.search(text)):
+                answer = ""
+
+        # Le score situé dans la réponse finale prime sur celui du raisonnement
+        score = None
+        match = self._score_re.search(haystack, start, end)
+        if match is None and has_marker and not self.strict:
+            match = self._score_re.search(haystack, 0, start)
+        if match is not None:
+            score = self._to_score(match.group(1), match.group(2))
+
+        parsed = ParsedResponse((answer or None) if self.strict else answer, has_marker, score)
+        if verdict and answer:
+            self._parse_verdict(answer, parsed)
+        return parsed
+
+    def extract_answer(self, text: Any) -> Optional[str]:
+        return self.parse(text).answer
+
+    def extract_score(self, text: Any) -> Optional[float]:
+        return self.parse(text).score
+
+    def _find_marker(self, haystack: str) -> Optional[int]:
+        """Position qui suit le dernier marqueur "Final Answer:", ou None."""
+        if self.strict:
+            index = haystack.rfind(MARKER)
+            return index + len(MARKER) if index >= 0 else None
+
+        # Marqueur lenient "final answer :" : le mot "answer" est cherché depuis
+        # la fin du texte, puis son contexte est vérifié
+        index = haystack.rfind("answer")
+        while index >= 0:
+            colon = index + 6
+            while haystack[colon:colon + 1] in (" ", "\t"):
+                colon += 1
+            if haystack[colon:colon + 1] == ":" and haystack[max(0, index - 16):index].rstrip(" \t").endswith("final"):
+                return colon + 1
+            index = haystack.rfind("answer", 0, index)
+        return None
+
+    def _parse_verdict(self, answer: str, parsed: ParsedResponse) -> None:
+        match = self._verdict_re.match(answer)
+        if match is None:
+            return
+        status = match.group(1).lower()
+        parsed.status = STATUS_VALIDATED if status.startswith("valid") else STATUS_REJECTED
+        parsed.detail = match.group(2).strip()
+
+    def _to_score(self, value: str, scale: Optional[str]) -> Optional[float]:
+        score = float(value.replace(",", "."))
+        if scale:
+            score /= 100 if ("%" in scale or "100" in scale) else 10
+        if self.strict:
+            return score if 0.0 <= score <= 1.0 else None
+        return max(0.0, min(1.0, score))
@@ -0,0 +1,212 @@
+import functools
+import os
+import textwrap
+import threading
+from string import Formatter
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.core.agent_config import DEFAULT_AI_ANALYST_CONFIG
+from app.core.metrics import PROMPT_TRUNCATIONS
+
+# Gabarits des tâches, par étape. Les consignes de format (réponse directe
+# précédée de "Final Answer:") font partie de chaque gabarit : aucune consigne
+# n'est ajoutée autour de la tâche au moment de l'exécution.
+PROMPT_TEMPLATES = {
+    "Prompt Manager": """
+        Reformulez clairement et précisément cette question, en français correct, sans en changer le sens ni l'intention et sans aucun commentaire : "{question}"
+        Exemple : "c koi Grasse?" donne "Final Answer: Pouvez-vous décrire la ville de Grasse et ses caractéristiques principales ?"
+        Format : Final Answer: [question reformulée]
+    """,
+    "AI Analyst": """
+        Répondez de façon précise, concise mais complète à cette question, en vous concentrant sur les faits les plus importants, sans formules de politesse : {question}{variant}
+        Format : Final Answer: [réponse]
+    """,
+    "Quality Controller": """
+        Évaluez la qualité et la pertinence de cette réponse : {answer}
+        Donnez UNIQUEMENT un score entre 0 et 1, sans explication.
+        Format : Final Answer: Score: [X.XX] (ex : Score: 0.95)
+    """,
+    "General Manager": """
+        Validez ou rejetez la réponse proposée.
+        Question initiale : {question}
+        Question reformulée : {refined_question}
+        Réponse proposée : {answer}
+        Score de qualité : {score}
+        Validez la réponse si le score est >= {threshold}, rejetez-la sinon.
+        Format : Final Answer: validé|[courte justification] ou Final Answer: rejeté|[raison du rejet]
+    """,
+}
+
+# Consigne ajoutée à la question des réponses candidates du mode spéculatif
+VARIANT_INSTRUCTION = "\nProposition n°{number} : adoptez un angle ou une structure différents de la réponse la plus évidente."
+
+# Réponses d'une étape précédente recopiées dans le prompt, tronquées au budget de tokens
+TRUNCATED_FIELDS = {
+    "Quality Controller": ("answer",),
+    "General Manager": ("answer",),
+}
+
+TRUNCATION_MARK = " […]"
+
+# Budget des réponses recopiées sans PROMPT_ANSWER_MAX_TOKENS ni max_tokens connu :
+# la longueur maximale par défaut d'une réponse de l'AI Analyst
+ANSWER_MAX_TOKENS = DEFAULT_AI_ANALYST_CONFIG["max_tokens"]
+
+# Estimation sans encodeur : environ 4 caractères par token
+CHARS_PER_TOKEN = 4
+
+
+def _compact(text: str) -> str:
+    """Retire l'indentation, les espaces de fin de ligne et les lignes vides d'un gabarit."""
+    return "\n".join(line.strip() for line in textwrap.dedent(text).splitlines() if line.strip())
+
+
+class PromptTemplate:
+    """Gabarit de prompt analysé une seule fois : texte compacté et champs à substituer."""
+
+    __slots__ = ("name", "text", "fields", "_parts")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = _compact(text)
+        self._parts = []
+        for literal, field, spec, conversion in Formatter().parse(self.text):
+            if conversion or (field is not None and not field.isidentifier()):
+                raise ValueError(f"Champ invalide dans le gabarit {name}: {field!r}")
+            self._parts.append((literal, field, spec))
+        self.fields = tuple(dict.fromkeys(field for _, field, _ in self._parts if field))
+
+    def render(self, values: Dict) -> str:
+        chunks = []
+        for literal, field, spec in self._parts:
+            chunks.append(literal)
+            if field is not None:
+                chunks.append(format(values[field], spec))
+        return "".join(chunks)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
+    """Encodage tiktoken du modèle, chargé une fois par processus (None s'il est indisponible)."""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.warning(f"Encodage tiktoken indisponible pour {model} ({str(e)}), décompte des tokens estimé")
+        return None
+
+
+class TokenCounter:
+    """
+    Décompte et troncature en tokens.
+
+    Utilise l'encodage tiktoken du modèle s'il est disponible, sinon une
+    estimation à raison de CHARS_PER_TOKEN caractères par token. Le chargement de
+    l'encodage peut nécessiter un accès réseau (téléchargement sans délai maximal
+    par tiktoken) : il n'est jamais fait par un décompte, qui utilise l'estimation
+    tant que l'encodage n'est pas prêt, mais par load(), appelée au préchauffage
+    hors de la boucle d'événements ou à défaut dans un thread dédié.
+    """
+
+    def __init__(self, model: str = "gpt-4", use_tiktoken: bool = True):
+        self.model = model
+        self.use_tiktoken = use_tiktoken
+        self._encoding = None
+        self._loaded = not use_tiktoken
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Charge l'encodage (appel bloquant, une fois par processus) et le retourne (None si indisponible)."""
+        with self._lock:
+            if not self._loaded:
+                self._encoding = _encoding(self.model)
+                self._loaded = True
+        return self._encoding
+
+    @property
+    def encoding(self):
+        """Encodage tiktoken s'il est chargé, sinon None (estimation) ; lance alors son chargement."""
+        if self._loaded:
+            return self._encoding
+        if not self._loading:
+            self._loading = True
+            threading.Thread(target=self.load, name="tiktoken-load", daemon=True).start()
+        return None
+
+    def count(self, text: str) -> int:
+        encoding = self.encoding
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def truncate(self, text: str, max_tokens: int) -> Tuple[str, bool]:
+        """Tronque le texte à `max_tokens` tokens (à une fin de mot) ; indique s'il a été tronqué."""
+        encoding = self.encoding
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text, False
+            head = encoding.decode(tokens[:max_tokens])
+        else:
+            if len(text) <= max_tokens * CHARS_PER_TOKEN:
+                return text, False
+            head = text[:max_tokens * CHARS_PER_TOKEN]
+        cut = head.rfind(" ")
+        if cut > len(head) // 2:
+            head = head[:cut]
+        return head.rstrip() + TRUNCATION_MARK, True
+
+
+class PromptRegistry:
+    """
+    Gabarits des tâches du pipeline, compilés une fois au démarrage.
+
+    Les réponses des étapes précédentes recopiées dans un prompt (réponse de
+    l'AI Analyst soumise au Quality Controller et au General Manager) sont
+    tronquées à `answer_max_tokens` tokens : une réponse longue n'alourdit pas
+    chaque appel suivant. Sans budget configuré (None), le budget est la longueur
+    maximale des réponses de l'AI Analyst (`answer_tokens` de render) : seule une
+    réponse anormalement longue (modèle de repli, consigne ignorée) est tronquée.
+    """
+
+    def __init__(self, templates: Optional[Dict[str, str]] = None, answer_max_tokens: Optional[int] = None,
+                 counter: Optional[TokenCounter] = None):
+        templates = templates if templates is not None else PROMPT_TEMPLATES
+        self.templates = {name: PromptTemplate(name, text) for name, text in templates.items()}
+        self.answer_max_tokens = answer_max_tokens
+        self.counter = counter or TokenCounter()
+
+    @classmethod
+    def from_env(cls) -> "PromptRegistry":
+        """Construit le registre à partir des variables d'environnement."""
+        tokenizer = os.getenv("PROMPT_TOKENIZER", "tiktoken").lower()
+        answer_max_tokens = os.getenv("PROMPT_ANSWER_MAX_TOKENS", "")
+        return cls(
+            answer_max_tokens=int(answer_max_tokens) if answer_max_tokens else None,
+            counter=TokenCounter(use_tiktoken=tokenizer == "tiktoken"),
+        )
+
+    def render(self, stage: str, answer_tokens: Optional[int] = None, **values) -> str:
+        """
+        Prompt de la tâche d'une étape (réponses recopiées tronquées au budget).
+
+        `answer_tokens` : longueur maximale (max_tokens) de la réponse recopiée,
+        budget utilisé si `answer_max_tokens` n'est pas configuré.
+        """
+        template = self.templates[stage]
+        budget = self.answer_max_tokens
+        if budget is None:
+            budget = answer_tokens or ANSWER_MAX_TOKENS
+        if budget > 0:
+            for field in TRUNCATED_FIELDS.get(stage, ()):
+                values[field], truncated = self.counter.truncate(str(values[field]), budget)
+                if truncated:
+                    PROMPT_TRUNCATIONS.inc(stage=stage)
+                    logger.info(f"Réponse tronquée à {budget} tokens dans le prompt de {stage}")
+        return template.render(values)
+
+    def count_tokens(self, text: str) -> int:
+        return self.counter.count(text)
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from app.core.metrics import RATE_LIMITED_REQUESTS
+
+
+def api_key_client(api_key: str) -> str:
+    """Identifiant de client d'une clé d'API (empreinte : la clé n'est jamais conservée)."""
+    return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_client_table(value: str) -> Dict[str, str]:
+    """
+    Lit une table `client=valeur` séparée par des virgules (ex: variables d'environnement).
+
+    Un client est désigné par `key:<clé d'API>` ou `ip:<adresse>` :
+    "key:abc123=3,ip:10.0.0.5=2".
+    """
+    table = {}
+    for item in (value or "").split(","):
+        client, separator, setting = item.strip().rpartition("=")
+        if not separator or not client:
+            continue
+        if client.startswith("key:"):
+            client = api_key_client(client[len("key:"):])
+        table[client] = setting.strip()
+    return table
+
+
+class TokenBucket:
+    """Seau à jetons : `burst` requêtes d'affilée au plus, rechargé de `rate` jetons par seconde."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def consume(self, cost: float = 1) -> Tuple[bool, float]:
+        """Consomme `cost` jetons si possible ; retourne (accepté, attente avant d'avoir assez de jetons)."""
+        self._refill(time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        if cost > self.burst:
+            return False, math.inf
+        return False, (cost - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def reset_after(self) -> float:
+        """Délai (secondes) avant que le seau soit de nouveau plein."""
+        return (self.burst - self.tokens) / self.rate if self.rate > 0 else 0.0
+
+
+class RateDecision:
+    """Résultat du contrôle de débit d'une requête, et en-têtes X-RateLimit associés."""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset", "retry_after")
+
+    def __init__(self, allowed: bool, limit: float, remaining: float, reset: float, retry_after: float = 0.0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(int(self.limit)),
+            "X-RateLimit-Remaining": str(max(0, int(self.remaining))),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed and math.isfinite(self.retry_after):
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class RateLimiter:
+    """
+    Limitation de débit par client (clé d'API ou adresse IP).
+
+    Chaque client dispose d'un seau à jetons : `per_minute` questions par minute
+    en régime établi, avec des rafales d'au plus `burst` questions. Des limites
+    propres à certains clients peuvent être définies (`overrides`). Les seaux
+    des clients les moins récemment vus sont oubliés au-delà de `max_clients`.
+
+    Seules les clés d'API déclarées (`api_keys`, empreintes des clés) identifient
+    un client : une clé inconnue est ignorée et le client est identifié par son
+    adresse IP, sans quoi une clé aléatoire par requête contournerait la limite.
+    Les seaux sont propres au processus : avec plusieurs workers gunicorn, la
+    limite effective est multipliée par le nombre de workers.
+    """
+
+    def __init__(self, per_minute: float = 60, burst: float = 20, overrides: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_clients: int = 10000, trust_forwarded: bool = False, enabled: bool = True,
+                 api_keys: Optional[Set[str]] = None, trusted_proxies: int = 1):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.overrides = overrides or {}
+        self.max_clients = max_clients
+        self.trust_forwarded = trust_forwarded
+        self.trusted_proxies = max(1, trusted_proxies)
+        self.enabled = enabled
+        self.api_keys = api_keys or set()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Construit le limiteur à partir des variables d'environnement."""
+        per_minute = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+        burst = float(os.getenv("RATE_LIMIT_BURST", "20"))
+        overrides = {}
+        # Limites par client : "key:<clé>=<par minute>[/<rafale>]"
+        for client, setting in parse_client_table(os.getenv("RATE_LIMIT_OVERRIDES", "")).items():
+            rate, _, client_burst = setting.partition("/")
+            overrides[client] = (float(rate), float(client_burst) if client_burst else burst)
+        enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+        if not enabled:
+            logger.info("Limitation de débit par client désactivée")
+        return cls(
+            per_minute=per_minute,
+            burst=burst,
+            overrides=overrides,
+            max_clients=int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000")),
+            trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes"),
+            enabled=enabled,
+            # Clés d'API reconnues, séparées par des virgules
+            api_keys={api_key_client(key.strip()) for key in os.getenv("API_KEYS", "").split(",") if key.strip()},
+            trusted_proxies=int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1")),
+        )
+
+    def client_id(self, headers, host: Optional[str]) -> str:
+        """
+        Identifie le client : clé d'API déclarée (X-API-Key), sinon adresse IP.
+
+        Derrière des proxys de confiance (`trust_forwarded`), l'adresse est lue dans
+        X-Forwarded-For en comptant depuis la droite : chaque proxy ajoute en fin de
+        chaîne l'adresse qui s'est connectée à lui, et seules les `trusted_proxies`
+        dernières entrées sont écrites par nos proxys. Les entrées plus à gauche
+        viennent du client, qui pourrait sinon changer d'identité à chaque requête.
+        """
+        api_key = headers.get("x-api-key")
+        if api_key:
+            client = api_key_client(api_key)
+            if client in self.api_keys:
+                return client
+        if self.trust_forwarded and headers.get("x-forwarded-for"):
+            entries = [entry.strip() for entry in headers["x-forwarded-for"].split(",")]
+            # Chaîne plus courte que le nombre de proxys : en-tête non ajouté par nos proxys
+            if len(entries) >= self.trusted_proxies and entries[-self.trusted_proxies]:
+                return "ip:" + entries[-self.trusted_proxies]
+        return f"ip:{host or 'inconnu'}"
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            per_minute, burst = self.overrides.get(client, (self.per_minute, self.burst))
+            bucket = TokenBucket(per_minute / 60, burst)
+            self._buckets[client] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def burst_for(self, client: str) -> float:
+        """Taille du seau du client : nombre maximum de questions décomptées d'un coup."""
+        return self.overrides.get(client, (self.per_minute, self.burst))[1]
+
+    def check(self, client: str, cost: float = 1) -> RateDecision:
+        """Décompte `cost` questions pour le client et indique si la requête est acceptée."""
+        if not self.enabled:
+            return RateDecision(True, self.burst, self.burst, 0.0)
+        with self._lock:
+            bucket = self._bucket(client)
+            allowed, wait = bucket.consume(cost)
+            decision = RateDecision(allowed, bucket.burst, bucket.tokens, bucket.reset_after(), wait)
+            if not allowed:
+                self.rejected += 1
+        if not allowed:
+            RATE_LIMITED_REQUESTS.inc()
+            logger.warning(f"Limite de débit atteinte pour le client {client}")
+        return decision
+
+    async def acquire(self, client: str, cost: float = 1) -> None:
+        """Attend que le client dispose de `cost` jetons puis les consomme."""
+        if not self.enabled:
+            return
+        while True:
+            with self._lock:
+                allowed, wait = self._bucket(client).consume(cost)
+            if allowed:
+                return
+            if not math.isfinite(wait):
+                raise ValueError(f"Coût {cost} supérieur à la rafale autorisée pour le client {client}")
+            await asyncio.sleep(wait)
+
+    def admission(self, client: str, prepaid: int = 0) -> Callable[[int], Awaitable[None]]:
+        """
+        Admission une à une des questions d'un lot.
+
+        Les `prepaid` premiers jetons ont déjà été décomptés à la réception du
+        lot ; chaque question consomme d'abord ces jetons, puis attend ceux qui
+        lui manquent (`cost` jetons par question) avant d'être traitée. Un lot
+        plus grand que la rafale du client est ainsi étalé au débit autorisé au
+        lieu d'être refusé.
+        """
+        remaining = [prepaid]
+
+        async def admit(cost: int = 1) -> None:
+            paid = min(remaining[0], cost)
+            remaining[0] -= paid
+            if cost > paid:
+                await self.acquire(client, cost - paid)
+
+        return admit
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import openai
+
+# Contrôles de validité par étape : longueur minimale de la réponse et élément
+# qu'elle doit contenir ("score" ou "verdict"). Une réponse invalide est redemandée.
+DEFAULT_STAGE_POLICIES = {
+    "Prompt Manager": {"min_length": 10},
+    "AI Analyst": {"min_length": 50},
+    "Quality Controller": {"min_length": 1, "expects": "score"},
+    "General Manager": {"min_length": 1, "expects": "verdict"},
+}
+
+# Codes HTTP pour lesquels une nouvelle tentative a des chances d'aboutir (en plus des 5xx)
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+def _error_chain(error: BaseException):
+    """L'exception et celles qu'elle enveloppe (__cause__ / __context__)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """Code HTTP porté par une erreur du fournisseur LLM, s'il existe."""
+    for current in _error_chain(error):
+        for status in (getattr(current, "status_code", None),
+                       getattr(getattr(current, "response", None), "status_code", None)):
+            if isinstance(status, int):
+                return status
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Indique si une nouvelle tentative a des chances d'aboutir.
+
+    Sont récupérables les délais dépassés, les erreurs de connexion, les limites
+    de débit (429) et les erreurs serveur (5xx). Les autres erreurs (requête
+    invalide, authentification, erreur interne) échoueraient à l'identique.
+    """
+    for current in _error_chain(error):
+        if isinstance(current, (asyncio.TimeoutError, FutureTimeoutError, TimeoutError, ConnectionError,
+                                openai.APIConnectionError)):
+            return True
+    status = error_status(error)
+    return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Délai (secondes) demandé par le fournisseur via l'en-tête Retry-After, s'il existe."""
+    for current in _error_chain(error):
+        value = getattr(current, "retry_after", None)
+        if isinstance(value, (int, float)):
+            return max(0.0, float(value))
+
+        headers = getattr(getattr(current, "response", None), "headers", None)
+        if not headers:
+            continue
+        try:
+            if headers.get("retry-after-ms"):
+                return max(0.0, float(headers["retry-after-ms"]) / 1000)
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    # Format date HTTP
+                    return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class Deadline:
+    """Budget de temps total d'une requête (None = illimité)."""
+
+    def __init__(self, budget: Optional[float] = None):
+        self.expires_at = time.monotonic() + budget if budget else None
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class RetryPolicy:
+    """
+    Politique de nouvelles tentatives du pipeline.
+
+    Une tentative est refaite si la réponse ne passe pas les contrôles de son
+    étape, ou si l'erreur est récupérable. L'attente suit un backoff exponentiel
+    avec gigue, ou le délai Retry-After imposé par le fournisseur ; aucune
+    tentative n'est lancée si elle ne peut pas aboutir dans le budget total de
+    la requête.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 request_deadline: Optional[float] = 300.0, stage_policies: Optional[Dict[str, Dict]] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_deadline = request_deadline
+        self.stage_policies = stage_policies if stage_policies is not None else DEFAULT_STAGE_POLICIES
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        """Construit la politique à partir des variables d'environnement."""
+        return cls(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", "1.0")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", "30")),
+            request_deadline=float(os.getenv("REQUEST_DEADLINE", "300")) or None,
+        )
+
+    def start_deadline(self) -> Deadline:
+        return Deadline(self.request_deadline)
+
+    def backoff(self, attempt: int, delay_hint: Optional[float] = None) -> float:
+        """Attente avant la tentative qui suit l'échec n° `attempt` (à partir de 1)."""
+        if delay_hint is not None:
+            return delay_hint
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def check_response(self, stage: str, response: str, parser) -> Optional[str]:
+        """Motif de rejet de la réponse d'une étape, ou None si elle est valide."""
+        policy = self.stage_policies.get(stage, {})
+        if len(response) < policy.get("min_length", 1):
+            return "trop courte"
+        expects = policy.get("expects")
+        if expects == "score" and parser.extract_score(response) is None:
+            return "score absent"
+        if expects == "verdict" and parser.parse(response, verdict=True).status is None:
+            return "verdict absent"
+        return None
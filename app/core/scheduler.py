@@ -0,0 +1,131 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class FairScheduler:
+    """
+    Attribution équitable des places d'exécution entre clients.
+
+    Une place libre est attribuée immédiatement. Sinon, la demande attend dans
+    la file de son client ; à chaque place libérée, le client servi est choisi
+    parmi ceux qui attendent par tourniquet pondéré lissé (smooth weighted
+    round-robin) : à poids égaux, un client qui soumet cent questions n'en fait
+    passer qu'une pour chaque question des autres. Un client n'occupe jamais
+    plus de `client_max_in_flight` × son poids places à la fois, ce qui en laisse
+    aux autres même lorsqu'il sature le service.
+
+    Toutes les méthodes doivent être appelées depuis la boucle d'événements.
+    """
+
+    def __init__(self, capacity: int, weights: Optional[Dict[str, float]] = None,
+                 client_max_in_flight: Optional[int] = None):
+        self.capacity = max(1, capacity)
+        self.weights = weights or {}
+        self.client_max_in_flight = client_max_in_flight or self.capacity
+        self._free = self.capacity
+        self._active: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._current: Dict[str, float] = {}
+
+    def weight(self, client: str) -> float:
+        return self.weights.get(client, 1.0)
+
+    def limit(self, client: str) -> int:
+        """Nombre maximum de places occupées simultanément par un client."""
+        return min(self.capacity, max(1, int(self.client_max_in_flight * self.weight(client))))
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _eligible(self, client: str) -> bool:
+        return self._active.get(client, 0) < self.limit(client)
+
+    def try_acquire(self, client: str = "") -> bool:
+        """Prend une place si elle est disponible sans attendre."""
+        if self._free <= 0 or not self._eligible(client):
+            return False
+        # Les places libres sont réservées aux clients en attente qui peuvent en prendre une
+        if any(self._eligible(waiting) for waiting in self._queues):
+            return False
+        self._take(client)
+        return True
+
+    async def acquire(self, client: str = "") -> None:
+        """Prend une place, en attendant son tour si nécessaire."""
+        if client not in self._queues and self.try_acquire(client):
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Place attribuée au moment de l'annulation : elle est rendue
+                self.release(client)
+            else:
+                self._discard(client, future)
+            raise
+
+    def release(self, client: str = "") -> None:
+        """Rend une place et l'attribue au prochain client servi par le tourniquet."""
+        active = self._active.get(client, 0) - 1
+        if active > 0:
+            self._active[client] = active
+        else:
+            self._active.pop(client, None)
+        self._free += 1
+        self._dispatch()
+
+    def _take(self, client: str) -> None:
+        self._free -= 1
+        self._active[client] = self._active.get(client, 0) + 1
+
+    def _dispatch(self) -> None:
+        while self._free > 0:
+            client = self._next_client()
+            if client is None:
+                return
+            queue = self._queues[client]
+            future = queue.popleft()
+            if not queue:
+                del self._queues[client]
+                self._current.pop(client, None)
+            if future.cancelled():
+                continue
+            self._take(client)
+            future.set_result(None)
+
+    def _next_client(self) -> Optional[str]:
+        # Tourniquet pondéré lissé : chaque client éligible gagne son poids, le plus
+        # crédité est servi et rend la somme des poids
+        eligible = [client for client in self._queues if self._eligible(client)]
+        if not eligible:
+            return None
+        total = 0.0
+        for client in eligible:
+            weight = self.weight(client)
+            self._current[client] = self._current.get(client, 0.0) + weight
+            total += weight
+        chosen = max(eligible, key=lambda client: self._current[client])
+        self._current[chosen] -= total
+        return chosen
+
+    def _discard(self, client: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(client)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        if not queue:
+            del self._queues[client]
+            self._current.pop(client, None)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "in_use": self.capacity - self._free,
+            "active_clients": len(self._active),
+            "waiting": self.waiting,
+            "waiting_clients": len(self._queues),
+        }
@@ -0,0 +1,483 @@
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+import numpy as np
+from loguru import logger
+
+from app.core.cache import normalize_question
+from app.core.metrics import SEMANTIC_CACHE_LOOKUPS
+from app.models.schemas import QuestionResponse
+
+# Mots outils ignorés : ils rapprochent des questions sans rapport ("Quelle est la
+# population de Grasse ?" / "Quelle est la superficie de Nice ?"). Les formules de
+# demande ("c'est quoi", "expliquez", "pouvez-vous décrire") ne changent pas le
+# sujet de la question. Les négations et "ou" (où, sans accent) ne sont pas des
+# mots outils : ils changent le sens de la question.
+_STOP_WORDS = frozenset("""
+a au aux avec c ce ces cet cette d dans de des du en est et il elle ils je j l la le les leur
+m me mes moi mon nous on par pour qu que quel quelle quelles quels qui quoi s sa se ses
+son sur t ta te tes toi ton tu un une vos votre vous y svp stp
+est-ce sont faut pouvez-vous peux-tu pourriez-vous dis-moi dites-moi parlez-moi
+decrire decrivez decris expliquer expliquez explique definir definissez definis
+presenter presentez presente donner donnez donne-moi
+""".split())
+
+# Mots de négation : deux questions qui diffèrent par une négation ne sont jamais similaires
+_NEGATIONS = frozenset("ne n pas non jamais aucun aucune rien ni sans nullement".split())
+
+# Abréviations de type SMS, ramenées au mot qu'elles remplacent
+_SMS_WORDS = {
+    "koi": "quoi", "kwa": "quoi", "kel": "quel", "kelle": "quelle", "ki": "qui", "pk": "pourquoi",
+    "pq": "pourquoi", "pkoi": "pourquoi", "qd": "quand", "cb": "combien", "bcp": "beaucoup",
+    "ds": "dans", "tt": "tout", "ke": "que", "ya": "y",
+}
+
+# Mots interrogatifs : deux questions qui n'en emploient pas les mêmes ne portent pas
+# sur la même chose ("Où est Grasse ?" / "Qu'est-ce que Grasse ?")
+_INTERROGATIVES = frozenset("ou quand pourquoi comment combien".split())
+
+# Pronoms sujets des questions inversées ("tombent-elles", "a-t-il")
+_INVERSION_RE = re.compile(r"(?:-t)?-(?:il|ils|elle|elles|on)$")
+
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE"})
+
+# Similarité cosinus minimale, calibrée sur tests/semantic_pairs.json : les paraphrases
+# (accents, accords, abréviations SMS, formules de demande) y sont toutes au-dessus
+# (0.87 au plus bas), les questions distinctes qui passent les contrôles de
+# same_question toutes en dessous ("foie" / "foi" : 0.71)
+SIMILARITY_THRESHOLD = 0.8
+
+FORMAT_VERSION = 3
+
+
+def _words(text: str) -> List[str]:
+    """Mots d'un texte, sans accents, ligatures ni ponctuation (casse conservée)."""
+    text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", text or ""))
+    text = text.translate(_LIGATURES)
+    return "".join(
+        char if char.isalnum() or char == "-" else " " for char in text if not unicodedata.combining(char)
+    ).split()
+
+
+def _tokens(text: str) -> List[str]:
+    """Mots significatifs d'une question normalisée (abréviations SMS développées, inversions retirées)."""
+    words = (_INVERSION_RE.sub("", _SMS_WORDS.get(word, word)) for word in _words(normalize_question(text)))
+    return [word for word in words if word and word not in _STOP_WORDS]
+
+
+def question_markers(text: str) -> List[str]:
+    """
+    Négation et mots interrogatifs d'une question.
+
+    Ils pèsent peu dans la similarité mais changent le sens : deux questions qui
+    n'ont pas les mêmes marqueurs ne sont jamais considérées comme similaires
+    ("Pourquoi le ciel est-il bleu ?" / "Pourquoi le ciel n'est-il pas bleu ?").
+    """
+    markers = set()
+    for word in _words(normalize_question(text)):
+        word = _SMS_WORDS.get(word, word)
+        if word in _NEGATIONS:
+            markers.add("negation")
+        elif word in _INTERROGATIVES:
+            markers.add(word)
+    return sorted(markers)
+
+
+def question_entities(text: str) -> List[str]:
+    """
+    Noms propres (mots capitalisés hors début de phrase) et nombres d'une question.
+
+    Deux questions qui n'en partagent pas ne sont jamais considérées comme
+    similaires : "Décrivez la ville de Grasse" et "Décrivez la ville de Nice" ont
+    une similarité cosinus élevée mais des réponses différentes.
+    """
+    words = _words(text)
+    return sorted({
+        word.lower() for index, word in enumerate(words)
+        if any(char.isdigit() for char in word) or (index > 0 and word[0].isupper())
+    })
+
+
+def _stem(word: str) -> str:
+    """
+    Forme d'un mot sans ses marques de pluriel et de féminin ("avantages" /
+    "avantage", "artificielle" / "artificiel").
+
+    Les fautes de frappe ne sont volontairement pas rapprochées : à une lettre
+    près, "poisson" et "poison" ou "cousin" et "coussin" ne sont pas le même mot.
+    """
+    if len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == "e":
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiouy":
+        word = word[:-1]
+    return word
+
+
+def _runs(text: str) -> List[List[str]]:
+    """
+    Mots significatifs (sans pluriel ni féminin) dans l'ordre de la question,
+    regroupés en suites de mots consécutifs que sépare un mot outil.
+
+    L'ordre des suites porte le sens ("déclarer la guerre à l'Allemagne" /
+    "à la France", "euros en dollars" / "dollars en euros") ; l'ordre des mots
+    d'une même suite ("principales caractéristiques" / "caractéristiques
+    principales") ne le porte pas.
+    """
+    runs: List[List[str]] = []
+    run: List[str] = []
+    for word in _words(normalize_question(text)):
+        word = _INVERSION_RE.sub("", _SMS_WORDS.get(word, word))
+        if word and word not in _STOP_WORDS:
+            run.append(_stem(word))
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+    return runs
+
+
+def question_signature(text: str) -> Dict[str, List]:
+    """
+    Éléments d'une question comparés en plus de la similarité : mots significatifs
+    (sans pluriel ni féminin) et leur ordre, entités (noms propres et nombres) et
+    marqueurs (négation, mots interrogatifs).
+    """
+    runs = _runs(text)
+    return {
+        "words": sorted({word for run in runs for word in run}),
+        "order": [sorted(set(run)) for run in runs],
+        "entities": question_entities(text),
+        "markers": question_markers(text),
+    }
+
+
+def same_question(first: Dict[str, List[str]], second: Dict[str, List[str]]) -> bool:
+    """
+    Deux questions proches (similarité au-dessus du seuil) portent-elles sur la même chose ?
+
+    Elles doivent avoir les mêmes marqueurs, les mêmes entités et les mêmes mots
+    significatifs aux accords près, dans le même ordre : un mot de plus ou de
+    moins ("population de Grasse" / "population de l'agglomération de Grasse")
+    ou deux termes inversés ("euros en dollars" / "dollars en euros") suffisent
+    à changer la réponse attendue. Une question sans majuscules n'a pas d'entité
+    reconnue : les entités de l'autre question doivent alors figurer parmi ses mots.
+    """
+    if first["markers"] != second["markers"]:
+        return False
+    if first["entities"] and second["entities"]:
+        if first["entities"] != second["entities"]:
+            return False
+    else:
+        for entities, words in ((first["entities"], second["words"]), (second["entities"], first["words"])):
+            if not {_stem(entity) for entity in entities} <= set(words):
+                return False
+    return first["words"] == second["words"] and first["order"] == second["order"]
+
+
+class HashingVectorizer:
+    """
+    Plongement local et sans apprentissage d'une question.
+
+    Les mots significatifs et leurs n-grammes de caractères sont projetés par
+    hachage (CRC32, stable d'un processus à l'autre) dans un vecteur de taille
+    fixe, normalisé pour que le produit scalaire soit la similarité cosinus.
+    Les n-grammes rendent la représentation robuste aux fautes et variantes
+    d'écriture ; les mots entiers, plus lourds, distinguent les sujets ; les
+    paires de mots successifs portent l'ordre des termes ("euros en dollars" /
+    "dollars en euros").
+    """
+
+    def __init__(self, dimensions: int = 1024, ngram_range=(3, 5), word_weight: float = 2.0):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+
+    def _features(self, text: str):
+        low, high = self.ngram_range
+        for word in _tokens(text):
+            yield word, self.word_weight
+            padded = f" {word} "
+            for size in range(low, high + 1):
+                for start in range(len(padded) - size + 1):
+                    yield padded[start:start + size], 1.0
+        # Paires ordonnées d'une suite de mots à la suivante ; sans ordre au sein d'une suite
+        runs = _runs(text)
+        for run in runs:
+            for first, second in zip(run, run[1:]):
+                yield "\x00".join(sorted((first, second))), self.word_weight
+        for previous, following in zip(runs, runs[1:]):
+            yield f"{previous[-1]}\x01{following[0]}", self.word_weight
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # Le bit de poids fort donne le signe : les collisions se compensent en moyenne
+            vector[digest % self.dimensions] += weight if digest & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Cache des réponses validées, recherché par similarité de question.
+
+    Complète le cache exact (ResponseCache) : une paraphrase d'une question déjà
+    traitée ("c koi Grasse ?" / "Qu'est-ce que Grasse ?") est servie sans appel
+    LLM si elle est proche de la question d'origine, ou après la seule
+    reformulation si c'est la question reformulée qui est proche. Chaque réponse
+    est indexée sous ses deux questions.
+
+    L'index est une matrice NumPy en mémoire (recherche exhaustive par produit
+    scalaire), bornée à `max_entries` vecteurs avec éviction des moins récemment
+    utilisés et durée de vie. Il peut être sauvegardé sur disque et rechargé au
+    démarrage.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = 5000, ttl: float = 86400,
+                 path: Optional[str] = None, save_every: int = 50,
+                 vectorizer: Optional[HashingVectorizer] = None):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.path = path or None
+        self.save_every = save_every
+        self.vectorizer = vectorizer or HashingVectorizer()
+        # Index : une ligne par question indexée, les `_size` premières étant occupées
+        self._vectors = np.zeros((0, self.vectorizer.dimensions), dtype=np.float32)
+        self._expires_at = np.zeros(0)
+        self._accessed_at = np.zeros(0)
+        # Configuration des agents et réponse (JSON) de chaque ligne
+        self._entries: List[Dict] = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self.load()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """Construit le cache sémantique, ou retourne None s'il est désactivé."""
+        if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+            logger.info("Cache sémantique désactivé")
+            return None
+        return cls(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", str(SIMILARITY_THRESHOLD))),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+            path=os.getenv("SEMANTIC_CACHE_PATH", ""),
+            save_every=int(os.getenv("SEMANTIC_CACHE_SAVE_EVERY", "50")),
+        )
+
+    def get(self, question: str, config_key: str, on: str = "question") -> Optional[QuestionResponse]:
+        """Réponse validée d'une question similaire posée avec la même configuration d'agents."""
+        vector = self.vectorizer.transform(question)
+        signature = question_signature(question)
+        now = time.time()
+        best = None
+        with self._lock:
+            scores = self._vectors[:self._size] @ vector
+            candidates = np.flatnonzero((scores >= self.threshold) & (self._expires_at[:self._size] >= now))
+            for row in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[row]
+                if entry["config_key"] == config_key and same_question(signature, entry["signature"]):
+                    self._accessed_at[row] = now
+                    best = (float(scores[row]), entry["value"])
+                    break
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if best is None:
+            SEMANTIC_CACHE_LOOKUPS.inc(on=on, result="miss")
+            return None
+        SEMANTIC_CACHE_LOOKUPS.inc(on=on, result="hit")
+        logger.info(f"Question similaire trouvée dans le cache sémantique ({on}, similarité {best[0]:.3f})")
+        return QuestionResponse.model_validate_json(best[1])
+
+    def set(self, response: QuestionResponse, config_key: str) -> None:
+        """Indexe une réponse validée sous sa question d'origine et sa question reformulée."""
+        if response.status != "validé":
+            return
+        value = response.model_dump_json()
+        indexed = [
+            (self.vectorizer.transform(question), question_signature(question))
+            for question in {response.original_question, response.refined_question} if question
+        ]
+        now = time.time()
+        with self._lock:
+            for vector, signature in indexed:
+                row = self._row_for(vector, config_key, now)
+                self._vectors[row] = vector
+                self._expires_at[row] = now + self.ttl
+                self._accessed_at[row] = now
+                self._entries[row] = {"config_key": config_key, "signature": signature, "value": value}
+            self._unsaved += len(indexed)
+
+    def _row_for(self, vector: np.ndarray, config_key: str, now: float) -> int:
+        """Ligne où indexer un vecteur : celui d'une question identique, une ligne libre ou une ligne évincée."""
+        scores = self._vectors[:self._size] @ vector
+        for row in np.flatnonzero(scores >= 0.999):
+            if self._entries[row]["config_key"] == config_key:
+                return int(row)
+
+        if self._size < self.max_entries:
+            if self._size == len(self._vectors):
+                self._grow(min(self.max_entries, max(64, 2 * self._size)))
+            self._entries.append({})
+            self._size += 1
+            return self._size - 1
+
+        # Éviction d'une entrée expirée, sinon de la moins récemment utilisée
+        expired = self._expires_at < now
+        return int(np.argmin(np.where(expired, -np.inf, self._accessed_at)))
+
+    def _grow(self, capacity: int) -> None:
+        vectors = np.zeros((capacity, self.vectorizer.dimensions), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+        self._expires_at = np.resize(self._expires_at, capacity)
+        self._accessed_at = np.resize(self._accessed_at, capacity)
+
+    @property
+    def save_due(self) -> bool:
+        return self.path is not None and self._unsaved >= self.save_every
+
+    def save(self) -> None:
+        """
+        Sauvegarde l'index sur disque (écriture atomique).
+
+        Les workers gunicorn partagent SEMANTIC_CACHE_PATH : sous un verrou de
+        fichier, l'index du worker est fusionné avec le contenu du fichier (entrée
+        la plus récemment utilisée pour une même question) au lieu de l'écraser.
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            size = self._size
+            ours = (
+                self._vectors[:size].copy(), self._expires_at[:size].copy(),
+                self._accessed_at[:size].copy(), list(self._entries[:size]),
+            )
+            self._unsaved = 0
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with self._file_lock():
+                saved = self._read()
+                vectors, expires_at, accessed_at, entries = self._merge(ours, saved) if saved else ours
+                metadata = json.dumps({
+                    "version": FORMAT_VERSION,
+                    "dimensions": self.vectorizer.dimensions,
+                    "entries": entries,
+                }, ensure_ascii=False)
+                with open(temporary, "wb") as file:
+                    np.savez(file, vectors=vectors, expires_at=expires_at, accessed_at=accessed_at,
+                             metadata=np.array(metadata))
+                os.replace(temporary, self.path)
+            logger.info(f"Cache sémantique sauvegardé: {len(entries)} entrées dans {self.path}")
+        except OSError as e:
+            logger.error(f"Erreur de sauvegarde du cache sémantique: {str(e)}")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Verrou exclusif entre processus sur le fichier de sauvegarde."""
+        with open(f"{self.path}.lock", "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _merge(self, *indexes: Tuple) -> Tuple:
+        """Fusionne des index sauvegardés : entrées valides, une par question et configuration."""
+        now = time.time()
+        rows: Dict[str, Tuple] = {}
+        for vectors, expires_at, accessed_at, entries in indexes:
+            for row, entry in enumerate(entries):
+                if expires_at[row] < now:
+                    continue
+                key = json.dumps([entry["config_key"], entry["signature"]], sort_keys=True, ensure_ascii=False)
+                if key not in rows or accessed_at[row] > rows[key][2]:
+                    rows[key] = (vectors[row], expires_at[row], accessed_at[row], entry)
+        kept = sorted(rows.values(), key=lambda row: -row[2])[:self.max_entries]
+        return (
+            np.array([row[0] for row in kept], dtype=np.float32).reshape(len(kept), self.vectorizer.dimensions),
+            np.array([row[1] for row in kept]), np.array([row[2] for row in kept]), [row[3] for row in kept],
+        )
+
+    def _read(self) -> Optional[Tuple]:
+        """Index sauvegardé (vecteurs, expirations, accès, entrées), ou None s'il est absent ou incompatible."""
+        if self.path is None or not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                metadata = json.loads(str(data["metadata"]))
+                vectors = data["vectors"].astype(np.float32)
+                expires_at = data["expires_at"]
+                accessed_at = data["accessed_at"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Cache sémantique illisible ({self.path}): {str(e)}")
+            return None
+        if metadata.get("version") != FORMAT_VERSION or metadata.get("dimensions") != self.vectorizer.dimensions:
+            logger.warning(f"Cache sémantique {self.path} incompatible, ignoré")
+            return None
+        return vectors, expires_at, accessed_at, metadata["entries"]
+
+    def load(self) -> None:
+        """Recharge l'index sauvegardé, sans les entrées expirées."""
+        saved = self._read()
+        if saved is None:
+            return
+        vectors, expires_at, accessed_at, entries = saved
+
+        # Entrées encore valides, les plus récemment utilisées d'abord si la capacité a été réduite
+        rows = np.flatnonzero(expires_at >= time.time())
+        rows = rows[np.argsort(-accessed_at[rows])][:self.max_entries]
+        with self._lock:
+            self._size = 0
+            self._grow(max(64, min(self.max_entries, len(rows))))
+            self._size = len(rows)
+            self._vectors[:self._size] = vectors[rows]
+            self._expires_at[:self._size] = expires_at[rows]
+            self._accessed_at[:self._size] = accessed_at[rows]
+            self._entries = [entries[row] for row in rows]
+        logger.info(f"Cache sémantique rechargé: {self._size} entrées depuis {self.path}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._size = 0
+            self._entries = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,341 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.agent_pool import AgentPool
+from app.core.cache import ResponseCache, StageCache, response_cache_key, response_config_key
+from app.core.coalescing import SingleFlight
+from app.core.crew import SPECULATIVE_CANDIDATES_DEFAULT, QuestionCrew
+from app.core.executor import CrewExecutor
+from app.core.metrics import QUESTION_DURATION, QUESTIONS
+from app.core.parsing import ResponseParser
+from app.core.prompts import PromptRegistry
+from app.core.retry import RetryPolicy
+from app.core.semantic_cache import SemanticCache
+from app.core.tracing import Trace, Tracer, new_trace_id
+from app.models.schemas import BatchItemResult, QuestionRequest, QuestionResponse
+
+
+class QuestionService:
+    """
+    Point d'entrée unique du traitement d'une question.
+
+    Enchaîne le cache de réponses (exact puis sémantique), la déduplication des
+    questions identiques en cours, le contrôle d'admission du pool d'exécution et
+    le pipeline CrewAI.
+    """
+
+    def __init__(self, executor: CrewExecutor, agent_pool: AgentPool,
+                 response_cache: ResponseCache, stage_cache: Optional[StageCache] = None,
+                 batch_concurrency: int = 4, batch_max_concurrency: int = 16,
+                 pipeline_mode: str = "full", parser: Optional[ResponseParser] = None,
+                 retry_policy: Optional[RetryPolicy] = None,
+                 speculative_candidates: int = SPECULATIVE_CANDIDATES_DEFAULT,
+                 speculative_requests: bool = False,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 prompts: Optional[PromptRegistry] = None, tracer: Optional[Tracer] = None):
+        self.executor = executor
+        self.agent_pool = agent_pool
+        self.response_cache = response_cache
+        self.semantic_cache = semantic_cache
+        self.stage_cache = stage_cache
+        self.single_flight = SingleFlight()
+        self.batch_concurrency = batch_concurrency
+        self.batch_max_concurrency = batch_max_concurrency
+        self.pipeline_mode = pipeline_mode
+        self.parser = parser or ResponseParser()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.speculative_candidates = speculative_candidates
+        self.speculative_requests = speculative_requests
+        self.prompts = prompts or PromptRegistry()
+        self.tracer = tracer or Tracer()
+
+    @classmethod
+    def from_env(cls) -> "QuestionService":
+        """Construit le service et ses composants à partir des variables d'environnement."""
+        return cls(
+            executor=CrewExecutor.from_env(),
+            agent_pool=AgentPool.from_env(),
+            response_cache=ResponseCache.from_env(),
+            stage_cache=StageCache.from_env(),
+            batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "4")),
+            batch_max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", "16")),
+            pipeline_mode=os.getenv("PIPELINE_MODE", "full"),
+            parser=ResponseParser.from_env(),
+            retry_policy=RetryPolicy.from_env(),
+            speculative_candidates=int(os.getenv("SPECULATIVE_CANDIDATES", str(SPECULATIVE_CANDIDATES_DEFAULT))),
+            speculative_requests=os.getenv("SPECULATIVE_REQUESTS_ENABLED", "false").lower() in ("1", "true", "yes"),
+            semantic_cache=SemanticCache.from_env(),
+            prompts=PromptRegistry.from_env(),
+            tracer=Tracer.from_env(),
+        )
+
+    async def answer(self, request: QuestionRequest, wait: bool = False, client: str = "",
+                     trace_id: Optional[str] = None) -> Tuple[QuestionResponse, bool]:
+        """
+        Traite une question et indique si la réponse provient du cache.
+
+        Lève CrewPoolSaturated si le pool d'exécution est saturé, sauf avec
+        `wait=True` où la question attend qu'une place se libère. `client`
+        identifie le demandeur pour le partage équitable des places ; `trace_id`
+        identifie la trace de la requête (générée si absent).
+        """
+        trace = self.tracer.start(trace_id, client=client or None, question=request.question[:200])
+        outcome: Dict = {"error": "annulée"}
+        try:
+            with logger.contextualize(trace_id=trace.trace_id):
+                response, source = await self._answer(request, wait, client, trace)
+            outcome = {"source": source, "status": response.status}
+            return response, source in ("cache", "semantic_cache")
+        except Exception as e:
+            outcome = {"error": f"{type(e).__name__}: {str(e)}"}
+            raise
+        finally:
+            self.tracer.finish(trace, **outcome)
+
+    async def _answer(self, request: QuestionRequest, wait: bool, client: str,
+                      trace: Trace) -> Tuple[QuestionResponse, str]:
+        """Réponse à une question et sa provenance (cache, cache sémantique, pipeline ou traitement rejoint)."""
+        cache_key = self._cache_key(request)
+        if not (request.bypass_cache or request.refresh_cache):
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                logger.info("Réponse servie depuis le cache")
+                QUESTIONS.inc(source="cache")
+                return cached, "cache"
+            cached = self._semantic_lookup(request)
+            if cached is not None:
+                QUESTIONS.inc(source="semantic_cache")
+                return cached, "semantic_cache"
+
+        # Les requêtes identiques concurrentes partagent le même traitement (et sa trace)
+        flight_key = self._flight_key(cache_key, request, wait)
+        joined = flight_key in self.single_flight
+        response = await self.single_flight.do(
+            flight_key, lambda: self._process(request, cache_key, wait, client, trace)
+        )
+        source = "coalesced" if joined else "pipeline"
+        QUESTIONS.inc(source=source)
+        return response, source
+
+    async def stream(self, request: QuestionRequest, client: str = "",
+                     trace_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Traite une question en publiant le résultat de chaque étape.
+
+        Le premier événement (`accepted`) est produit dès l'admission de la requête,
+        ce qui permet de répondre 503 avant d'ouvrir le flux si le pool est saturé.
+        Les flux ne sont pas fusionnés entre eux : chaque client reçoit ses propres étapes.
+        """
+        trace = self.tracer.start(trace_id, "question (flux)", client=client or None, question=request.question[:200])
+        outcome: Dict = {"error": "annulée"}
+        try:
+            async for event, data in self._stream(request, client, trace):
+                if event == "response":
+                    outcome = {"status": data["status"]}
+                yield event, data
+        except Exception as e:
+            outcome = {"error": f"{type(e).__name__}: {str(e)}"}
+            raise
+        finally:
+            self.tracer.finish(trace, **outcome)
+
+    async def _stream(self, request: QuestionRequest, client: str, trace: Trace) -> AsyncIterator[Tuple[str, Any]]:
+        cache_key = self._cache_key(request)
+        if not (request.bypass_cache or request.refresh_cache):
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                logger.info("Réponse servie depuis le cache")
+                QUESTIONS.inc(source="cache")
+            else:
+                cached = self._semantic_lookup(request)
+                if cached is not None:
+                    QUESTIONS.inc(source="semantic_cache")
+            if cached is not None:
+                trace.attributes["source"] = "cache"
+                yield "accepted", {"cached": True}
+                yield "refined_question", cached.refined_question
+                yield "initial_answer", cached.initial_answer
+                yield "quality_score", cached.quality_score
+                yield "response", cached.model_dump()
+                return
+
+        trace.attributes["source"] = "pipeline"
+        admission = trace.start_span("admission")
+        async with self.executor.slot(client=client):
+            admission.finish()
+            yield "accepted", {"cached": False}
+            start_time = time.time()
+            async for event, data in self._run_crew(request, trace):
+                if event == "response":
+                    QUESTIONS.inc(source="pipeline")
+                    QUESTION_DURATION.observe(time.time() - start_time)
+                    await self._remember(request, cache_key, QuestionResponse(**data))
+                yield event, data
+
+    async def answer_batch(self, items: List[QuestionRequest], concurrency: Optional[int] = None,
+                           client: str = "", trace_id: Optional[str] = None,
+                           admit: Optional[Callable[[int], Awaitable[None]]] = None) -> List[BatchItemResult]:
+        """
+        Traite un lot de questions avec une concurrence bornée.
+
+        Les questions identiques du lot ne sont traitées qu'une fois. Une erreur sur
+        une question est reportée dans son résultat sans interrompre le reste du lot ;
+        les résultats sont retournés dans l'ordre des questions reçues. Chaque
+        question a sa trace, `<trace_id>-<index>`. `admit`, appelée une fois par
+        question avant son traitement avec le coût de la question, peut la faire
+        attendre (limite de débit).
+        """
+        trace_id = trace_id or new_trace_id()
+        limit = max(1, min(concurrency or self.batch_concurrency, self.batch_max_concurrency))
+        semaphore = asyncio.Semaphore(limit)
+
+        # Regroupement des questions identiques du lot
+        groups: Dict[str, List[int]] = {}
+        for index, item in enumerate(items):
+            key = self._flight_key(self._cache_key(item), item, wait=True)
+            groups.setdefault(key, []).append(index)
+        logger.info(f"Lot de {len(items)} questions ({len(groups)} distinctes), concurrence {limit}")
+
+        async def run_group(indexes: List[int]) -> Tuple[Optional[QuestionResponse], Optional[str]]:
+            async with semaphore:
+                try:
+                    if admit is not None:
+                        for index in indexes:
+                            await admit(self.request_cost(items[index]))
+                    response, _ = await self.answer(items[indexes[0]], wait=True, client=client,
+                                                    trace_id=f"{trace_id}-{indexes[0]}")
+                    return response, None
+                except Exception as e:
+                    logger.error(f"Erreur lors du traitement de la question {indexes[0]} du lot: {str(e)}")
+                    return None, f"Erreur lors du traitement de la question: {str(e)}"
+
+        outcomes = await asyncio.gather(*(run_group(indexes) for indexes in groups.values()))
+
+        results: List[Optional[BatchItemResult]] = [None] * len(items)
+        for indexes, (response, error) in zip(groups.values(), outcomes):
+            for index in indexes:
+                results[index] = BatchItemResult(index=index, response=response, error=error)
+        return results
+
+    async def _process(self, request: QuestionRequest, cache_key: str, wait: bool, client: str,
+                       trace: Trace) -> QuestionResponse:
+        result: Dict = {}
+        # Attente d'une place d'exécution (span laissé ouvert, donc abandonné, si la requête est refusée)
+        admission = trace.start_span("admission", wait=wait)
+        async with self.executor.slot(wait=wait, client=client):
+            admission.finish()
+            start_time = time.time()
+            async for event, data in self._run_crew(request, trace):
+                if event == "response":
+                    result = data
+            QUESTION_DURATION.observe(time.time() - start_time)
+
+        response = QuestionResponse(**result)
+        await self._remember(request, cache_key, response)
+        return response
+
+    def _pipeline_mode(self, request: QuestionRequest) -> str:
+        """Mode du pipeline effectif d'une requête (celui de la requête, sinon celui du service)."""
+        return request.pipeline_mode or self.pipeline_mode
+
+    def pipeline_mode_allowed(self, request: QuestionRequest) -> bool:
+        """
+        Indique si le mode de pipeline choisi par la requête est autorisé.
+
+        Le mode `speculative` multiplie les threads et les appels au modèle : une
+        requête ne peut le choisir que si SPECULATIVE_REQUESTS_ENABLED l'autorise
+        (ou s'il est déjà le mode du service).
+        """
+        return (request.pipeline_mode != "speculative" or self.speculative_requests
+                or self.pipeline_mode == "speculative")
+
+    def request_cost(self, request: QuestionRequest) -> int:
+        """Nombre de questions décomptées dans la limite de débit : une par réponse candidate générée."""
+        if self._pipeline_mode(request) == "speculative":
+            return max(1, self.speculative_candidates)
+        return 1
+
+    def _cache_key(self, request: QuestionRequest) -> str:
+        """Clé de cache de la réponse d'une requête."""
+        return response_cache_key(request.question, request.agent_params, self._pipeline_mode(request))
+
+    @staticmethod
+    def _flight_key(cache_key: str, request: QuestionRequest, wait: bool) -> str:
+        """
+        Clé de fusion des requêtes identiques et de regroupement dans un lot.
+
+        Seul le traitement du premier appelant s'exécute : les options qui changent
+        ce traitement (attente d'une place, contournement ou rafraîchissement des
+        caches) en font partie, sans quoi une requête qui attend recevrait le refus
+        d'une requête `/ask`, ou un rafraîchissement une réponse issue du cache.
+        """
+        return f"{cache_key}|wait={int(wait)}|bypass={int(request.bypass_cache)}|refresh={int(request.refresh_cache)}"
+
+    def _semantic_lookup(self, request: QuestionRequest) -> Optional[QuestionResponse]:
+        """Réponse validée d'une question similaire déjà traitée (paraphrase)."""
+        if self.semantic_cache is None:
+            return None
+        cached = self.semantic_cache.get(
+            request.question, response_config_key(request.agent_params, self._pipeline_mode(request))
+        )
+        if cached is None:
+            return None
+        return cached.model_copy(update={"original_question": request.question})
+
+    async def _remember(self, request: QuestionRequest, cache_key: str, response: QuestionResponse) -> None:
+        """Met en cache une réponse du pipeline (seules les réponses validées sont conservées)."""
+        if request.bypass_cache:
+            return
+        await self.response_cache.aset(cache_key, response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.set(response, response_config_key(request.agent_params, self._pipeline_mode(request)))
+            if self.semantic_cache.save_due:
+                # Écriture sur disque hors de la boucle d'événements et du pool CrewAI
+                await asyncio.get_running_loop().run_in_executor(None, self.semantic_cache.save)
+
+    async def _run_crew(self, request: QuestionRequest, trace: Trace) -> AsyncIterator[Tuple[str, Any]]:
+        """Exécute le pipeline avec un jeu d'agents emprunté au pool (place d'exécution déjà réservée)."""
+        # Emprunt d'un jeu d'agents (créé hors de la boucle d'événements si nécessaire)
+        with trace.span("agents"):
+            agents = await self.executor.call(self.agent_pool.acquire, request.agent_params)
+        try:
+            crew = QuestionCrew(
+                request.agent_params,
+                executor=self.executor.pool,
+                agents=agents,
+                # Sans cache : aucune étape n'est lue ni écrite ; en recalcul, les étapes
+                # sont recalculées et le cache mis à jour
+                stage_cache=None if request.bypass_cache else self.stage_cache,
+                refresh_stage_cache=request.refresh_cache,
+                pipeline_mode=self._pipeline_mode(request),
+                parser=self.parser,
+                retry_policy=self.retry_policy,
+                speculative_candidates=self.speculative_candidates,
+                semantic_cache=None if request.bypass_cache or request.refresh_cache else self.semantic_cache,
+                prompts=self.prompts,
+                trace=trace
+            )
+
+            # Traitement asynchrone : les appels LLM s'exécutent dans le pool dédié
+            async for event, data in crew.astream_question(request.question):
+                yield event, data
+        finally:
+            self.agent_pool.release(agents)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.executor.in_flight,
+            "coalesced": self.single_flight.coalesced,
+            "agent_pool": self.agent_pool.stats(),
+            "scheduler": self.executor.scheduler.stats(),
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+        self.tracer.shutdown()
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
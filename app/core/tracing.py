@@ -0,0 +1,304 @@
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+# Identifiant de trace fourni par le client (X-Request-ID) : repris s'il est raisonnable
+_TRACE_ID_RE = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+_HEX_TRACE_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+# Statuts d'un span
+SPAN_OK = "ok"
+SPAN_ERROR = "error"
+SPAN_INVALID = "invalid"  # Réponse rejetée par les contrôles de l'étape
+SPAN_TIMEOUT = "timeout"
+SPAN_FALLBACK = "fallback"  # Toutes les tentatives ont échoué : réponse de repli
+SPAN_ABANDONED = "abandoned"
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def trace_id_from(value: Optional[str]) -> str:
+    """Identifiant de trace transmis par le client s'il est valide, sinon un nouvel identifiant."""
+    if value and _TRACE_ID_RE.fullmatch(value):
+        return value
+    return new_trace_id()
+
+
+class Span:
+    """Opération chronométrée d'une trace (étape, tentative, attente d'une place...)."""
+
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "status", "attributes")
+
+    def __init__(self, span_id: int, parent_id: Optional[int], name: str, attributes: Dict[str, Any]):
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.status = SPAN_OK
+        self.attributes = attributes
+
+    def finish(self, status: str = SPAN_OK, **attributes: Any) -> None:
+        if self.end is not None:
+            return
+        self.end = time.perf_counter()
+        self.status = status
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Trace:
+    """
+    Trace d'une requête : identifiant et spans de ses étapes et tentatives.
+
+    Les spans sont enregistrés à plat avec l'identifiant de leur parent ; ils
+    peuvent être créés depuis plusieurs threads (candidats du mode spéculatif,
+    pool CrewAI). Le nombre de spans est borné par `max_spans`.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None, name: str = "question", max_spans: int = 200,
+                 **attributes: Any):
+        self.trace_id = trace_id or new_trace_id()
+        self.name = name
+        self.max_spans = max_spans
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+        span = Span(next(self._ids), parent.span_id if parent is not None else None, name, attributes)
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        return span
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+        span = self.start_span(name, parent, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(SPAN_ERROR, error=f"{type(e).__name__}: {str(e)}")
+            raise
+        finally:
+            span.finish()
+
+    def finish(self, **attributes: Any) -> None:
+        """Termine la trace ; les spans encore ouverts (ex : tentative annulée) sont marqués abandonnés."""
+        if self.end is not None:
+            return
+        self.end = time.perf_counter()
+        self.attributes.update(attributes)
+        with self._lock:
+            for span in self.spans:
+                if span.end is None:
+                    span.finish(SPAN_ABANDONED)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def stages(self) -> Dict[str, float]:
+        """Durée cumulée par étape (spans de premier niveau, par équipage)."""
+        breakdown: Dict[str, float] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            if span.parent_id is None:
+                key = span.attributes.get("key", span.name)
+                breakdown[key] = round(breakdown.get(key, 0.0) + span.duration, 4)
+        return breakdown
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 4),
+            "attributes": dict(self.attributes),
+            "stages": self.stages(),
+            "spans": [
+                {
+                    "id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "offset": round(span.start - self.start, 4),
+                    "duration": round(span.duration, 4),
+                    "status": span.status,
+                    "attributes": dict(span.attributes),
+                }
+                for span in spans
+            ],
+            "dropped_spans": self.dropped,
+        }
+
+
+class SlowRequestRecorder:
+    """Les `size` requêtes les plus lentes, avec le détail de leurs étapes (tas borné en mémoire)."""
+
+    def __init__(self, size: int = 20):
+        self.size = size
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> None:
+        if self.size <= 0:
+            return
+        duration = trace.duration
+        with self._lock:
+            if len(self._heap) >= self.size and duration <= self._heap[0][0]:
+                return
+        # Sérialisation hors du verrou, seulement pour les requêtes retenues
+        entry = (duration, next(self._sequence), trace.to_dict())
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def snapshot(self) -> List[Dict]:
+        """Requêtes enregistrées, de la plus lente à la plus rapide."""
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [trace for _, _, trace in entries]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap = []
+
+
+class OTLPExporter:
+    """
+    Export des traces terminées vers un collecteur OpenTelemetry (OTLP/HTTP).
+
+    Les spans sont recréés à la fin de la requête avec leurs horodatages : aucun
+    contexte OpenTelemetry n'a à traverser les threads du pool. Le fournisseur
+    de traces est propre à l'application (CrewAI installe le sien comme
+    fournisseur global pour sa télémétrie). Le collecteur est configuré par les
+    variables standard `OTEL_EXPORTER_OTLP_*`.
+    """
+
+    def __init__(self, service_name: str = "crew-api"):
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+        self._otel = otel_trace
+        self.provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        self.tracer = self.provider.get_tracer("app.core.tracing")
+
+    def export(self, trace: Trace) -> None:
+        otel = self._otel
+        start_ns = int(trace.started_at * 1e9)
+
+        def to_ns(instant: float) -> int:
+            return start_ns + int((instant - trace.start) * 1e9)
+
+        # Identifiant hexadécimal de 128 bits : repris comme identifiant de trace OpenTelemetry
+        context = None
+        if _HEX_TRACE_ID_RE.fullmatch(trace.trace_id):
+            parent = otel.NonRecordingSpan(otel.SpanContext(
+                trace_id=int(trace.trace_id, 16), span_id=random.getrandbits(64), is_remote=True,
+                trace_flags=otel.TraceFlags(otel.TraceFlags.SAMPLED)
+            ))
+            context = otel.set_span_in_context(parent)
+
+        root = self.tracer.start_span(trace.name, context=context, start_time=start_ns,
+                                      attributes=_otel_attributes(dict(trace.attributes, trace_id=trace.trace_id)))
+        created = {}
+        for span in sorted(trace.spans, key=lambda span: span.span_id):
+            parent = created.get(span.parent_id, root)
+            otel_span = self.tracer.start_span(
+                span.name, context=otel.set_span_in_context(parent), start_time=to_ns(span.start),
+                attributes=_otel_attributes(dict(span.attributes, status=span.status))
+            )
+            if span.status != SPAN_OK:
+                otel_span.set_status(otel.Status(otel.StatusCode.ERROR, span.status))
+            otel_span.end(end_time=to_ns(span.end if span.end is not None else trace.end))
+            created[span.span_id] = otel_span
+        root.end(end_time=to_ns(trace.end if trace.end is not None else time.perf_counter()))
+
+    def shutdown(self) -> None:
+        self.provider.shutdown()
+
+
+def _otel_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenTelemetry n'accepte que des valeurs scalaires (ou des listes de scalaires)
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items() if value is not None
+    }
+
+
+class Tracer:
+    """
+    Création et collecte des traces de requêtes.
+
+    Chaque trace terminée est proposée à l'enregistreur des requêtes les plus
+    lentes (`/debug/slow`) et, si l'export est activé, envoyée au collecteur
+    OpenTelemetry.
+    """
+
+    def __init__(self, slow_requests: int = 20, max_spans: int = 200, exporter: Optional[OTLPExporter] = None):
+        self.slow_requests = SlowRequestRecorder(slow_requests)
+        self.max_spans = max_spans
+        self.exporter = exporter
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Construit le traceur à partir des variables d'environnement."""
+        exporter = None
+        if os.getenv("TRACING_OTLP_ENABLED", "false").lower() in ("1", "true", "yes"):
+            try:
+                exporter = OTLPExporter(os.getenv("OTEL_SERVICE_NAME", "crew-api"))
+                logger.info("Export des traces OpenTelemetry activé")
+            except ImportError as e:
+                logger.warning(f"Export des traces OpenTelemetry indisponible: {str(e)}")
+        return cls(
+            slow_requests=int(os.getenv("TRACING_SLOW_REQUESTS", "20")),
+            max_spans=int(os.getenv("TRACING_MAX_SPANS", "200")),
+            exporter=exporter,
+        )
+
+    def start(self, trace_id: Optional[str] = None, name: str = "question", **attributes: Any) -> Trace:
+        return Trace(trace_id, name, self.max_spans, **attributes)
+
+    def finish(self, trace: Trace, **attributes: Any) -> None:
+        trace.finish(**attributes)
+        self.slow_requests.record(trace)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.error(f"Erreur d'export de la trace {trace.trace_id}: {str(e)}")
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
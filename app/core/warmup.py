@@ -0,0 +1,41 @@
+import asyncio
+import os
+import time
+
+from loguru import logger
+
+
+class WarmupState:
+    """État de préchauffage d'un worker, exposé par l'endpoint de disponibilité."""
+
+    def __init__(self):
+        self.ready = False
+        self.error: str = ""
+        self.duration = 0.0
+
+
+async def warm_up(service, state: WarmupState) -> None:
+    """
+    Prépare le worker avant qu'il ne reçoive du trafic.
+
+    Importe CrewAI (déjà fait par le processus maître avec gunicorn --preload) puis
+    construit les jeux d'agents par défaut dans le pool et charge l'encodage
+    tiktoken des prompts, pour que la première question ne paie pas ce coût. Le worker est marqué disponible même en cas
+    d'échec : les agents seront alors créés à la première requête.
+    """
+    start_time = time.time()
+    count = int(os.getenv("WARMUP_AGENT_SETS", "1"))
+    try:
+        import crewai  # noqa: F401
+
+        if count > 0:
+            await service.executor.call(service.agent_pool.prewarm, None, count)
+        # Chargement bloquant (accès réseau possible) exécuté hors de la boucle d'événements
+        await asyncio.get_running_loop().run_in_executor(None, service.prompts.counter.load)
+        logger.info(f"Préchauffage terminé: {count} jeu(x) d'agents prêt(s)")
+    except Exception as e:
+        state.error = str(e)
+        logger.error(f"Erreur lors du préchauffage: {str(e)}")
+    finally:
+        state.duration = time.time() - start_time
+        state.ready = True
@@ -1,17 +1,37 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
+import asyncio
+import hmac
 import os
+import json
+from typing import Optional
 from dotenv import load_dotenv
 
-from app.models.schemas import QuestionRequest, QuestionResponse
-from app.core.crew import QuestionCrew
+from app.models.schemas import (
+    BatchRequest,
+    BatchResponse,
+    JobCreatedResponse,
+    JobRequest,
+    JobStatusResponse,
+    QuestionRequest,
+    QuestionResponse
+)
+from app.core.executor import CrewPoolSaturated
+from app.core.logging_config import configure_logging
+from app.core.service import QuestionService
+from app.core.jobs import CallbackUrlError, JobQueue
+from app.core.rate_limit import RateLimiter
+from app.core.tracing import trace_id_from
+from app.core.warmup import WarmupState, warm_up
+from app.core.metrics import REGISTRY, CounterFunc, Gauge
 
 # Chargement des variables d'environnement
 load_dotenv()
 
 # Configuration de la journalisation
-logger.add("app.log", rotation="500 MB")
+configure_logging()
 
 app = FastAPI(
     title="CrewAI Question API",
@@ -19,6 +39,52 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Service de traitement des questions (pool d'exécution, pool d'agents, caches)
+question_service = QuestionService.from_env()
+
+# File de jobs traités en arrière-plan
+job_queue = JobQueue.from_env(question_service)
+
+# Limitation de débit par clé d'API ou adresse IP
+rate_limiter = RateLimiter.from_env()
+
+# État du préchauffage (endpoint /ready)
+warmup_state = WarmupState()
+
+# Jauges exposées sur /metrics
+REGISTRY.register(Gauge(
+    "crew_requests_in_flight", "Questions en cours d'exécution dans le pool",
+    lambda: question_service.executor.in_flight
+))
+REGISTRY.register(Gauge(
+    "crew_requests_in_flight_limit", "Nombre maximum de questions en cours",
+    lambda: question_service.executor.max_in_flight
+))
+REGISTRY.register(Gauge(
+    "crew_scheduler_waiting", "Questions en attente d'une place d'exécution (lots, jobs)",
+    lambda: question_service.executor.scheduler.waiting
+))
+REGISTRY.register(Gauge(
+    "crew_coalesced_in_flight", "Traitements distincts en cours (après fusion des requêtes identiques)",
+    lambda: question_service.single_flight.in_flight
+))
+REGISTRY.register(CounterFunc(
+    "crew_coalesced_requests_total", "Requêtes rattachées à un traitement identique en cours (cumul)",
+    lambda: question_service.single_flight.coalesced
+))
+REGISTRY.register(CounterFunc(
+    "crew_response_cache_hits_total", "Réponses servies par le cache (cumul)",
+    lambda: question_service.response_cache.hits
+))
+REGISTRY.register(CounterFunc(
+    "crew_response_cache_misses_total", "Questions absentes du cache (cumul)",
+    lambda: question_service.response_cache.misses
+))
+REGISTRY.register(Gauge(
+    "crew_jobs_pending", "Jobs en attente de traitement",
+    lambda: job_queue.counts.get("pending", 0)
+))
+
 # Configuration CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,36 +94,277 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _client_id(http_request: Request) -> str:
+    return rate_limiter.client_id(
+        http_request.headers, http_request.client.host if http_request.client else None
+    )
+
+def _check_rate_limit(http_request: Request, headers, cost: int = 1, client: Optional[str] = None) -> str:
+    """
+    Décompte la requête dans la limite de débit du client et retourne son identifiant.
+
+    Les en-têtes X-RateLimit-* sont ajoutés à `headers` ; lève une erreur 429 si
+    la limite est dépassée. `client` évite de recalculer l'identifiant s'il est déjà connu.
+    """
+    client = client or _client_id(http_request)
+    decision = rate_limiter.check(client, cost)
+    headers.update(decision.headers())
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Limite de débit atteinte. Veuillez réessayer plus tard.",
+            headers=decision.headers()
+        )
+    return client
+
+def _request_cost(request: QuestionRequest) -> int:
+    """Coût d'une question dans la limite de débit ; refuse (403) un mode de pipeline non autorisé."""
+    if not question_service.pipeline_mode_allowed(request):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Le mode de pipeline '{request.pipeline_mode}' n'est pas autorisé pour une requête"
+        )
+    return question_service.request_cost(request)
+
+def _trace_id(http_request: Request) -> str:
+    """Identifiant de trace de la requête : X-Request-ID du client s'il est valide, sinon généré."""
+    return trace_id_from(http_request.headers.get("x-request-id"))
+
 @app.post("/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, response: Response, http_request: Request):
     """
     Traite une question utilisateur avec l'équipe CrewAI.
     
     - **question**: La question de l'utilisateur
     - **agent_params**: Paramètres optionnels pour configurer les agents
+    - **bypass_cache**: Ne pas utiliser le cache de réponses
+    - **refresh_cache**: Recalculer la réponse et mettre à jour le cache
     """
+    trace_id = _trace_id(http_request)
+    response.headers["X-Trace-Id"] = trace_id
+    client = _check_rate_limit(http_request, response.headers, cost=_request_cost(request))
     try:
-        logger.info(f"Nouvelle question reçue: {request.question}")
-        
-        # Création de l'équipe
-        crew = QuestionCrew(request.agent_params)
+        logger.info(f"Nouvelle question reçue: {request.question} (trace {trace_id})")
         
-        # Traitement de la question
-        result = crew.process_question(request.question)
+        question_response, cached = await question_service.answer(request, client=client, trace_id=trace_id)
         
         logger.info("Question traitée avec succès")
-        return QuestionResponse(**result)
+        response.headers["X-Cache"] = "HIT" if cached else "MISS"
+        return question_response
         
+    except CrewPoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Trop de questions en cours de traitement. Veuillez réessayer plus tard.",
+            headers={**response.headers, "Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Erreur lors du traitement de la question: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail=f"Erreur lors du traitement de la question: {str(e)}"
+            detail=f"Erreur lors du traitement de la question: {str(e)}",
+            headers={"X-Trace-Id": trace_id}
+        )
+
+# Nombre maximum de questions par lot
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+@app.post("/ask/batch", response_model=BatchResponse)
+async def ask_batch(request: BatchRequest, response: Response, http_request: Request):
+    """
+    Traite un lot de questions en parallèle.
+    
+    - **items**: Liste de questions (même format que `/ask`)
+    - **concurrency**: Nombre optionnel de questions traitées en parallèle
+    
+    Chaque résultat contient soit `response`, soit `error` ; une erreur sur une
+    question n'interrompt pas le reste du lot. Chaque question du lot compte
+    dans la limite de débit du client (autant de fois que de candidates en mode
+    spéculatif) : les premières (au plus la rafale autorisée) à la réception du
+    lot, les suivantes au moment de leur traitement, qui attend que le débit du
+    client le permette.
+    """
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Le lot contient {len(request.items)} questions (maximum {BATCH_MAX_ITEMS})"
+        )
+    
+    trace_id = _trace_id(http_request)
+    response.headers["X-Trace-Id"] = trace_id
+    client = _client_id(http_request)
+    cost = sum(_request_cost(item) for item in request.items)
+    prepaid = int(min(cost, rate_limiter.burst_for(client)))
+    _check_rate_limit(http_request, response.headers, cost=prepaid, client=client)
+    logger.info(f"Nouveau lot reçu: {len(request.items)} questions (trace {trace_id})")
+    results = await question_service.answer_batch(
+        request.items, request.concurrency, client=client, trace_id=trace_id,
+        admit=rate_limiter.admission(client, prepaid)
+    )
+    return BatchResponse(results=results)
+
+@app.post("/jobs", response_model=JobCreatedResponse, status_code=202)
+async def create_job(request: JobRequest, response: Response, http_request: Request):
+    """
+    Soumet une question pour un traitement en arrière-plan.
+    
+    Retourne immédiatement l'identifiant du job, à interroger via `GET /jobs/{job_id}`.
+    Si **callback_url** est fourni, le job terminé y est envoyé en POST.
+    """
+    if request.callback_url:
+        try:
+            await job_queue.check_callback_url(request.callback_url)
+        except CallbackUrlError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    
+    question = QuestionRequest(**request.model_dump(exclude={"callback_url"}))
+    client = _check_rate_limit(http_request, response.headers, cost=_request_cost(question))
+    job_id = await job_queue.submit(question, request.callback_url, client=client)
+    # La trace du traitement porte l'identifiant du job
+    response.headers["X-Trace-Id"] = job_id
+    return JobCreatedResponse(job_id=job_id, status="pending")
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Retourne le statut d'un job et, une fois terminé, son résultat
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return JobStatusResponse(**job)
+
+def _format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, http_request: Request):
+    """
+    Traite une question et diffuse le résultat de chaque étape en Server-Sent Events.
+    
+    Événements : `accepted`, `refined_question`, `initial_answer`, `quality_score`,
+    puis `response` (réponse finale complète) ou `error`.
+    """
+    # Réponse en flux : les en-têtes de limite de débit sont transmis explicitement
+    trace_id = _trace_id(http_request)
+    rate_headers = {"X-Trace-Id": trace_id}
+    client = _check_rate_limit(http_request, rate_headers, cost=_request_cost(request))
+    logger.info(f"Nouvelle question reçue (flux): {request.question} (trace {trace_id})")
+    events = question_service.stream(request, client=client, trace_id=trace_id)
+    try:
+        # Attente de l'admission avant d'ouvrir le flux, pour pouvoir répondre 503
+        first_event = await events.__anext__()
+    except CrewPoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Trop de questions en cours de traitement. Veuillez réessayer plus tard.",
+            headers={**rate_headers, "Retry-After": str(e.retry_after)}
         )
 
+    async def event_stream():
+        yield _format_sse(*first_event)
+        try:
+            async for event, data in events:
+                yield _format_sse(event, data)
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement de la question (flux): {str(e)}")
+            yield _format_sse("error", {"detail": f"Erreur lors du traitement de la question: {str(e)}"})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **rate_headers}
+    )
+
 @app.get("/health")
 async def health_check():
     """
     Vérifie l'état de santé de l'API
     """
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Indique si le worker est prêt à recevoir du trafic (préchauffage terminé)
+    """
+    if not warmup_state.ready:
+        raise HTTPException(status_code=503, detail="Préchauffage en cours")
+    return {
+        "status": "ready",
+        "warmup_seconds": round(warmup_state.duration, 2),
+        "warmup_error": warmup_state.error or None
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métriques au format texte Prometheus (latences, tentatives et tokens par étape, requêtes en cours)
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Statistiques du cache de réponses, du cache sémantique et du cache par étape
+    """
+    # Décompte des entrées du backend SQLite (bloquant) hors de la boucle d'événements
+    stats = await asyncio.get_running_loop().run_in_executor(None, question_service.response_cache.stats)
+    stage_cache = question_service.stage_cache
+    stats["stages"] = stage_cache.stats() if stage_cache is not None else {}
+    semantic_cache = question_service.semantic_cache
+    stats["semantic"] = semantic_cache.stats() if semantic_cache is not None else {"enabled": False}
+    return stats
+
+# Endpoints de diagnostic : fermés par défaut, ouverts par DEBUG_ENDPOINTS_ENABLED
+# ou protégés par la clé d'administration ADMIN_API_KEY (en-tête X-Admin-Key)
+DEBUG_ENDPOINTS_ENABLED = os.getenv("DEBUG_ENDPOINTS_ENABLED", "false").lower() in ("1", "true", "yes")
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+def _check_debug_access(http_request: Request) -> None:
+    """Refuse l'accès à un endpoint de diagnostic : 404 s'il est fermé, 403 sans la clé d'administration."""
+    if ADMIN_API_KEY:
+        key = http_request.headers.get("X-Admin-Key", "")
+        if not hmac.compare_digest(key.encode("utf-8"), ADMIN_API_KEY.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="Clé d'administration invalide")
+    elif not DEBUG_ENDPOINTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.get("/debug/slow")
+async def slow_requests(http_request: Request):
+    """
+    Requêtes les plus lentes depuis le démarrage du worker (TRACING_SLOW_REQUESTS),
+    avec la durée de chaque étape et de chaque tentative.
+    Réservé à l'administration (ADMIN_API_KEY ou DEBUG_ENDPOINTS_ENABLED)
+    """
+    _check_debug_access(http_request)
+    recorder = question_service.tracer.slow_requests
+    return {"size": recorder.size, "requests": recorder.snapshot()}
+
+@app.get("/stats")
+async def service_stats():
+    """
+    Statistiques d'exécution : questions en cours, requêtes fusionnées, pool d'agents,
+    partage des places entre clients
+    """
+    stats = question_service.stats()
+    stats["rate_limited"] = rate_limiter.rejected
+    return stats
+
+@app.on_event("startup")
+async def start_job_queue():
+    """
+    Démarre les workers de la file de jobs et le préchauffage des agents
+    """
+    job_queue.start()
+    app.state.warmup_task = asyncio.create_task(warm_up(question_service, warmup_state))
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """
+    Arrête la file de jobs et libère le pool d'exécution CrewAI à l'arrêt du serveur
+    """
+    await job_queue.stop()
+    question_service.shutdown()
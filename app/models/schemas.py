@@ -1,9 +1,19 @@
-from typing import Dict, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, field_validator
+
+from app.core.agent_config import validate_agent_params
 
 class QuestionRequest(BaseModel):
     question: str
-    agent_params: Optional[Dict] = None
+    agent_params: Optional[Dict] = None  # Clés et valeurs limitées (voir validate_agent_params)
+    bypass_cache: bool = False  # Ignore le cache en lecture et en écriture
+    refresh_cache: bool = False  # Ignore le cache en lecture mais met à jour l'entrée
+    pipeline_mode: Optional[Literal["full", "adaptive", "speculative"]] = None  # Mode du pipeline (défaut: PIPELINE_MODE)
+
+    @field_validator("agent_params")
+    @classmethod
+    def check_agent_params(cls, value: Optional[Dict]) -> Optional[Dict]:
+        return validate_agent_params(value)
 
 class QuestionResponse(BaseModel):
     original_question: str
@@ -11,4 +21,32 @@ class QuestionResponse(BaseModel):
     initial_answer: str
     quality_score: float
     status: str
-    final_answer: str 
\ No newline at end of file
+    final_answer: str
+    stages: List[str] = []  # Agents effectivement exécutés
+
+class BatchRequest(BaseModel):
+    items: List[QuestionRequest]
+    concurrency: Optional[int] = None  # Nombre de questions traitées en parallèle
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: Optional[QuestionResponse] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+class JobRequest(QuestionRequest):
+    callback_url: Optional[str] = None  # URL appelée en POST à la fin du job
+
+class JobCreatedResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[QuestionResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
@@ -0,0 +1,326 @@
+"""
+Benchmark de charge hors ligne, sur le backend LLM local (LLM_BACKEND=fake).
+
+    python -m benchmarks.load_bench [--target crew|ask|all] [--concurrency 1,4,16]
+                                    [--requests 24] [--latency 0.2] [--failure-rate 0]
+
+Deux cibles :
+- `crew` : QuestionCrew.process_question, une instance (et un jeu d'agents) par thread ;
+- `ask` : l'endpoint POST /ask, via l'application ASGI complète (cache désactivé).
+
+Pour chaque niveau de concurrence : débit, latences p50/p95/p99, erreurs, requêtes
+refusées (503), appels LLM par requête et mémoire résidente. Une passe séquentielle
+sous tracemalloc mesure la mémoire allouée par requête. Les résultats sont écrits
+dans benchmarks/results/ et comparés au dernier résultat obtenu avec les mêmes
+paramètres, pour faire apparaître les régressions d'une version à l'autre.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).with_name("results")
+
+# Paramètres dont dépendent les résultats : seuls des résultats obtenus avec les
+# mêmes valeurs sont comparés
+COMPARABLE_PARAMETERS = ("latency", "jitter", "failure_rate", "requests", "workers")
+
+
+def configure_environment(options: argparse.Namespace) -> None:
+    """Fixe l'environnement avant l'import de l'application."""
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY": str(options.latency),
+        "LLM_FAKE_JITTER": str(options.jitter),
+        "LLM_FAKE_FAILURE_RATE": str(options.failure_rate),
+        "LLM_FAKE_SEED": str(options.seed),
+        "CREW_MAX_WORKERS": str(options.workers),
+        "LOG_MODE": "production",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+        "RESPONSE_CACHE_BACKEND": "none",
+        "STAGE_CACHE_ENABLED": "false",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        # Toutes les requêtes viennent d'un même client simulé : pas de limite par client
+        "RATE_LIMIT_ENABLED": "false",
+        "PROMPT_TOKENIZER": "estimate",
+        "CLIENT_MAX_IN_FLIGHT": str(options.workers * 2),
+        "WARMUP_AGENT_SETS": "0",
+        "OTEL_SDK_DISABLED": "true",
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Avertissements émis par la télémétrie CrewAI à chaque création d'équipage
+    logging.getLogger("opentelemetry").setLevel(logging.ERROR)
+
+
+def percentile(values: List[float], rank: float) -> float:
+    """Percentile par rang le plus proche."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(rank / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def rss_mb() -> float:
+    # ru_maxrss est exprimé en Ko sous Linux, en octets sous macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def summarize(target: str, concurrency: int, latencies: List[float], errors: int, rejected: int,
+              duration: float, llm_calls: int) -> Dict:
+    completed = len(latencies)
+    total = completed + errors + rejected
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": completed,
+        "errors": errors,
+        "rejected": rejected,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(completed / duration, 3) if duration else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "llm_calls_per_request": round(llm_calls / total, 2) if total else 0.0,
+        "rss_mb": round(rss_mb(), 1),
+    }
+
+
+def bench_crew(concurrency: int, requests: int) -> Dict:
+    from app.core.crew import QuestionCrew
+    from app.core.llm import FakeChatModel
+
+    local = threading.local()
+
+    def run(index: int) -> Optional[float]:
+        # Un QuestionCrew par thread, réutilisé comme le ferait le pool d'agents
+        crew = getattr(local, "crew", None)
+        if crew is None:
+            crew = local.crew = QuestionCrew()
+        start = time.perf_counter()
+        try:
+            crew.process_question(f"Question {index} : que sais-tu de la ville de Grasse ?")
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Une requête de chauffe par thread, hors mesure (création des agents)
+        list(pool.map(run, range(-concurrency, 0)))
+        FakeChatModel.reset_calls()
+        start = time.perf_counter()
+        outcomes = list(pool.map(run, range(requests)))
+        duration = time.perf_counter() - start
+
+    latencies = [outcome for outcome in outcomes if outcome is not None]
+    return summarize("crew", concurrency, latencies, len(outcomes) - len(latencies), 0, duration,
+                     FakeChatModel.calls)
+
+
+async def _bench_ask(app, concurrency: int, requests: int) -> Dict:
+    import httpx
+    from app.core.llm import FakeChatModel
+
+    latencies: List[float] = []
+    counts = {"errors": 0, "rejected": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 timeout=None) as client:
+        async def run(index: int) -> None:
+            payload = {"question": f"Question {index} : que sais-tu de la ville de Grasse ?", "bypass_cache": True}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/ask", json=payload)
+                elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                latencies.append(elapsed)
+            elif response.status_code == 503:
+                counts["rejected"] += 1
+            else:
+                counts["errors"] += 1
+
+        # Une requête de chauffe par place d'exécution, hors mesure (création des agents)
+        await asyncio.gather(*(run(-index) for index in range(1, concurrency + 1)))
+        latencies.clear()
+        counts.update(errors=0, rejected=0)
+        FakeChatModel.reset_calls()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(index) for index in range(requests)))
+        duration = time.perf_counter() - start
+
+    return summarize("ask", concurrency, latencies, counts["errors"], counts["rejected"], duration,
+                     FakeChatModel.calls)
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bench_ask(concurrency: int, requests: int) -> Dict:
+    from app.main import app
+
+    # Une seule boucle pour toutes les mesures : les primitives asyncio du service y sont liées
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(_bench_ask(app, concurrency, requests))
+
+
+def profile_memory(target: str, runner: Callable[[int, int], Dict], samples: int) -> Dict:
+    """Mémoire allouée par requête (pic et mémoire conservée), en séquentiel sous tracemalloc."""
+    runner(1, 1)  # Chauffe : imports, agents, caches internes
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        runner(1, samples)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "target": target,
+        "samples": samples,
+        "peak_kb": round((peak - before) / 1024, 1),
+        "retained_kb_per_request": round((current - before) / 1024 / samples, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except Exception:
+        return "inconnu"
+
+
+def load_previous(parameters: Dict) -> Optional[Dict]:
+    """Dernier résultat enregistré avec les mêmes paramètres."""
+    if not RESULTS_DIR.exists():
+        return None
+    for path in sorted(RESULTS_DIR.glob("*.json"), reverse=True):
+        try:
+            report = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            continue
+        previous = report.get("parameters", {})
+        if all(previous.get(name) == parameters.get(name) for name in COMPARABLE_PARAMETERS):
+            report["path"] = str(path)
+            return report
+    return None
+
+
+def compare(report: Dict, previous: Dict, tolerance: float) -> List[str]:
+    """Liste les régressions de débit ou de latence p95 au-delà de la tolérance."""
+    baseline = {(row["target"], row["concurrency"]): row for row in previous.get("results", [])}
+    regressions = []
+    print(f"\nComparaison avec {previous['path']} (commit {previous.get('git_commit')}) :")
+    for row in report["results"]:
+        old = baseline.get((row["target"], row["concurrency"]))
+        if old is None:
+            continue
+        throughput = (row["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] if old["throughput_rps"] else 0.0
+        p95 = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        flag = ""
+        if throughput < -tolerance or p95 > tolerance:
+            flag = "  <-- RÉGRESSION"
+            regressions.append(f"{row['target']} × {row['concurrency']}")
+        print(f"  {row['target']:<5} × {row['concurrency']:>3}  débit {throughput:+7.1%}  p95 {p95:+7.1%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument("--target", choices=("crew", "ask", "all"), default="all")
+    arguments.add_argument("--concurrency", default="1,4,16",
+                           help="Niveaux de concurrence, séparés par des virgules")
+    arguments.add_argument("--requests", type=int, default=24, help="Requêtes par niveau de concurrence")
+    arguments.add_argument("--latency", type=float, default=0.2, help="Latence moyenne d'un appel LLM (s)")
+    arguments.add_argument("--jitter", type=float, default=0.2, help="Gigue relative de la latence")
+    arguments.add_argument("--failure-rate", type=float, default=0.0, help="Taux d'échec des appels LLM")
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument("--workers", type=int, default=8, help="CREW_MAX_WORKERS pour la cible ask")
+    arguments.add_argument("--memory-samples", type=int, default=4)
+    arguments.add_argument("--tolerance", type=float, default=0.1,
+                           help="Écart relatif toléré avant de signaler une régression")
+    arguments.add_argument("--no-save", action="store_true", help="Ne pas enregistrer les résultats")
+    arguments.add_argument("--fail-on-regression", action="store_true")
+    options = arguments.parse_args()
+
+    configure_environment(options)
+    from app.core.logging_config import configure_logging
+    configure_logging()
+
+    levels = [int(level) for level in options.concurrency.split(",") if level.strip()]
+    runners = {"crew": bench_crew, "ask": bench_ask}
+    targets = list(runners) if options.target == "all" else [options.target]
+
+    results, memory = [], []
+    for target in targets:
+        print(f"\n== {target} ==")
+        print(f"  {'conc.':>5} {'débit/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'erreurs':>7} {'refus':>5} {'LLM/req':>7} {'RSS Mo':>7}")
+        for concurrency in levels:
+            row = runners[target](concurrency, options.requests)
+            results.append(row)
+            print(f"  {concurrency:>5} {row['throughput_rps']:>8.2f} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} "
+                  f"{row['p99_ms']:>8.0f} {row['errors']:>7} {row['rejected']:>5} "
+                  f"{row['llm_calls_per_request']:>7.2f} {row['rss_mb']:>7.1f}")
+        profile = profile_memory(target, runners[target], options.memory_samples)
+        memory.append(profile)
+        print(f"  mémoire : pic {profile['peak_kb']:.0f} Ko, "
+              f"{profile['retained_kb_per_request']:.1f} Ko conservés par requête")
+
+    parameters = {
+        "latency": options.latency,
+        "jitter": options.jitter,
+        "failure_rate": options.failure_rate,
+        "seed": options.seed,
+        "requests": options.requests,
+        "workers": options.workers,
+        "concurrency": levels,
+    }
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": results,
+        "memory": memory,
+    }
+
+    regressions = []
+    previous = load_previous(parameters)
+    if previous is not None:
+        regressions = compare(report, previous, options.tolerance)
+
+    if not options.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        path = RESULTS_DIR / f"{stamp}-{report['git_commit']}.json"
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nRésultats enregistrés dans {path}")
+
+    if regressions:
+        print(f"Régressions : {', '.join(regressions)}")
+    return 1 if regressions and options.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
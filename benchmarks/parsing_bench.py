@@ -0,0 +1,184 @@
+"""
+Micro-benchmark et fuzzing de l'analyse des réponses des agents.
+
+    python -m benchmarks.parsing_bench [--iterations N] [--fuzz N] [--seed N]
+
+1. Corpus : vérifie les résultats attendus (parsing_corpus.json) dans les deux modes.
+2. Fuzzing : mutations aléatoires du corpus (troncatures, casse, marqueurs
+   dupliqués, bruit Unicode, textes de plusieurs centaines de Ko) ; vérifie
+   qu'aucune exception n'est levée et que les invariants sont respectés.
+3. Benchmark : compare l'ancienne extraction en plusieurs passes (regex compilée
+   à chaque appel puis `split` de repli) à ResponseParser, et mesure le coût en
+   fonction de la taille du texte.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+import timeit
+from pathlib import Path
+
+from app.core.parsing import STATUS_REJECTED, STATUS_VALIDATED, ResponseParser
+
+CORPUS_PATH = Path(__file__).with_name("parsing_corpus.json")
+
+_NOISE = ["Final Answer:", "final answer :", "\nThought:", "\nHuman:", "Score:", "score = ", "|", "validé", "rejeté",
+          "**", "\n", "​", "é", "🙂", "8/10", "85%", "0,7", "-", ":", "  "]
+
+
+def legacy_parse(text: str) -> dict:
+    """Reproduction de l'extraction d'origine (sans journalisation) pour comparaison."""
+    # Réponse d'une étape : split sur le premier marqueur
+    if "Final Answer:" in text:
+        answer = text.split("Final Answer:", 1)[1].strip()
+    else:
+        answer = text.strip()
+
+    # Score : nouvelle recherche sur le texte complet
+    match = re.search(r'Score:\s*([0-9]*\.?[0-9]+)', text)
+    score = max(0.0, min(1.0, float(match.group(1)))) if match else None
+
+    # Verdict : regex DOTALL paresseuse puis split de repli
+    stripped = text.strip()
+    match = re.search(r'Final Answer:\s*(.*?)(?=\n\s*(?:Thought:|Human:|Assistant:|$)|$)', stripped,
+                      re.DOTALL | re.IGNORECASE)
+    response = match.group(1).strip() if match else ""
+    if not response:
+        parts = stripped.split("Final Answer:")
+        response = parts[-1].strip() if len(parts) > 1 else stripped
+    status = None
+    if "|" in response:
+        status = response.split("|", 1)[0].strip().lower()
+    return {"answer": answer, "score": score, "status": status}
+
+
+def check_corpus(corpus: list) -> int:
+    failures = 0
+    for mode in ("lenient", "strict"):
+        parser = ResponseParser(mode)
+        for case in corpus:
+            parsed = parser.parse(case["text"], verdict=case.get("verdict", False))
+            for field, expected in case.get(mode, {}).items():
+                actual = getattr(parsed, field)
+                if isinstance(expected, float) and actual is not None:
+                    ok = abs(actual - expected) < 1e-9
+                else:
+                    ok = actual == expected
+                if not ok:
+                    failures += 1
+                    print(f"  ÉCHEC [{mode}] {case['name']}.{field}: attendu {expected!r}, obtenu {actual!r}")
+    print(f"Corpus : {len(corpus)} cas × 2 modes, {failures} échec(s)")
+    return failures
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    operations = rng.randint(1, 4)
+    for _ in range(operations):
+        choice = rng.random()
+        if choice < 0.25 and text:
+            position = rng.randrange(len(text))
+            text = text[:position] if rng.random() < 0.5 else text[position:]
+        elif choice < 0.5:
+            position = rng.randint(0, len(text))
+            text = text[:position] + rng.choice(_NOISE) + text[position:]
+        elif choice < 0.65:
+            text = text.upper() if rng.random() < 0.5 else text.swapcase()
+        elif choice < 0.8:
+            text = "".join(rng.choice(_NOISE) for _ in range(rng.randint(1, 20)))
+        elif choice < 0.95:
+            text = text * rng.randint(2, 50)
+        else:
+            text = text + "x" * rng.randint(10_000, 300_000)
+    return text
+
+
+def fuzz(corpus: list, count: int, seed: int) -> int:
+    rng = random.Random(seed)
+    parsers = [ResponseParser("lenient"), ResponseParser("strict")]
+    failures = 0
+    slowest = (0.0, 0)
+    for _ in range(count):
+        text = mutate(rng.choice(corpus)["text"], rng)
+        for parser in parsers:
+            start = time.perf_counter()
+            try:
+                parsed = parser.parse(text, verdict=True)
+            except Exception as e:
+                failures += 1
+                print(f"  EXCEPTION [{parser.mode}] {type(e).__name__}: {e} pour {text[:80]!r}")
+                continue
+            elapsed = time.perf_counter() - start
+            # Coût par caractère des grands textes (les petits sont dominés par le coût fixe d'un appel)
+            if len(text) >= 10_000 and elapsed / len(text) > slowest[0] / max(slowest[1], 1):
+                slowest = (elapsed, len(text))
+
+            problems = []
+            if parsed.score is not None and not 0.0 <= parsed.score <= 1.0:
+                problems.append(f"score hors bornes {parsed.score}")
+            if parsed.status not in (None, STATUS_VALIDATED, STATUS_REJECTED):
+                problems.append(f"statut inattendu {parsed.status!r}")
+            if parsed.answer is not None and parsed.answer != parsed.answer.strip():
+                problems.append("réponse non normalisée")
+            if parser.strict and parsed.answer == "":
+                problems.append("réponse vide en mode strict")
+            if problems:
+                failures += 1
+                print(f"  ÉCHEC [{parser.mode}] {', '.join(problems)} pour {text[:80]!r}")
+    elapsed, size = slowest
+    print(f"Fuzzing : {count} textes × 2 modes, {failures} échec(s) ; "
+          f"pire coût {elapsed * 1e9 / max(size, 1):.1f} ns/caractère (texte de {size} caractères)")
+    return failures
+
+
+def benchmark(corpus: list, iterations: int) -> None:
+    texts = [case["text"] for case in corpus]
+    parser = ResponseParser("lenient")
+
+    def run_legacy():
+        for text in texts:
+            legacy_parse(text)
+
+    def run_parser():
+        for text in texts:
+            parser.parse(text, verdict=True)
+
+    print(f"Benchmark : {len(texts)} textes du corpus, {iterations} itérations")
+    results = {}
+    for name, func in (("ancienne extraction", run_legacy), ("ResponseParser", run_parser)):
+        best = min(timeit.repeat(func, number=iterations, repeat=5))
+        results[name] = best
+        print(f"  {name:<20} {best / (iterations * len(texts)) * 1e6:8.2f} µs/texte")
+    print(f"  rapport              {results['ancienne extraction'] / results['ResponseParser']:8.2f}×")
+
+    print("Coût selon la taille (raisonnement ReAct suivi de la réponse), ancienne extraction / ResponseParser :")
+    reasoning = "Thought: analyse en cours, la réponse doit être détaillée.\n"
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        text = (reasoning * (size // len(reasoning) + 1))[:size] + "\nFinal Answer: Score: 0.8"
+        number = max(1, 200_000 // size)
+        timings = [
+            min(timeit.repeat(lambda: func(text), number=number, repeat=3)) / number
+            for func in (legacy_parse, lambda text: parser.parse(text, verdict=True))
+        ]
+        print(f"  {size:>9} caractères  " + "  ".join(
+            f"{timing * 1e3:8.3f} ms ({timing / size * 1e9:5.1f} ns/car.)" for timing in timings
+        ))
+
+
+def main() -> int:
+    arguments = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arguments.add_argument("--iterations", type=int, default=2000)
+    arguments.add_argument("--fuzz", type=int, default=5000)
+    arguments.add_argument("--seed", type=int, default=0)
+    options = arguments.parse_args()
+
+    corpus = json.loads(CORPUS_PATH.read_text(encoding="utf-8"))
+    failures = check_corpus(corpus)
+    failures += fuzz(corpus, options.fuzz, options.seed)
+    benchmark(corpus, options.iterations)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Configuration gunicorn du mode production (SERVER_MODE=production dans start.sh)
+import math
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Nombre de workers par défaut au plus : chaque worker a ses propres pools
+# (threads, agents, caches) et charge crewai/langchain en mémoire
+MAX_DEFAULT_WORKERS = 4
+
+
+def available_cpus() -> int:
+    """
+    Processeurs réellement disponibles : quota CPU du conteneur (cgroup v2 ou v1),
+    sinon processeurs attribués au processus. `multiprocessing.cpu_count()`
+    retourne le nombre de cœurs de l'hôte, sans tenir compte du quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()[:2]
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+# Workers uvicorn : un par processeur disponible (quota du conteneur), 4 au plus par défaut
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(available_cpus(), MAX_DEFAULT_WORKERS))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Préchargement de l'application dans le processus maître : l'import coûteux de
+# crewai/langchain n'est payé qu'une fois, puis partagé par les workers (fork)
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+# Une question peut durer plusieurs minutes (4 étapes, tentatives comprises)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = "-"
+errorlog = "-"
@@ -1,2 +1,6 @@
 #!/bin/bash
-uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000} --workers 1 
\ No newline at end of file
+# SERVER_MODE=production : gunicorn avec plusieurs workers uvicorn (voir gunicorn.conf.py)
+if [ "${SERVER_MODE:-development}" = "production" ]; then
+    exec gunicorn app.main:app -c gunicorn.conf.py
+fi
+uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000} --workers ${WEB_CONCURRENCY:-1}
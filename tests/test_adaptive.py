@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.crew import VALIDATION_THRESHOLD, QuestionCrew, is_well_formed_question
+from app.core.parsing import STATUS_REJECTED, STATUS_VALIDATED
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.retry import RetryPolicy
+
+
+@pytest.mark.parametrize("question", [
+    "Quelle est la capitale de la France ?",
+    "Comment fonctionne la photosynthèse chez les plantes ?",
+    "Pourquoi le ciel est-il bleu en journée ?",
+    "  Qu'est-ce qu'un trou noir ?  ",
+])
+def test_well_formed_questions_skip_the_prompt_manager(question):
+    assert is_well_formed_question(question)
+
+
+@pytest.mark.parametrize("question", [
+    "",
+    None,
+    "Paris ?",  # trop courte
+    "Quelle est la capitale de la France",  # sans point d'interrogation
+    "quelle est la capitale de la France ?",  # sans majuscule
+    "C koi la capitale de la France ?",  # abréviations SMS
+    "Tu sais pk le ciel est bleu stp ?",
+    "Anticonstitutionnellement parlant ?",  # moins de trois mots
+    "Quelle " + "très " * 80 + "longue question ?",  # trop longue
+])
+def test_malformed_questions_are_reformulated(question):
+    assert not is_well_formed_question(question)
+
+
+@pytest.fixture
+def question_crew(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield QuestionCrew(
+        executor=executor,
+        pipeline_mode="adaptive",
+        retry_policy=RetryPolicy(max_attempts=1),
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+    executor.shutdown(wait=False)
+
+
+def test_validation_decided_in_code_uses_the_status_constants(question_crew):
+    validated = question_crew._decide_validation("Paris.", VALIDATION_THRESHOLD)
+    assert validated == {"status": STATUS_VALIDATED, "final_answer": "Paris."}
+    rejected = question_crew._decide_validation("Paris.", VALIDATION_THRESHOLD - 0.1)
+    assert rejected["status"] == STATUS_REJECTED
+    assert "Score de qualité insuffisant" in rejected["final_answer"]
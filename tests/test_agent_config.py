@@ -0,0 +1,37 @@
+import pytest
+from pydantic import ValidationError
+
+from app.core.agent_config import DEFAULT_MODEL, STRONG_MODEL, validate_agent_params
+from app.models.schemas import JobRequest, QuestionRequest
+
+
+def test_allowed_overrides_are_accepted():
+    params = {"temperature": 0.2, "max_tokens": 500, "timeout": 30, "max_iterations": 2,
+              "model": DEFAULT_MODEL, "language": "english", "context": "Répondez brièvement."}
+    assert validate_agent_params(params) == params
+    assert validate_agent_params(None) is None
+
+
+@pytest.mark.parametrize("params", [
+    {"model": STRONG_MODEL},  # modèle coûteux imposé à toutes les étapes
+    {"fallback_model": "gpt-4-32k"},
+    {"max_tokens": 100000},
+    {"max_tokens": 0},
+    {"timeout": 3600},
+    {"temperature": 5},
+    {"temperature": "chaud"},
+    {"max_iterations": True},
+    {"context": "x" * 5000},
+    {"api_key": "sk-..."},  # clé hors liste
+])
+def test_disallowed_overrides_are_rejected(params):
+    with pytest.raises(ValueError):
+        validate_agent_params(params)
+
+
+def test_requests_validate_agent_params():
+    with pytest.raises(ValidationError):
+        QuestionRequest(question="Question ?", agent_params={"model": STRONG_MODEL})
+    with pytest.raises(ValidationError):
+        JobRequest(question="Question ?", agent_params={"max_tokens": 100000})
+    assert QuestionRequest(question="Question ?", agent_params={"temperature": 0.5}).agent_params == {"temperature": 0.5}
@@ -0,0 +1,19 @@
+from app.core.agent_pool import AgentPool
+
+
+def test_pooled_agents_have_no_conversation_memory(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    pool = AgentPool(max_idle=2)
+    agent_set = pool.acquire()
+    assert not agent_set.has_memory
+    pool.release(agent_set)
+    assert pool.acquire() is agent_set
+
+
+def test_agent_set_with_memory_is_not_pooled(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    pool = AgentPool(max_idle=2)
+    agent_set = pool.acquire()
+    agent_set.ai_analyst.memory = True
+    pool.release(agent_set)
+    assert pool.acquire() is not agent_set
@@ -0,0 +1,70 @@
+import asyncio
+import itertools
+import sqlite3
+import threading
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import ResponseCache, SQLiteCache, response_cache_key
+from app.models.schemas import QuestionResponse
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Horloge strictement croissante : chaque accès a sa propre date
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(cache_module.time, "time", lambda: float(next(ticks)))
+
+
+def test_key_depends_on_pipeline_mode():
+    question = "Qu'est-ce que Grasse ?"
+    assert response_cache_key(question) == response_cache_key("qu'est-ce que grasse", None, "full")
+    assert response_cache_key(question, None, "full") != response_cache_key(question, None, "adaptive")
+
+
+def _accessed_at(path: str, key: str) -> float:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT accessed_at FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_do_not_write_until_the_batch_is_full(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path, touch_batch=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    written = _accessed_at(path, "a")
+
+    assert cache.get("a") == "1"
+    assert _accessed_at(path, "a") == written
+    assert cache.get("b") == "2"
+    assert _accessed_at(path, "a") > written
+
+
+def test_pending_hits_are_written_before_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    # "b" est la moins récemment utilisée : elle est évincée, pas "a"
+    cache.set("c", "3")
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+
+
+def test_sqlite_backend_is_used_off_the_event_loop(tmp_path, monkeypatch):
+    response_cache = ResponseCache(SQLiteCache(str(tmp_path / "cache.sqlite3")))
+    threads = []
+    get = response_cache.backend.get
+    monkeypatch.setattr(response_cache.backend, "get", lambda key: threads.append(threading.get_ident()) or get(key))
+    response = QuestionResponse(
+        original_question="q", refined_question="q", initial_answer="r",
+        quality_score=0.9, status="validé", final_answer="r",
+    )
+
+    async def scenario():
+        await response_cache.aset("clé", response)
+        return await response_cache.aget("clé")
+
+    assert asyncio.run(scenario()) == response
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,83 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.core.jobs import CallbackUrlError, check_callback_url, post_json
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://0.0.0.0/hook",
+    "http://224.0.0.1/hook",
+])
+def test_internal_addresses_are_refused(url):
+    with pytest.raises(CallbackUrlError):
+        check_callback_url(url)
+
+
+@pytest.mark.parametrize("url", ["ftp://93.184.216.34/hook", "file:///etc/passwd", "http:///hook"])
+def test_non_http_urls_are_refused(url):
+    with pytest.raises(CallbackUrlError):
+        check_callback_url(url)
+
+
+def test_public_address_is_accepted():
+    check_callback_url("https://93.184.216.34/hook")
+
+
+def test_allowlist():
+    allowed = {"hooks.interne"}
+    # Un hôte de la liste est accepté, même sur le réseau interne
+    check_callback_url("http://hooks.interne:8080/job", allowed)
+    with pytest.raises(CallbackUrlError):
+        check_callback_url("https://93.184.216.34/hook", allowed)
+
+
+class Hook(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        Hook.received.append((self.headers["Host"], self.path, json.loads(body)))
+        self.send_response(302 if self.path.startswith("/redirect") else 200)
+        self.send_header("Location", "http://169.254.169.254/")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def hook_server():
+    server = HTTPServer(("127.0.0.1", 0), Hook)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    Hook.received = []
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def test_post_connects_to_the_checked_address(hook_server):
+    # L'hôte n'est pas résolu à nouveau : la connexion va à l'adresse vérifiée
+    status = post_json(f"http://hooks.invalid:{hook_server}/job?id=1", {"job_id": "1"}, "127.0.0.1", 5)
+    assert status == 200
+    assert Hook.received == [(f"hooks.invalid:{hook_server}", "/job?id=1", {"job_id": "1"})]
+
+
+def test_redirect_is_not_followed(hook_server):
+    assert post_json(f"http://hooks.invalid:{hook_server}/redirect", {}, "127.0.0.1", 5) == 302
+    assert len(Hook.received) == 1
+
+
+def test_checked_address_is_returned():
+    assert check_callback_url("https://93.184.216.34/hook") == "93.184.216.34"
+    assert check_callback_url("http://hooks.interne/job", {"hooks.interne"}) is None
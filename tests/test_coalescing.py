@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from app.core.coalescing import SingleFlight
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.service import QuestionService
+from app.models.schemas import QuestionRequest, QuestionResponse
+
+
+class Work:
+    """Traitement contrôlé par le test : compte ses lancements et son annulation."""
+
+    def __init__(self):
+        self.started = 0
+        self.cancelled = False
+        self.release = None
+
+    async def __call__(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+            return "réponse"
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_concurrent_calls_share_one_run():
+    async def scenario():
+        flight, work = SingleFlight(), Work()
+        work.release = asyncio.Event()
+        callers = [asyncio.create_task(flight.do("q", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.in_flight == 1
+        work.release.set()
+        assert await asyncio.gather(*callers) == ["réponse"] * 3
+        assert work.started == 1
+        assert flight.coalesced == 2
+        assert "q" not in flight
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_the_owner():
+    async def scenario():
+        flight, work = SingleFlight(), Work()
+        work.release = asyncio.Event()
+        owner = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not work.cancelled
+
+        work.release.set()
+        assert await owner == "réponse"
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_owner_does_not_cancel_the_waiter():
+    async def scenario():
+        flight, work = SingleFlight(), Work()
+        work.release = asyncio.Event()
+        owner = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", work))
+        await asyncio.sleep(0)
+
+        # L'appelant qui a lancé le traitement part : le traitement continue pour l'autre
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        assert not work.cancelled
+
+        work.release.set()
+        assert await waiter == "réponse"
+        assert work.started == 1
+
+    asyncio.run(scenario())
+
+
+def test_run_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        flight, work = SingleFlight(), Work()
+        work.release = asyncio.Event()
+        callers = [asyncio.create_task(flight.do("q", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert work.cancelled
+        assert "q" not in flight
+
+    asyncio.run(scenario())
+
+
+def test_exception_is_shared_and_key_released():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise RuntimeError("échec")
+
+        results = await asyncio.gather(flight.do("q", failing), flight.do("q", failing), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert "q" not in flight
+
+    asyncio.run(scenario())
+
+
+class EmptyCache:
+    async def aget(self, key):
+        return None
+
+
+def _service(release: asyncio.Event, runs: list) -> QuestionService:
+    service = QuestionService(
+        executor=None, agent_pool=None, response_cache=EmptyCache(),
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+
+    async def process(request, cache_key, wait, client, trace):
+        runs.append((wait, request.refresh_cache))
+        await release.wait()
+        return QuestionResponse(
+            original_question=request.question, refined_question=request.question, initial_answer="réponse",
+            quality_score=1.0, final_answer="réponse", status="validé",
+        )
+
+    service._process = process
+    return service
+
+
+def test_requests_with_different_options_are_not_coalesced():
+    async def scenario():
+        release, runs = asyncio.Event(), []
+        service = _service(release, runs)
+        question = "Quelle est la capitale de la France ?"
+        callers = [
+            asyncio.create_task(service.answer(QuestionRequest(question=question))),
+            asyncio.create_task(service.answer(QuestionRequest(question=question))),
+            # Une requête qui attend une place ne rejoint pas une requête /ask qui peut être refusée
+            asyncio.create_task(service.answer(QuestionRequest(question=question), wait=True)),
+            # Un rafraîchissement ne reçoit pas une réponse construite depuis le cache
+            asyncio.create_task(service.answer(QuestionRequest(question=question, refresh_cache=True))),
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*callers)
+        assert sorted(runs) == [(False, False), (False, True), (True, False)]
+        assert service.single_flight.coalesced == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core import crew as crew_module
+from app.core.crew import QuestionCrew
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.retry import RetryPolicy
+from app.core.tracing import SPAN_FALLBACK
+
+ANSWER = "Final Answer: Quelle est la capitale de la France ?"
+
+
+@pytest.fixture
+def question_crew(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setattr(crew_module, "PROCESS_TIMEOUT", 0.2)
+    executor = ThreadPoolExecutor(max_workers=1)
+    question_crew = QuestionCrew(
+        executor=executor,
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+    yield question_crew
+    executor.shutdown(wait=False)
+
+
+def test_retry_after_timeout_uses_a_new_agent(question_crew, monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def kickoff(crew, crew_name):
+        calls.append(crew)
+        if len(calls) == 1:
+            # Premier appel bloqué au-delà du délai : il continue dans son thread
+            release.wait(5)
+        return ANSWER
+
+    monkeypatch.setattr(question_crew, "_kickoff", kickoff)
+    # Le thread bloqué occupe le seul thread de l'exécuteur CrewAI : la tentative
+    # suivante dispose de son propre thread
+    question_crew.executor = ThreadPoolExecutor(max_workers=2)
+    task = question_crew._build_refine_task("c koi la capital de la france")
+
+    response = asyncio.run(question_crew._aexecute_task(task, "Prompt Manager"))
+    release.set()
+
+    assert response == "Quelle est la capitale de la France ?"
+    assert len(calls) == 2
+    assert calls[1] is not calls[0]
+    assert calls[1].agents[0] is not calls[0].agents[0]
+    assert calls[1].agents[0].role == "Prompt Manager"
+    assert not question_crew.agents.reusable
+
+
+def test_timeout_starts_when_the_call_runs(question_crew, monkeypatch):
+    calls = []
+
+    def kickoff(crew, crew_name):
+        calls.append(crew)
+        time.sleep(0.1)
+        return ANSWER
+
+    monkeypatch.setattr(question_crew, "_kickoff", kickoff)
+    # Le seul thread est occupé plus longtemps que PROCESS_TIMEOUT : l'attente
+    # d'un thread libre ne compte pas dans le délai de la tentative
+    question_crew.executor.submit(time.sleep, 0.3)
+    task = question_crew._build_refine_task("c koi la capital de la france")
+
+    response = asyncio.run(question_crew._aexecute_task(task, "Prompt Manager"))
+
+    assert response == "Quelle est la capitale de la France ?"
+    assert len(calls) == 1
+    assert question_crew.agents.reusable
+
+
+def test_stage_ending_on_fallback_has_fallback_status(question_crew, monkeypatch):
+    def kickoff(crew, crew_name):
+        raise ValueError("réponse invalide")
+
+    monkeypatch.setattr(question_crew, "_kickoff", kickoff)
+    task = question_crew._build_refine_task("c koi la capital de la france")
+
+    response = asyncio.run(question_crew._aexecute_task(task, "Prompt Manager"))
+
+    assert response == crew_module.ERROR_RESPONSES["Prompt Manager"]
+    stage_span = next(span for span in question_crew.trace.spans if span.name == "Prompt Manager")
+    assert stage_span.status == SPAN_FALLBACK
+    assert stage_span.attributes["fallback"] is True
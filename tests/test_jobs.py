@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+import time
+
+from app.core.jobs import JOB_COMPLETED, JOB_PENDING, JOB_RUNNING, JobQueue, JobStore
+from app.models.schemas import QuestionRequest
+
+
+def _request() -> QuestionRequest:
+    return QuestionRequest(question="Quelle est la capitale de la France ?")
+
+
+def test_each_store_is_a_distinct_instance(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    assert JobStore(path).instance != JobStore(path).instance
+
+
+def test_expired_lease_is_claimed_by_another_instance(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path, lease=0.05), JobStore(path, lease=60)
+    job_id = first.create(_request())
+    assert first.claim_next()["job_id"] == job_id
+    # Bail en cours : le job n'est pas repris
+    assert second.claim_next() is None
+
+    time.sleep(0.1)
+    assert second.claim_next()["job_id"] == job_id
+    # L'instance qui a perdu le bail ne peut plus ni le prolonger ni le terminer
+    assert not first.renew(job_id)
+    assert not first.complete(job_id, {"final_answer": "Paris"})
+    assert second.complete(job_id, {"final_answer": "Paris"})
+    assert second.get(job_id)["status"] == JOB_COMPLETED
+
+
+def test_renewed_lease_is_kept(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path, lease=0.2), JobStore(path, lease=60)
+    job_id = first.create(_request())
+    first.claim_next()
+    for _ in range(3):
+        time.sleep(0.1)
+        assert first.renew(job_id)
+        assert second.claim_next() is None
+    assert first.get(job_id)["status"] == JOB_RUNNING
+
+
+def test_released_job_is_pending_again(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create(_request())
+    store.claim_next()
+    store.release(job_id)
+    assert store.get(job_id)["status"] == JOB_PENDING
+    assert store.requeue_expired() == 0
+
+
+def test_queue_counts_are_refreshed_off_the_event_loop(tmp_path):
+    async def scenario():
+        queue = JobQueue(service=None, store=JobStore(str(tmp_path / "jobs.sqlite3")), workers=0, poll_interval=0.01)
+        queue.start()
+        await queue.submit(_request())
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        return queue.counts
+
+    assert asyncio.run(scenario()) == {JOB_PENDING: 1}
+
+
+def test_worker_survives_database_errors(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    calls = []
+
+    def claim_next():
+        calls.append(None)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return None
+
+    monkeypatch.setattr(store, "claim_next", claim_next)
+
+    async def scenario():
+        queue = JobQueue(service=None, store=store, workers=1, poll_interval=0.01)
+        queue.start()
+        await asyncio.sleep(0.2)
+        alive = not queue._tasks[0].done()
+        await queue.stop()
+        return alive
+
+    assert asyncio.run(scenario())
+    assert len(calls) > 2
@@ -0,0 +1,28 @@
+from app.core.logging_config import debug_sampler
+
+
+class Level:
+    def __init__(self, no: int):
+        self.no = no
+
+
+def _record(trace_id: str, level: int = 10) -> dict:
+    return {"level": Level(level), "extra": {"trace_id": trace_id}}
+
+
+def test_debug_lines_of_a_request_are_all_kept_or_all_dropped():
+    sample = debug_sampler(0.3)
+    kept = 0
+    for index in range(1000):
+        decisions = {sample(_record(f"trace-{index}")) for _ in range(20)}
+        assert len(decisions) == 1
+        kept += decisions.pop()
+    # Environ 30 % des requêtes sont échantillonnées
+    assert 200 < kept < 400
+
+
+def test_higher_levels_are_never_sampled():
+    sample = debug_sampler(0.0)
+    assert not sample(_record("trace-1"))
+    assert sample(_record("trace-1", level=20))
+    assert debug_sampler(1.0)(_record("trace-1"))
@@ -0,0 +1,71 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core.parsing import STATUS_REJECTED, STATUS_VALIDATED, ResponseParser, result_text
+
+CORPUS = json.loads(
+    (Path(__file__).resolve().parent.parent / "benchmarks" / "parsing_corpus.json").read_text(encoding="utf-8")
+)
+
+
+@pytest.mark.parametrize("mode", ["lenient", "strict"])
+@pytest.mark.parametrize("case", CORPUS, ids=[case["name"] for case in CORPUS])
+def test_corpus(case, mode):
+    parsed = ResponseParser(mode).parse(case["text"], verdict=case.get("verdict", False))
+    for field, expected in case.get(mode, {}).items():
+        actual = getattr(parsed, field)
+        if isinstance(expected, float) and actual is not None:
+            assert actual == pytest.approx(expected), field
+        else:
+            assert actual == expected, field
+
+
+def test_last_marker_wins_and_react_block_is_cut():
+    text = ("Thought: je recopie l'exemple\nFinal Answer: [réponse]\n"
+            "Thought: je réponds\nFinal Answer: Grasse est la capitale du parfum.\nObservation: fin")
+    for mode in ("lenient", "strict"):
+        assert ResponseParser(mode).parse(text).answer == "Grasse est la capitale du parfum."
+
+
+def test_strict_rejects_what_lenient_recovers():
+    text = "**Final answer :** Score = 8/10"
+    assert ResponseParser("strict").parse(text).score is None
+    lenient = ResponseParser("lenient").parse(text)
+    assert lenient.has_marker
+    assert lenient.score == pytest.approx(0.8)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Score: 0.95", 0.95),
+    ("score : 85%", 0.85),
+    ("Score: 1.5", 1.0),
+])
+def test_lenient_score_scales_and_bounds(text, expected):
+    assert ResponseParser("lenient").extract_score(text) == pytest.approx(expected)
+
+
+def test_strict_score_out_of_range_is_missing():
+    assert ResponseParser("strict").extract_score("Score: 1.5") is None
+
+
+def test_verdict():
+    parsed = ResponseParser("strict").parse("Final Answer: validé|Réponse exacte.", verdict=True)
+    assert (parsed.status, parsed.detail) == (STATUS_VALIDATED, "Réponse exacte.")
+    parsed = ResponseParser("lenient").parse("Final Answer: **Rejetée** - hors sujet", verdict=True)
+    assert (parsed.status, parsed.detail) == (STATUS_REJECTED, "hors sujet")
+
+
+def test_result_text():
+    class Output:
+        raw = "texte"
+
+    assert result_text(None) == ""
+    assert result_text(["premier", "second"]) == "premier"
+    assert result_text(Output()) == "texte"
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        ResponseParser("tolerant")
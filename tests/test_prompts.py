@@ -0,0 +1,59 @@
+import threading
+
+from app.core import prompts as prompts_module
+from app.core.prompts import TRUNCATION_MARK, PromptRegistry, TokenCounter
+
+ANSWER = "mot " * 800  # Environ 800 tokens estimés
+
+
+class FakeEncoding:
+    """Un token par caractère."""
+
+    def encode(self, text, disallowed_special=()):
+        return list(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def test_count_never_loads_the_encoding(monkeypatch):
+    release = threading.Event()
+
+    def slow_encoding(model):
+        release.wait(5)
+        return FakeEncoding()
+
+    monkeypatch.setattr(prompts_module, "_encoding", slow_encoding)
+    counter = TokenCounter()
+    # Chargement en cours dans un thread : le décompte utilise l'estimation sans attendre
+    assert counter.count("abcdefgh") == 2
+    release.set()
+    assert isinstance(counter.load(), FakeEncoding)
+    assert counter.count("abcdefgh") == 8
+
+
+def test_configured_budget_truncates_below_the_analyst_max_tokens():
+    registry = PromptRegistry(answer_max_tokens=600, counter=TokenCounter(use_tiktoken=False))
+    prompt = registry.render("Quality Controller", answer_tokens=1000, answer=ANSWER)
+    assert prompt.count("mot") < 800
+    assert TRUNCATION_MARK in prompt
+
+
+def test_default_budget_is_the_analyst_max_tokens():
+    registry = PromptRegistry(counter=TokenCounter(use_tiktoken=False))
+    assert TRUNCATION_MARK not in registry.render("Quality Controller", answer_tokens=1000, answer=ANSWER)
+    assert TRUNCATION_MARK in registry.render("Quality Controller", answer_tokens=500, answer=ANSWER)
+    assert TRUNCATION_MARK in registry.render("General Manager", answer_tokens=500, answer=ANSWER, question="q",
+                                              refined_question="q", score=0.9, threshold=0.7)
+
+
+def test_zero_disables_truncation():
+    registry = PromptRegistry(answer_max_tokens=0, counter=TokenCounter(use_tiktoken=False))
+    assert TRUNCATION_MARK not in registry.render("Quality Controller", answer_tokens=100, answer=ANSWER)
+
+
+def test_env_budget(monkeypatch):
+    monkeypatch.delenv("PROMPT_ANSWER_MAX_TOKENS", raising=False)
+    assert PromptRegistry.from_env().answer_max_tokens is None
+    monkeypatch.setenv("PROMPT_ANSWER_MAX_TOKENS", "600")
+    assert PromptRegistry.from_env().answer_max_tokens == 600
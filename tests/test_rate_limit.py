@@ -0,0 +1,184 @@
+import asyncio
+import math
+
+import pytest
+
+from app.core import rate_limit
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.rate_limit import RateLimiter, TokenBucket
+from app.core.service import QuestionService
+from app.models.schemas import QuestionRequest, QuestionResponse
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    bucket = TokenBucket(rate=2, burst=4)
+    for _ in range(4):
+        assert bucket.consume() == (True, 0.0)
+    allowed, wait = bucket.consume()
+    assert not allowed
+    assert wait == pytest.approx(0.5)
+
+    clock.now += 1
+    assert bucket.consume(2) == (True, 0.0)
+    assert not bucket.consume()[0]
+
+    # Le seau ne dépasse jamais sa taille, même après une longue inactivité
+    clock.now += 3600
+    assert bucket.consume(4) == (True, 0.0)
+    assert not bucket.consume()[0]
+
+
+def test_bucket_cost_above_burst_is_never_allowed(clock):
+    bucket = TokenBucket(rate=1, burst=3)
+    allowed, wait = bucket.consume(5)
+    assert not allowed
+    assert math.isinf(wait)
+    # Le refus ne consomme aucun jeton
+    assert bucket.tokens == 3
+
+
+def test_rejected_decision_has_retry_after(clock):
+    limiter = RateLimiter(per_minute=60, burst=1)
+    assert limiter.check("ip:a").allowed
+    decision = limiter.check("ip:a")
+    assert not decision.allowed
+    assert decision.headers()["Retry-After"] == "1"
+    assert limiter.rejected == 1
+
+
+def _service() -> QuestionService:
+    return QuestionService(
+        executor=None, agent_pool=None, response_cache=None,
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+
+
+def _response(question: str) -> QuestionResponse:
+    return QuestionResponse(
+        original_question=question, refined_question=question, initial_answer="réponse",
+        quality_score=1.0, final_answer="réponse", status="validé",
+    )
+
+
+def test_batch_larger_than_burst_is_spread_over_rate():
+    limiter = RateLimiter(per_minute=3000, burst=3)
+    items = [QuestionRequest(question=f"Question {index} ?") for index in range(5)]
+
+    # Réception du lot : seules les premières questions (la rafale) sont décomptées
+    prepaid = int(min(len(items), limiter.burst_for("ip:a")))
+    assert limiter.check("ip:a", prepaid).allowed
+
+    service = _service()
+    answered = []
+
+    async def answer(request, wait=False, client="", trace_id=None):
+        answered.append(request.question)
+        return _response(request.question), False
+
+    service.answer = answer
+    results = asyncio.run(service.answer_batch(
+        items, concurrency=2, client="ip:a", admit=limiter.admission("ip:a", prepaid)
+    ))
+
+    assert [result.error for result in results] == [None] * 5
+    assert len(answered) == 5
+    # Les deux questions au-delà de la rafale ont attendu leur jeton
+    assert limiter._bucket("ip:a").tokens < 1
+
+
+def test_batch_admission_disabled_limiter_does_not_wait():
+    limiter = RateLimiter(per_minute=0, burst=1, enabled=False)
+    admit = limiter.admission("ip:a", prepaid=0)
+
+    async def admit_all():
+        for _ in range(10):
+            await asyncio.wait_for(admit(), timeout=1)
+
+    asyncio.run(admit_all())
+
+
+def test_only_declared_api_keys_identify_a_client():
+    limiter = RateLimiter(api_keys={rate_limit.api_key_client("secret")})
+    assert limiter.client_id({"x-api-key": "secret"}, "10.0.0.1") == rate_limit.api_key_client("secret")
+    # Une clé inconnue ne crée pas de nouveau client : l'adresse IP est utilisée
+    assert limiter.client_id({"x-api-key": "random-1"}, "10.0.0.1") == "ip:10.0.0.1"
+    assert limiter.client_id({"x-api-key": "random-2"}, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_api_keys_from_env(monkeypatch):
+    monkeypatch.setenv("API_KEYS", "alpha, beta,")
+    limiter = RateLimiter.from_env()
+    assert limiter.api_keys == {rate_limit.api_key_client("alpha"), rate_limit.api_key_client("beta")}
+
+
+def test_forwarded_address_is_counted_from_the_right():
+    limiter = RateLimiter(trust_forwarded=True)
+    # Le client écrit l'entrée de gauche, le proxy ajoute l'adresse réelle à droite
+    assert limiter.client_id({"x-forwarded-for": "1.2.3.4, 203.0.113.7"}, "10.0.0.1") == "ip:203.0.113.7"
+    assert limiter.client_id({"x-forwarded-for": "5.6.7.8, 203.0.113.7"}, "10.0.0.1") == "ip:203.0.113.7"
+
+    two_hops = RateLimiter(trust_forwarded=True, trusted_proxies=2)
+    assert two_hops.client_id({"x-forwarded-for": "1.2.3.4, 203.0.113.7, 10.0.0.2"}, "10.0.0.1") == "ip:203.0.113.7"
+    # Chaîne trop courte : elle n'a pas traversé nos proxys, l'adresse de connexion est utilisée
+    assert two_hops.client_id({"x-forwarded-for": "1.2.3.4"}, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_forwarded_header_ignored_unless_trusted():
+    limiter = RateLimiter()
+    assert limiter.client_id({"x-forwarded-for": "1.2.3.4"}, "10.0.0.1") == "ip:10.0.0.1"
+
+
+def test_trusted_proxies_from_env(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_TRUST_FORWARDED", "true")
+    monkeypatch.setenv("RATE_LIMIT_TRUSTED_PROXIES", "2")
+    limiter = RateLimiter.from_env()
+    assert limiter.trust_forwarded and limiter.trusted_proxies == 2
+
+
+def test_batch_admission_charges_the_cost_of_each_question(clock):
+    limiter = RateLimiter(per_minute=60, burst=10)
+    assert limiter.check("ip:a", 4).allowed
+    admit = limiter.admission("ip:a", prepaid=4)
+
+    async def admit_all():
+        # Question spéculative à trois candidates puis question simple : les jetons
+        # prépayés couvrent la première, la seconde en prend un dans le seau
+        await asyncio.wait_for(admit(3), timeout=1)
+        await asyncio.wait_for(admit(1), timeout=1)
+        await asyncio.wait_for(admit(1), timeout=1)
+
+    asyncio.run(admit_all())
+    assert limiter._bucket("ip:a").tokens == pytest.approx(5)
+
+
+def test_speculative_requests_cost_one_question_per_candidate():
+    service = _service()
+    service.speculative_candidates = 3
+    assert service.request_cost(QuestionRequest(question="Question ?")) == 1
+    assert service.request_cost(QuestionRequest(question="Question ?", pipeline_mode="speculative")) == 3
+    service.pipeline_mode = "speculative"
+    assert service.request_cost(QuestionRequest(question="Question ?")) == 3
+
+
+def test_speculative_mode_per_request_requires_configuration():
+    service = _service()
+    speculative = QuestionRequest(question="Question ?", pipeline_mode="speculative")
+    assert service.pipeline_mode_allowed(QuestionRequest(question="Question ?", pipeline_mode="adaptive"))
+    assert not service.pipeline_mode_allowed(speculative)
+    service.speculative_requests = True
+    assert service.pipeline_mode_allowed(speculative)
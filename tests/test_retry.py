@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import openai
+import pytest
+
+from app.core import retry as retry_module
+from app.core.retry import Deadline, RetryPolicy, is_retryable, retry_after
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _status_error(status: int, headers=None) -> openai.APIStatusError:
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    return openai.APIStatusError("erreur", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.mark.parametrize("error", [
+    asyncio.TimeoutError(),
+    TimeoutError(),
+    ConnectionResetError(),
+    openai.APIConnectionError(request=REQUEST),
+    _status_error(429),
+    _status_error(408),
+    _status_error(500),
+    _status_error(503),
+])
+def test_retryable_errors(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    _status_error(400),
+    _status_error(401),
+    _status_error(404),
+    ValueError("réponse invalide"),
+    RuntimeError("erreur interne"),
+])
+def test_non_retryable_errors(error):
+    assert not is_retryable(error)
+
+
+def test_wrapped_error_is_retryable():
+    # Erreur du fournisseur enveloppée par CrewAI / LangChain
+    try:
+        try:
+            raise _status_error(502)
+        except openai.APIStatusError as cause:
+            raise RuntimeError("échec de l'agent") from cause
+    except RuntimeError as error:
+        assert is_retryable(error)
+
+
+def test_retry_after_seconds():
+    assert retry_after(_status_error(429, {"retry-after": "7"})) == 7.0
+    assert retry_after(_status_error(429, {"retry-after": "-3"})) == 0.0
+
+
+def test_retry_after_milliseconds_takes_precedence():
+    error = _status_error(429, {"retry-after-ms": "1500", "retry-after": "7"})
+    assert retry_after(error) == 1.5
+
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = retry_after(_status_error(503, {"retry-after": format_datetime(when, usegmt=True)}))
+    assert 28 <= delay <= 30
+    past = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert retry_after(_status_error(503, {"retry-after": format_datetime(past, usegmt=True)})) == 0.0
+
+
+def test_retry_after_absent_or_invalid():
+    assert retry_after(_status_error(429)) is None
+    assert retry_after(_status_error(429, {"retry-after": "soon"})) is None
+    assert retry_after(ValueError("sans réponse")) is None
+
+
+def test_backoff_jitter_stays_within_bounds():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+    for attempt, ceiling in ((1, 1.0), (2, 2.0), (3, 4.0), (4, 5.0), (10, 5.0)):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+        # La gigue étale les tentatives
+        assert len(set(delays)) > 1
+
+
+def test_backoff_uses_the_provider_delay():
+    assert RetryPolicy(max_delay=5.0).backoff(1, delay_hint=12.0) == 12.0
+
+
+def test_deadline_remaining(clock):
+    deadline = Deadline(10)
+    assert deadline.remaining() == 10
+    clock.now += 4
+    assert deadline.remaining() == pytest.approx(6)
+    assert not deadline.expired
+    clock.now += 7
+    assert deadline.remaining() == 0.0
+    assert deadline.expired
+
+
+def test_deadline_without_budget_never_expires(clock):
+    deadline = Deadline(None)
+    clock.now += 10 ** 6
+    assert deadline.remaining() == float("inf")
+    assert not deadline.expired
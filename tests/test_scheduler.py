@@ -0,0 +1,67 @@
+import asyncio
+
+from app.core.scheduler import FairScheduler
+
+
+async def _serve_order(scheduler: FairScheduler, requests):
+    """Ordre dans lequel les demandes en attente obtiennent l'unique place."""
+    order = []
+
+    async def request(client):
+        await scheduler.acquire(client)
+        order.append(client)
+
+    assert scheduler.try_acquire("holder")
+    tasks = [asyncio.create_task(request(client)) for client in requests]
+    await asyncio.sleep(0)
+    holder = "holder"
+    while len(order) < len(requests):
+        scheduler.release(holder)
+        await asyncio.sleep(0)
+        holder = order[-1]
+    await asyncio.gather(*tasks)
+    return "".join(order)
+
+
+def test_equal_weights_alternate_between_clients():
+    scheduler = FairScheduler(capacity=1)
+    # Le client "a" soumet toutes ses questions avant "b"
+    order = asyncio.run(_serve_order(scheduler, "aaaabbbb"))
+    assert order == "abababab"
+
+
+def test_weights_share_slots_proportionally():
+    scheduler = FairScheduler(capacity=1, weights={"b": 2})
+    order = asyncio.run(_serve_order(scheduler, "aaaaaabbbbbb"))
+    # "b" est servi deux fois plus souvent tant que les deux clients attendent
+    assert order[:9].count("b") == 6
+    assert order[:9].count("a") == 3
+    assert sorted(order) == sorted("aaaaaabbbbbb")
+
+
+def test_client_limit_leaves_slots_to_others():
+    scheduler = FairScheduler(capacity=4, weights={"b": 2}, client_max_in_flight=1)
+    assert scheduler.try_acquire("a")
+    assert not scheduler.try_acquire("a")
+    assert scheduler.limit("b") == 2
+    assert scheduler.try_acquire("b")
+    assert scheduler.try_acquire("b")
+    assert not scheduler.try_acquire("b")
+    assert scheduler.try_acquire("c")
+
+
+def test_cancelled_waiter_gives_up_its_turn():
+    async def scenario():
+        scheduler = FairScheduler(capacity=1)
+        assert scheduler.try_acquire("holder")
+        cancelled = asyncio.create_task(scheduler.acquire("a"))
+        waiting = asyncio.create_task(scheduler.acquire("b"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 1
+        scheduler.release("holder")
+        await asyncio.wait_for(waiting, timeout=1)
+        assert scheduler.stats()["in_use"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core.semantic_cache import (
+    SIMILARITY_THRESHOLD,
+    HashingVectorizer,
+    SemanticCache,
+    question_markers,
+    question_signature,
+    same_question,
+)
+from app.models.schemas import QuestionResponse
+
+# Paires de questions étiquetées (paraphrase ou non) : calibrage du seuil et des contrôles
+PAIRS = json.loads((Path(__file__).with_name("semantic_pairs.json")).read_text(encoding="utf-8"))
+PARAPHRASES = [pair for pair in PAIRS if pair["paraphrase"]]
+DISTINCT = [pair for pair in PAIRS if not pair["paraphrase"]]
+
+
+def _pair_id(pair) -> str:
+    return f"{pair['first']} / {pair['second']}"
+
+
+def _response(question: str) -> QuestionResponse:
+    return QuestionResponse(
+        original_question=question, refined_question=question, initial_answer="réponse",
+        quality_score=0.9, status="validé", final_answer="réponse",
+    )
+
+
+@pytest.mark.parametrize("pair", PAIRS, ids=_pair_id)
+def test_labelled_pairs(pair):
+    for indexed, asked in ((pair["first"], pair["second"]), (pair["second"], pair["first"])):
+        cache = SemanticCache()
+        cache.set(_response(indexed), "config")
+        assert (cache.get(asked, "config") is not None) == pair["paraphrase"]
+
+
+def test_threshold_separates_labelled_pairs():
+    vectorizer = HashingVectorizer()
+
+    def similarity(pair) -> float:
+        return float(vectorizer.transform(pair["first"]) @ vectorizer.transform(pair["second"]))
+
+    # Toutes les paraphrases passent le seuil ; les questions distinctes que les
+    # contrôles de same_question laissent passer restent en dessous
+    assert min(similarity(pair) for pair in PARAPHRASES) >= SIMILARITY_THRESHOLD
+    unguarded = [
+        similarity(pair) for pair in DISTINCT
+        if same_question(question_signature(pair["first"]), question_signature(pair["second"]))
+    ]
+    assert all(score < SIMILARITY_THRESHOLD for score in unguarded)
+
+
+def test_negation_is_a_marker():
+    assert question_markers("Pourquoi le ciel n'est-il pas bleu ?") == ["negation", "pourquoi"]
+    assert question_markers("Pourquoi le ciel est-il bleu ?") == ["pourquoi"]
+
+
+def test_other_agent_config_is_not_served():
+    cache = SemanticCache()
+    cache.set(_response("Qu'est-ce que Grasse ?"), "config")
+    assert cache.get("c koi Grasse?", "autre") is None
+
+
+def test_saves_from_several_workers_are_merged(tmp_path):
+    path = str(tmp_path / "semantic.npz")
+    first, second = SemanticCache(path=path), SemanticCache(path=path)
+    first.set(_response("Qu'est-ce que Grasse ?"), "config")
+    second.set(_response("Quelle est la capitale du Canada ?"), "config")
+    first.save()
+    second.save()
+
+    reloaded = SemanticCache(path=path)
+    assert len(reloaded) == 2
+    assert reloaded.get("c koi Grasse?", "config") is not None
+    assert reloaded.get("Quelle est la capitale du Canada, svp ?", "config") is not None
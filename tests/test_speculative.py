@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.crew import ERROR_RESPONSES, QuestionCrew
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.retry import RetryPolicy
+
+
+@pytest.fixture
+def question_crew(monkeypatch):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield QuestionCrew(
+        executor=executor,
+        pipeline_mode="speculative",
+        retry_policy=RetryPolicy(max_attempts=1),
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+    executor.shutdown(wait=False)
+
+
+def test_best_scored_candidate_is_selected(question_crew):
+    candidates = [("réponse A", 0.6), ("réponse B", 0.9), ("réponse C", 0.8)]
+    assert question_crew._select_candidate(candidates) == ("réponse B", 0.9)
+
+
+def test_tie_goes_to_the_first_candidate(question_crew):
+    candidates = [("réponse A", 0.5), ("réponse B", 0.8), ("réponse C", 0.8)]
+    assert question_crew._select_candidate(candidates) == ("réponse B", 0.8)
+    # L'égalité ne dépend pas du texte des réponses
+    candidates = [("zèbre", 0.8), ("abeille", 0.8)]
+    assert question_crew._select_candidate(candidates) == ("zèbre", 0.8)
+
+
+def test_failed_candidates_are_ignored(question_crew):
+    candidates = [(ERROR_RESPONSES["AI Analyst"], None), ("réponse B", 0.4)]
+    assert question_crew._select_candidate(candidates) == ("réponse B", 0.4)
+
+
+def test_all_candidates_failed_returns_the_analyst_error(question_crew):
+    candidates = [(ERROR_RESPONSES["AI Analyst"], None)] * 3
+    assert question_crew._select_candidate(candidates) == (ERROR_RESPONSES["AI Analyst"], 0.0)
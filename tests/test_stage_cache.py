@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.cache import StageCache
+from app.core.crew import QuestionCrew
+from app.core.prompts import PromptRegistry, TokenCounter
+from app.core.retry import RetryPolicy
+
+RESPONSES = {
+    "Prompt Manager": "Final Answer: Quelle est la capitale de la France ?",
+    "AI Analyst": "Final Answer: Paris est la capitale de la France depuis le Moyen Âge.",
+}
+
+
+@pytest.fixture
+def stage_cache():
+    return StageCache()
+
+
+def _run(stage_cache, score: str, verdict: str):
+    executor = ThreadPoolExecutor(max_workers=1)
+    question_crew = QuestionCrew(
+        executor=executor,
+        stage_cache=stage_cache,
+        retry_policy=RetryPolicy(max_attempts=1),
+        prompts=PromptRegistry(counter=TokenCounter(use_tiktoken=False)),
+    )
+    calls = []
+    responses = dict(RESPONSES, **{
+        "Quality Controller": f"Final Answer: Score: {score}",
+        "General Manager": f"Final Answer: {verdict}",
+    })
+
+    def kickoff(crew, crew_name):
+        calls.append(crew_name)
+        return responses[crew_name]
+
+    question_crew._kickoff = kickoff
+    try:
+        return asyncio.run(question_crew.aprocess_question("c koi la capital de la france")), calls
+    finally:
+        executor.shutdown(wait=False)
+
+
+def test_rejected_run_does_not_cache_score_and_verdict(monkeypatch, stage_cache):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    response, _ = _run(stage_cache, "0.30", "rejeté|score insuffisant")
+    assert response["status"] == "rejeté"
+
+    # Le modèle de notation a changé : le score et le verdict sont recalculés
+    response, calls = _run(stage_cache, "0.90", "validé|réponse exacte")
+    assert response["status"] == "validé"
+    assert response["quality_score"] == pytest.approx(0.9)
+    assert calls == ["Quality Controller", "General Manager"]
+
+
+def test_validated_run_caches_every_stage(monkeypatch, stage_cache):
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    _run(stage_cache, "0.90", "validé|réponse exacte")
+    response, calls = _run(stage_cache, "0.90", "validé|réponse exacte")
+    assert response["status"] == "validé"
+    assert calls == []